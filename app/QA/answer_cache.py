@@ -0,0 +1,191 @@
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+logger = logging.getLogger("QA-AnswerCache")
+
+
+def normalize_question(question: str) -> str:
+    question = " ".join(question.lower().split())
+    return re.sub(r"[\s?!.。,;:]+$", "", question)
+
+
+class _Matrix:
+    """
+    Unit question vectors of one language, one row per cached entry. Rows are
+    appended in place (capacity doubles when full); removed rows are blanked
+    and compacted away once they make up half the matrix.
+    """
+
+    def __init__(self, dim: int):
+        self.vectors = np.zeros((16, dim), dtype="float32")
+        self.keys: list = []
+        self.rows: Dict[Tuple[str, str], int] = {}
+        self.dead = 0
+
+    def add(self, key, vector: np.ndarray):
+        if len(self.keys) == len(self.vectors):
+            self.vectors = np.vstack([self.vectors, np.zeros_like(self.vectors)])
+        self.vectors[len(self.keys)] = vector
+        self.rows[key] = len(self.keys)
+        self.keys.append(key)
+
+    def remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        self.keys[row] = None
+        self.dead += 1
+        if self.dead * 2 > len(self.keys):
+            live = [i for i, k in enumerate(self.keys) if k is not None]
+            self.vectors[:len(live)] = self.vectors[live]
+            self.keys = [self.keys[i] for i in live]
+            self.rows = {k: i for i, k in enumerate(self.keys)}
+            self.dead = 0
+
+    def view(self) -> Tuple[np.ndarray, list]:
+        return self.vectors[:len(self.keys)], self.keys
+
+
+class AnswerCache:
+    """
+    Two-level cache in front of the LLM call.
+
+    Level one is an exact match on (normalised question, language). Level two
+    compares the embedded English question against previously answered ones and
+    returns an answer in the same language when cosine similarity reaches
+    `similarity_threshold`. Entries expire after `ttl_seconds`, the least
+    recently used are evicted beyond `max_entries`, and everything is dropped
+    when the corpus version changes.
+    """
+
+    def __init__(
+        self,
+        corpus_version: str,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ):
+        self.corpus_version = corpus_version
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._matrices: Dict[str, _Matrix] = {}
+        self._lock = threading.Lock()
+        self._counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _expired(self, entry: Dict, now: float) -> bool:
+        return now - entry["created"] > self.ttl_seconds
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        if entry["vector"] is not None and key[1] in self._matrices:
+            self._matrices[key[1]].remove(key)
+
+    def get_exact(self, question: str, lang: str) -> Optional[str]:
+        key = (normalize_question(question), lang)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.time()):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            self._counters["exact_hits"] += 1
+            return entry["answer"]
+
+    def get_semantic(self, vector: np.ndarray, lang: str) -> Optional[str]:
+        """Look up by the embedded English question; counts a miss when nothing is close enough."""
+        query = _unit(vector)
+        now = time.time()
+        with self._lock:
+            matrix = self._matrices.get(lang)
+            if matrix is not None and matrix.keys and matrix.vectors.shape[1] == len(query):
+                vectors, keys = matrix.view()
+                scores = vectors @ query
+                for row in np.argsort(-scores):
+                    if scores[row] < self.similarity_threshold:
+                        break
+                    key = keys[row]
+                    entry = self._entries.get(key) if key is not None else None
+                    if entry is None or self._expired(entry, now):
+                        continue
+                    self._entries.move_to_end(key)
+                    self._counters["semantic_hits"] += 1
+                    return entry["answer"]
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, question: str, lang: str, answer: str, vector: Optional[np.ndarray] = None, created: Optional[float] = None):
+        key = (normalize_question(question), lang)
+        entry = {
+            "answer": answer,
+            "vector": _unit(vector) if vector is not None else None,
+            "created": created or time.time(),
+        }
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            if entry["vector"] is not None:
+                matrix = self._matrices.get(lang)
+                if matrix is None or matrix.vectors.shape[1] != len(entry["vector"]):
+                    matrix = self._matrices[lang] = _Matrix(len(entry["vector"]))
+                matrix.add(key, entry["vector"])
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def invalidate(self, corpus_version: str):
+        """Forget every answer once the retrieval corpus has changed."""
+        with self._lock:
+            if corpus_version == self.corpus_version:
+                return
+            self.corpus_version = corpus_version
+            self._entries.clear()
+            self._matrices.clear()
+            self._counters["invalidations"] += 1
+        logger.info("♻️ Corpus changed, answer cache cleared.")
+
+    def seed(self, history: Iterable[Dict], encode) -> int:
+        """Warm the cache from QA history entries answered against the current corpus."""
+        now = time.time()
+        entries = [
+            h for h in history
+            if h.get("corpus_version") == self.corpus_version and now - h.get("timestamp", 0) <= self.ttl_seconds
+        ][-self.max_entries:]
+        if not entries:
+            return 0
+        vectors = encode([h.get("question_en", h["question"]) for h in entries])
+        for h, vector in zip(entries, vectors):
+            self.put(h["question"], h["lang"], h["answer"], vector=vector, created=h["timestamp"])
+        logger.info(f"🔥 Answer cache seeded with {len(entries)} past answers")
+        return len(entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._counters["exact_hits"] + self._counters["semantic_hits"] + self._counters["misses"]
+            hits = self._counters["exact_hits"] + self._counters["semantic_hits"]
+            return {
+                "entries": len(self._entries),
+                "similarity_threshold": self.similarity_threshold,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                **self._counters,
+            }
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype="float32").ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -6,6 +6,7 @@ import pandas as pd
 from eval_bleu import evaluate_bleu
 from pydantic import BaseModel
 from typing import List
+from app.core.inference_executor import executor
 
 BLEU_LOG_PATH = "app/QA/bleu_evaluation_log.csv"
 
@@ -32,8 +33,8 @@ def get_bleu_history():
 
 
 @router.post("/evaluate-now")
-def trigger_bleu_evaluation():
-    score = evaluate_bleu()
+async def trigger_bleu_evaluation():
+    score = await executor.run("evaluation", evaluate_bleu)
     if score is None:
         raise HTTPException(status_code=500, detail="Evaluation failed or no data.")
     return {"status": "success", "average_bleu": score}
@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.QA import qa
+from app.QA.load_test_qa import DEFAULT_QUESTIONS
+
+REPORTS_DIR = "app/QA/reports/"
+
+logger = logging.getLogger("QA-ContextBench")
+
+
+async def run_question(question: str, budgeted: bool, call_llm: bool) -> Dict:
+    start = time.perf_counter()
+    chunks = await asyncio.to_thread(qa.retrieve_chunks, question)
+    context = qa.context_budgeter.assemble(chunks, question)["context"] if budgeted else "\n\n".join(chunks)
+    prompt = qa.build_prompt(context, question)
+    if call_llm:
+        await qa.llm_client.complete(prompt, temperature=0.7, max_tokens=512)
+    return {"prompt_tokens": qa.count_tokens(prompt), "latency_s": time.perf_counter() - start}
+
+
+async def run(questions: List[str], call_llm: bool) -> List[Dict]:
+    report = []
+    for budgeted in (False, True):
+        results = [await run_question(question, budgeted, call_llm) for question in questions]
+        tokens = [r["prompt_tokens"] for r in results]
+        latencies = [r["latency_s"] * 1000 for r in results]
+        report.append({
+            "mode": "budgeted" if budgeted else "raw",
+            "context_max_tokens": qa.CONTEXT_MAX_TOKENS if budgeted else None,
+            "questions": len(questions),
+            "mean_prompt_tokens": round(float(np.mean(tokens)), 1),
+            "max_prompt_tokens": int(np.max(tokens)),
+            "p50_latency_ms": round(float(np.percentile(latencies, 50)), 1),
+            "p99_latency_ms": round(float(np.percentile(latencies, 99)), 1),
+        })
+    await qa.llm_client.aclose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare prompt sizes and end-to-end latency with and without the context budget.")
+    parser.add_argument("--questions", default=None, help="Text file with one English question per line")
+    parser.add_argument("--no-llm", action="store_true", help="Only measure retrieval and prompt assembly")
+    args = parser.parse_args()
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    report = asyncio.run(run(questions, call_llm=not args.no_llm))
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = os.path.join(REPORTS_DIR, "context_budget.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for row in report:
+        print(row)
+    logger.info(f"Saved context budget report to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.QA.vector_store import load_store
+from app.QA.index_factory import INDEX_BACKENDS, build_index, index_spec
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+REPORTS_DIR = "app/QA/reports/"
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("QA-IndexBench")
+
+
+def _rss_bytes() -> Optional[int]:
+    return psutil.Process().memory_info().rss if psutil else None
+
+
+def load_queries(embeddings: np.ndarray, questions_path: Optional[str], model: str, num_queries: int, seed: int) -> np.ndarray:
+    """Encode real questions when given, otherwise sample corpus chunks as queries."""
+    if questions_path:
+        from sentence_transformers import SentenceTransformer
+
+        with open(questions_path, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        return SentenceTransformer(model).encode(questions, convert_to_numpy=True).astype("float32")
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(embeddings), size=min(num_queries, len(embeddings)), replace=False)
+    return np.ascontiguousarray(embeddings[rows])
+
+
+def benchmark_backend(embeddings: np.ndarray, queries: np.ndarray, spec: Dict, k: int, truth: Optional[np.ndarray]) -> Dict:
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    index = build_index(embeddings, spec)
+    build_seconds = time.perf_counter() - start
+    rss_after = _rss_bytes()
+
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    results = np.array(results)
+
+    recall = 1.0
+    if truth is not None:
+        recall = float(np.mean([len(set(r) & set(t)) / k for r, t in zip(results, truth)]))
+    return {
+        "backend": spec["backend"],
+        f"recall@{k}": round(recall, 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+        "build_s": round(build_seconds, 3),
+        "index_mb": round(len(faiss.serialize_index(index)) / 2**20, 3),
+        "rss_delta_mb": round((rss_after - rss_before) / 2**20, 3) if psutil else None,
+    }, results
+
+
+def run_benchmark(embeddings: np.ndarray, queries: np.ndarray, backends: List[str], k: int) -> List[Dict]:
+    report, truth = [], None
+    # The exact flat search is the recall baseline, so it always runs first.
+    for backend in ["flat"] + [b for b in backends if b != "flat"]:
+        row, results = benchmark_backend(embeddings, queries, index_spec(backend), k, truth)
+        if backend == "flat":
+            truth = results
+        if backend in backends:
+            report.append(row)
+            logger.info(f"📊 {row}")
+    return report
+
+
+def save_report(report: List[Dict], filename: str = "index_benchmark"):
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    json_path = os.path.join(REPORTS_DIR, filename + ".json")
+    csv_path = os.path.join(REPORTS_DIR, filename + ".csv")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(report[0].keys()))
+        writer.writeheader()
+        writer.writerows(report)
+    logger.info(f"Saved index benchmark to {json_path} and {csv_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall, latency and memory of the QA index backends.")
+    parser.add_argument("--store", default="data/vector_store")
+    parser.add_argument("--backends", nargs="+", choices=INDEX_BACKENDS, default=list(INDEX_BACKENDS))
+    parser.add_argument("--questions", help="Optional file with one question per line to use as queries")
+    parser.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    store = load_store(args.store)
+    if store is None:
+        logger.error(f"No embedding store at {args.store}; run app/QA/ingest.py first.")
+        sys.exit(1)
+    embeddings = np.ascontiguousarray(store.dense(), dtype="float32")
+    queries = load_queries(embeddings, args.questions, args.model, args.num_queries, args.seed)
+    logger.info(f"🔬 Benchmarking {args.backends} on {len(embeddings)} vectors with {len(queries)} queries")
+
+    report = run_benchmark(embeddings, queries, args.backends, args.k)
+    save_report(report)
+    for row in report:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import hashlib
+import logging
+import argparse
+import unicodedata
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+BM25_VERSION = 1
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+RRF_K = 60
+# Wolaytta marks the glottal stop with an apostrophe (e.g. "sa'aa"), so it stays inside tokens.
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:['’][^\W_]+)*")
+
+logger = logging.getLogger("QA-BM25")
+
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFC", text).lower().replace("’", "'")
+    return TOKEN_PATTERN.findall(text)
+
+
+def corpus_id(hashes: Sequence[str]) -> str:
+    return hashlib.sha1("\n".join(hashes).encode("utf-8")).hexdigest()
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the QA chunks with CSR-style postings: for term t, the
+    documents are doc_ids[offsets[t]:offsets[t + 1]] (uint32, ascending) with
+    term frequencies in tfs (uint16). Arrays are memory-mapped like the
+    vector store so workers share them.
+    """
+
+    def __init__(self, terms: Dict[str, int], offsets, doc_ids, tfs, doc_lens, meta: Dict):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.meta = meta
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.num_docs = meta["num_docs"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self._norm = None
+
+    @classmethod
+    def build(cls, chunks: Sequence[str], k1: float = DEFAULT_K1, b: float = DEFAULT_B, source_id: str = "") -> "BM25Index":
+        terms: Dict[str, int] = {}
+        postings: List[Dict[int, int]] = []
+        doc_lens = np.zeros(len(chunks), dtype="uint32")
+        for doc_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            doc_lens[doc_id] = len(tokens)
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                term_id = terms.setdefault(token, len(terms))
+                if term_id == len(postings):
+                    postings.append({})
+                counts[term_id] = counts.get(term_id, 0) + 1
+            for term_id, count in counts.items():
+                postings[term_id][doc_id] = min(count, np.iinfo("uint16").max)
+
+        offsets = np.zeros(len(postings) + 1, dtype="int64")
+        offsets[1:] = np.cumsum([len(p) for p in postings])
+        doc_ids = np.empty(offsets[-1], dtype="uint32")
+        tfs = np.empty(offsets[-1], dtype="uint16")
+        for term_id, posting in enumerate(postings):
+            start, stop = offsets[term_id], offsets[term_id + 1]
+            doc_ids[start:stop] = list(posting.keys())
+            tfs[start:stop] = list(posting.values())
+        meta = {
+            "version": BM25_VERSION,
+            "k1": k1,
+            "b": b,
+            "num_docs": len(chunks),
+            "avgdl": float(doc_lens.mean()) if len(chunks) else 0.0,
+            "source_id": source_id,
+        }
+        return cls(terms, offsets, doc_ids, tfs, doc_lens, meta)
+
+    def _length_norm(self) -> np.ndarray:
+        if self._norm is None:
+            self._norm = (self.k1 * (1 - self.b + self.b * np.asarray(self.doc_lens, dtype="float32") / self.avgdl)).astype("float32")
+        return self._norm
+
+    def idf(self, term: str) -> float:
+        term_id = self.terms.get(term)
+        df = 0 if term_id is None else int(self.offsets[term_id + 1] - self.offsets[term_id])
+        return float(np.log1p((self.num_docs - df + 0.5) / (df + 0.5)))
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.num_docs, dtype="float32")
+        norm = self._length_norm()
+        for term in set(tokenize(query)):
+            term_id = self.terms.get(term)
+            if term_id is None:
+                continue
+            start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:stop]
+            tf = self.tfs[start:stop].astype("float32")
+            df = stop - start
+            idf = np.log1p((self.num_docs - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+        return scores
+
+    def search(self, query: str, k: int) -> List[int]:
+        """Ids of the top-k chunks with a positive score, best first."""
+        scores = self.scores(query)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [int(i) for i in top[np.argsort(-scores[top])]]
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        generation = 1
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                generation = json.load(f)["generation"] + 1
+        for name in ("offsets", "doc_ids", "tfs", "doc_lens"):
+            np.save(os.path.join(path, f"{name}-{generation}.npy"), getattr(self, name))
+        with open(os.path.join(path, f"terms-{generation}.json"), "w", encoding="utf-8") as f:
+            json.dump(sorted(self.terms, key=self.terms.get), f, ensure_ascii=False)
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({**self.meta, "generation": generation}, f)
+        os.replace(tmp_path, meta_path)
+        for file_path in glob.glob(os.path.join(path, "*-*.*")):
+            old = os.path.basename(file_path).rsplit("-", 1)[1].split(".")[0]
+            if old.isdigit() and int(old) < generation - 1:
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != BM25_VERSION:
+            return None
+        generation = meta["generation"]
+        with open(os.path.join(path, f"terms-{generation}.json"), "r", encoding="utf-8") as f:
+            terms = {term: i for i, term in enumerate(json.load(f))}
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}-{generation}.npy"), mmap_mode="r")
+            for name in ("offsets", "doc_ids", "tfs", "doc_lens")
+        }
+        return cls(terms, meta=meta, **arrays)
+
+    def size_bytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ("offsets", "doc_ids", "tfs", "doc_lens"))
+
+
+def load_or_build_bm25(path: str, hashes: Sequence[str], chunks: Sequence[str]) -> BM25Index:
+    """Reuse the persisted index when it was built from exactly these chunks."""
+    source_id = corpus_id(hashes)
+    index = BM25Index.load(path)
+    if index is not None and index.meta.get("source_id") == source_id:
+        logger.info(f"✅ Loaded BM25 index with {len(index.terms)} terms")
+        return index
+    start = time.perf_counter()
+    index = BM25Index.build(chunks, source_id=source_id)
+    index.save(path)
+    logger.info(f"✅ BM25 index built over {len(chunks)} chunks and {len(index.terms)} terms in {time.perf_counter() - start:.2f}s")
+    return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[int]:
+    """Merge ranked id lists; an id scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def benchmark(chunks: Sequence[str], num_queries: int = 1000, scale: int = 1, k: int = 20, seed: int = 0) -> Dict:
+    """Build over `scale` copies of the corpus and time random 2-5 term queries."""
+    corpus = list(chunks) * scale
+    start = time.perf_counter()
+    index = BM25Index.build(corpus)
+    build_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    latencies = []
+    for _ in range(num_queries):
+        tokens = tokenize(corpus[rng.integers(len(corpus))]) or ["wolaytta"]
+        query = " ".join(rng.choice(tokens, size=min(len(tokens), rng.integers(2, 6)), replace=False))
+        start = time.perf_counter()
+        index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "chunks": len(corpus),
+        "terms": len(index.terms),
+        "postings": int(index.offsets[-1]),
+        "index_mb": round(index.size_bytes() / 2**20, 3),
+        "build_s": round(build_seconds, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+    }
+
+
+if __name__ == "__main__":
+    from app.QA.vector_store import load_store
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Benchmark BM25 query latency over the QA chunks.")
+    parser.add_argument("--store", default="data/vector_store")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    store = load_store(args.store)
+    if store is None:
+        logger.error(f"No vector store at {args.store}; run app/QA/ingest.py first.")
+        sys.exit(1)
+    for scale in args.scales:
+        print(benchmark(store.chunks, num_queries=args.queries, scale=scale))
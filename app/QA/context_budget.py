@@ -0,0 +1,113 @@
+import threading
+from typing import Callable, Dict, List, Optional, Set
+
+from app.QA.bm25_index import tokenize
+from app.QA.ingest import split_units
+
+DEFAULT_MAX_TOKENS = 320
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[tuple]:
+    tokens = tokenize(text)
+    if len(tokens) <= size:
+        return {tuple(tokens)}
+    return {tuple(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def jaccard(a: Set, b: Set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class ContextBudgeter:
+    """
+    Assembles the retrieved chunks into prompt context under a token budget.
+
+    Chunks arrive best first. Near-duplicates (word-shingle Jaccard above
+    `duplicate_threshold`, common with overlapping windows) are dropped; if
+    the rest still exceeds `max_tokens`, the sentences sharing the most
+    question terms (weighted by `term_weight`, e.g. BM25 idf) are kept and
+    put back in their original order.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+        term_weight: Optional[Callable[[str], float]] = None,
+    ):
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.term_weight = term_weight or (lambda term: 1.0)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.duplicates_removed = 0
+        self.trimmed = 0
+
+    def deduplicate(self, chunks: List[str]) -> List[str]:
+        kept, kept_shingles = [], []
+        for chunk in chunks:
+            chunk_shingles = shingles(chunk)
+            if any(jaccard(chunk_shingles, other) >= self.duplicate_threshold for other in kept_shingles):
+                continue
+            kept.append(chunk)
+            kept_shingles.append(chunk_shingles)
+        return kept
+
+    def _trim(self, chunks: List[str], question: str) -> List[str]:
+        question_terms = set(tokenize(question))
+        sentences = []
+        for chunk_rank, chunk in enumerate(chunks):
+            for position, sentence in enumerate(split_units(chunk)):
+                score = sum(self.term_weight(term) for term in question_terms & set(tokenize(sentence)))
+                sentences.append((score, chunk_rank, position, sentence, self.count_tokens(sentence)))
+
+        selected, used = [], 0
+        for sentence in sorted(sentences, key=lambda s: (-s[0], s[1], s[2])):
+            if used + sentence[4] <= self.max_tokens:
+                selected.append(sentence)
+                used += sentence[4]
+        if not selected and sentences:
+            # A single sentence larger than the budget: keep the best one rather than nothing.
+            selected = [min(sentences, key=lambda s: (-s[0], s[1], s[2]))]
+
+        trimmed = []
+        for chunk_rank in range(len(chunks)):
+            kept = [s[3] for s in sorted(selected, key=lambda s: s[2]) if s[1] == chunk_rank]
+            if kept:
+                trimmed.append(" ".join(kept))
+        return trimmed
+
+    def assemble(self, chunks: List[str], question: str) -> Dict:
+        """Returns the context string plus token counts before and after budgeting."""
+        tokens_before = sum(self.count_tokens(chunk) for chunk in chunks)
+        unique = self.deduplicate(chunks)
+        tokens_unique = sum(self.count_tokens(chunk) for chunk in unique)
+        trimmed = tokens_unique > self.max_tokens
+        selected = self._trim(unique, question) if trimmed else unique
+        context = "\n\n".join(selected)
+        tokens_after = self.count_tokens(context)
+        with self._lock:
+            self.requests += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+            self.duplicates_removed += len(chunks) - len(unique)
+            self.trimmed += int(trimmed)
+        return {"context": context, "tokens_before": tokens_before, "tokens_after": tokens_after}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            requests = max(self.requests, 1)
+            return {
+                "max_tokens": self.max_tokens,
+                "requests": self.requests,
+                "mean_context_tokens_before": round(self.tokens_before / requests, 1),
+                "mean_context_tokens_after": round(self.tokens_after / requests, 1),
+                "duplicates_removed": self.duplicates_removed,
+                "trimmed_requests": self.trimmed,
+            }
@@ -0,0 +1,166 @@
+import os
+import time
+import pickle
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("QA-History")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS qa_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    lang TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    question_en TEXT,
+    corpus_version TEXT,
+    prompt_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS qa_history_ts ON qa_history (ts);
+CREATE INDEX IF NOT EXISTS qa_history_lang_ts ON qa_history (lang, ts);
+CREATE TABLE IF NOT EXISTS migrations (source TEXT PRIMARY KEY, migrated_at REAL NOT NULL, entries INTEGER NOT NULL);
+"""
+COLUMNS = ("id", "ts", "lang", "question", "answer", "question_en", "corpus_version", "prompt_tokens")
+# Columns added after the first release, applied to existing databases on open.
+ADDED_COLUMNS = {"prompt_tokens": "INTEGER"}
+
+
+class HistoryStore:
+    """
+    Append-only QA history in SQLite (WAL mode).
+
+    Each answer is one INSERT, so recording it costs the same no matter how
+    long the history is. WAL keeps committed rows safe across crashes and
+    lets several worker processes append while others read; the busy timeout
+    serialises competing writers. Lookups by time and language use indexes.
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        with conn:
+            # Workers starting together upgrade one at a time; the others then find the columns.
+            conn.execute("BEGIN IMMEDIATE")
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(qa_history)")}
+            for column, column_type in ADDED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE qa_history ADD COLUMN {column} {column_type}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, entry: Dict) -> int:
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO qa_history (ts, lang, question, answer, question_en, corpus_version, prompt_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.get("timestamp", time.time()),
+                    entry.get("lang", "en"),
+                    entry["question"],
+                    entry["answer"],
+                    entry.get("question_en"),
+                    entry.get("corpus_version"),
+                    entry.get("prompt_tokens"),
+                ),
+            )
+            return cursor.lastrowid
+
+    def query(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        lang: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """Entries in time order; with `limit`, the most recent ones."""
+        clauses, params = [], []
+        if lang is not None:
+            clauses.append("lang = ?")
+            params.append(lang)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {', '.join(COLUMNS)} FROM qa_history {where} ORDER BY ts DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._connection().execute(sql, params).fetchall()
+        return [_row_to_entry(row) for row in reversed(rows)]
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM qa_history").fetchone()[0]
+
+    def migrate_pickle(self, pickle_path: str) -> int:
+        """Import the legacy `qa_history.pkl` list once; later calls are no-ops."""
+        if not os.path.exists(pickle_path):
+            return 0
+        source = os.path.abspath(pickle_path)
+        if self._migrated(source):
+            return 0
+        with open(pickle_path, "rb") as f:
+            legacy = pickle.load(f)
+        # Entries written before timestamps were recorded get the file's mtime.
+        fallback_ts = os.path.getmtime(pickle_path)
+        conn = self._connection()
+        with conn:
+            # Take the write lock before checking, so concurrent workers import once.
+            conn.execute("BEGIN IMMEDIATE")
+            if self._migrated(source):
+                return 0
+            conn.executemany(
+                "INSERT INTO qa_history (ts, lang, question, answer, question_en, corpus_version) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        item.get("timestamp", fallback_ts),
+                        item.get("lang", "en"),
+                        item["question"],
+                        item["answer"],
+                        item.get("question_en"),
+                        item.get("corpus_version"),
+                    )
+                    for item in legacy
+                ],
+            )
+            conn.execute("INSERT INTO migrations (source, migrated_at, entries) VALUES (?, ?, ?)", (source, time.time(), len(legacy)))
+        logger.info(f"📦 Migrated {len(legacy)} QA history entries from {pickle_path}")
+        return len(legacy)
+
+
+    def _migrated(self, source: str) -> bool:
+        return self._connection().execute("SELECT 1 FROM migrations WHERE source = ?", (source,)).fetchone() is not None
+
+
+def _row_to_entry(row: sqlite3.Row) -> Dict:
+    entry = dict(row)
+    entry["timestamp"] = entry.pop("ts")
+    return entry
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Migrate qa_history.pkl into the append-only history store.")
+    parser.add_argument("pickle_path", nargs="?", default="data/qa_history.pkl")
+    parser.add_argument("--db", default="data/qa_history.sqlite3")
+    args = parser.parse_args()
+    store = HistoryStore(args.db)
+    migrated = store.migrate_pickle(args.pickle_path)
+    print(f"Migrated {migrated} entries; store now holds {store.count()}.")
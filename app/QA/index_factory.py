@@ -0,0 +1,77 @@
+import math
+import logging
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger("QA-IndexFactory")
+
+# None means "derive from the corpus size at build time".
+DEFAULT_INDEX_PARAMS = {
+    "flat": {},
+    "ivf_flat": {"nlist": None, "nprobe": 8},
+    "ivf_pq": {"nlist": None, "m": 16, "nbits": 8, "nprobe": 16},
+    "hnsw": {"m": 32, "ef_construction": 80, "ef_search": 64},
+}
+INDEX_BACKENDS = tuple(DEFAULT_INDEX_PARAMS)
+# FAISS k-means wants at least this many training points per centroid.
+MIN_POINTS_PER_CENTROID = 39
+
+
+def index_spec(backend: str = "flat", **overrides) -> Dict:
+    """Return the full parameter set for a backend, as stored in the cache manifest."""
+    if backend not in DEFAULT_INDEX_PARAMS:
+        raise ValueError(f"Unknown index backend '{backend}', expected one of {INDEX_BACKENDS}")
+    unknown = set(overrides) - set(DEFAULT_INDEX_PARAMS[backend])
+    if unknown:
+        raise ValueError(f"Unsupported parameters for {backend}: {sorted(unknown)}")
+    return {"backend": backend, **DEFAULT_INDEX_PARAMS[backend], **overrides}
+
+
+def _auto_nlist(num_vectors: int, nlist: Optional[int]) -> int:
+    if nlist is None:
+        nlist = int(4 * math.sqrt(num_vectors))
+    return max(1, min(nlist, num_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_subquantizers(dim: int, m: int) -> int:
+    while dim % m:
+        m -= 1
+    return m
+
+
+def factory_string(spec: Dict, num_vectors: int, dim: int) -> str:
+    backend = spec["backend"]
+    if backend == "flat":
+        return "Flat"
+    if backend == "ivf_flat":
+        return f"IVF{_auto_nlist(num_vectors, spec['nlist'])},Flat"
+    if backend == "ivf_pq":
+        nbits = max(1, min(spec["nbits"], int(math.log2(max(num_vectors, 2)))))
+        return f"IVF{_auto_nlist(num_vectors, spec['nlist'])},PQ{_pq_subquantizers(dim, spec['m'])}x{nbits}"
+    return f"HNSW{spec['m']},Flat"
+
+
+def configure_search(index, spec: Dict):
+    """Apply search-time parameters, which are not reliably kept by write_index."""
+    if "nprobe" in spec:
+        faiss.extract_index_ivf(index).nprobe = spec["nprobe"]
+    if "ef_search" in spec:
+        index.hnsw.efSearch = spec["ef_search"]
+    return index
+
+
+def build_index(embeddings: np.ndarray, spec: Optional[Dict] = None):
+    """Build (and train, for IVF backends) an L2 index over `embeddings`."""
+    spec = spec or index_spec("flat")
+    num_vectors, dim = embeddings.shape
+    description = factory_string(spec, num_vectors, dim)
+    index = faiss.index_factory(dim, description, faiss.METRIC_L2)
+    if spec["backend"] == "hnsw":
+        index.hnsw.efConstruction = spec["ef_construction"]
+    if not index.is_trained:
+        logger.info(f"🏋️ Training {description} on {num_vectors} vectors")
+        index.train(embeddings)
+    index.add(embeddings)
+    return configure_search(index, spec)
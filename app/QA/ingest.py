@@ -0,0 +1,252 @@
+import os
+import re
+import csv
+import sys
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+import fitz
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.QA.rag_cache import DEFAULT_EMBED_BATCH_SIZE, load_or_build_corpus
+from app.QA.bm25_index import load_or_build_bm25
+from app.QA.index_factory import INDEX_BACKENDS, index_spec
+from app.QA.vector_store import STORE_DTYPES
+
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md", ".csv")
+# paraphrase-multilingual-MiniLM-L12-v2 truncates inputs at 128 word pieces.
+DEFAULT_MAX_TOKENS = 128
+DEFAULT_OVERLAP = 32
+# Bump when the chunking logic changes so cached chunks are rebuilt.
+CHUNKER_VERSION = 1
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?።])\s+")
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("QA-Ingest")
+
+
+def discover_sources(root: str) -> List[str]:
+    """Return every supported document below `root`, in a stable order."""
+    if os.path.isfile(root):
+        return [root]
+    sources = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                sources.append(os.path.join(dirpath, name))
+    return sorted(sources)
+
+
+def iter_pages(path: str) -> Iterator[str]:
+    """Stream a document page by page (PDF), block by block (text) or row by row (CSV)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        with fitz.open(path) as doc:
+            for page in doc:
+                yield page.get_text()
+    elif ext == ".csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.reader(f):
+                values = [value.strip() for value in row if value.strip()]
+                if values:
+                    yield " | ".join(values) + "\n\n"
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            block = []
+            for line in f:
+                block.append(line)
+                if not line.strip():
+                    yield "".join(block)
+                    block = []
+            if block:
+                yield "".join(block)
+
+
+def split_units(text: str) -> List[str]:
+    units = []
+    for para in text.split("\n\n"):
+        para = " ".join(para.split())
+        if para:
+            units.extend(s for s in SENTENCE_BOUNDARY.split(para) if s)
+    return units
+
+
+class TokenChunker:
+    """
+    Packs sentences into chunks of at most `max_tokens` embedding-model tokens,
+    repeating roughly `overlap` tokens of trailing sentences in the next chunk.
+    Sentences longer than a chunk are cut on token offsets.
+    """
+
+    def __init__(self, tokenizer, max_tokens: int = DEFAULT_MAX_TOKENS, overlap: int = DEFAULT_OVERLAP):
+        self.tokenizer = tokenizer
+        # Leave room for the special tokens the embedder adds.
+        self.max_tokens = max_tokens - tokenizer.num_special_tokens_to_add()
+        self.overlap = min(overlap, self.max_tokens // 2)
+        self.units: List[Tuple[str, int]] = []
+        self.total = 0
+
+    def _split_long(self, unit: str) -> Iterator[Tuple[str, int]]:
+        offsets = self.tokenizer(unit, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        step = self.max_tokens - self.overlap
+        for start in range(0, len(offsets), step):
+            window = offsets[start:start + self.max_tokens]
+            yield unit[window[0][0]:window[-1][1]], len(window)
+            if start + self.max_tokens >= len(offsets):
+                break
+
+    def _emit(self) -> str:
+        chunk = " ".join(text for text, _ in self.units)
+        carried, carried_tokens = [], 0
+        for text, n in reversed(self.units[1:]):
+            if carried_tokens + n > self.overlap:
+                break
+            carried.insert(0, (text, n))
+            carried_tokens += n
+        self.units, self.total = carried, carried_tokens
+        return chunk
+
+    def feed(self, text: str) -> Iterator[str]:
+        units = split_units(text)
+        if not units:
+            return
+        counts = self.tokenizer(units, add_special_tokens=False)["input_ids"]
+        for unit, ids in zip(units, counts):
+            pieces = self._split_long(unit) if len(ids) > self.max_tokens else [(unit, len(ids))]
+            for piece, n in pieces:
+                if self.units and self.total + n > self.max_tokens:
+                    yield self._emit()
+                    while self.units and self.total + n > self.max_tokens:
+                        self.total -= self.units.pop(0)[1]
+                self.units.append((piece, n))
+                self.total += n
+
+    def flush(self) -> Iterator[str]:
+        if self.units:
+            chunk = " ".join(text for text, _ in self.units)
+            self.units, self.total = [], 0
+            yield chunk
+
+
+@lru_cache(maxsize=None)
+def load_tokenizer(tokenizer_name: str):
+    """Loaded once per process and shared by every chunker in it."""
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(tokenizer_name)
+
+
+# Pool worker processes only; in-process chunking passes the tokenizer explicitly.
+_worker_tokenizer = None
+_worker_settings = {}
+
+
+def _init_worker(tokenizer_name: str, max_tokens: int, overlap: int):
+    global _worker_tokenizer, _worker_settings
+    _worker_tokenizer = load_tokenizer(tokenizer_name)
+    _worker_settings = {"max_tokens": max_tokens, "overlap": overlap}
+
+
+def _chunk_in_worker(path: str) -> Tuple[str, List[str]]:
+    return _chunk_document(path, _worker_tokenizer, **_worker_settings)
+
+
+def _chunk_document(path: str, tokenizer, max_tokens: int, overlap: int) -> Tuple[str, List[str]]:
+    chunker = TokenChunker(tokenizer, max_tokens=max_tokens, overlap=overlap)
+    chunks = []
+    for page in iter_pages(path):
+        chunks.extend(chunker.feed(page))
+    chunks.extend(chunker.flush())
+    return path, chunks
+
+
+def chunk_documents(
+    paths: List[str],
+    tokenizer_name: str = EMBEDDING_MODEL,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap: int = DEFAULT_OVERLAP,
+    workers: Optional[int] = None,
+) -> Iterator[Tuple[str, List[str]]]:
+    """Chunk documents in a process pool, yielding (path, chunks) in input order."""
+    if not paths:
+        return
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers == 1:
+        tokenizer = load_tokenizer(tokenizer_name)
+        for path in paths:
+            path, chunks = _chunk_document(path, tokenizer, max_tokens, overlap)
+            logger.info(f"📄 {os.path.basename(path)}: {len(chunks)} chunks")
+            yield path, chunks
+        return
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(tokenizer_name, max_tokens, overlap),
+    ) as pool:
+        for path, chunks in pool.map(_chunk_in_worker, paths):
+            logger.info(f"📄 {os.path.basename(path)}: {len(chunks)} chunks")
+            yield path, chunks
+
+
+def chunker_settings(
+    tokenizer_name: str = EMBEDDING_MODEL,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap: int = DEFAULT_OVERLAP,
+) -> dict:
+    return {
+        "name": "token_window",
+        "version": CHUNKER_VERSION,
+        "tokenizer": tokenizer_name,
+        "max_tokens": max_tokens,
+        "overlap": overlap,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest PDF/text/CSV documents into the QA knowledge base.")
+    parser.add_argument("source", help="Document or directory of documents to ingest")
+    parser.add_argument("--store", default="data/vector_store")
+    parser.add_argument("--store-dtype", choices=STORE_DTYPES, default="float32")
+    parser.add_argument("--index", default="data/faiss_index.idx")
+    parser.add_argument("--manifest", default="data/rag_manifest.json")
+    parser.add_argument("--bm25", default="data/bm25_index")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=DEFAULT_OVERLAP)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE)
+    parser.add_argument("--index-backend", choices=INDEX_BACKENDS, default="flat")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    sources = discover_sources(args.source)
+    if not sources:
+        logger.error(f"No supported documents found in {args.source}")
+        sys.exit(1)
+    logger.info(f"📚 Ingesting {len(sources)} documents with {args.workers or os.cpu_count()} workers")
+
+    embedder = SentenceTransformer(args.model)
+    docs, store, _ = load_or_build_corpus(
+        sources=sources,
+        chunk_documents=lambda paths: chunk_documents(paths, args.model, args.max_tokens, args.overlap, args.workers),
+        chunker_settings=chunker_settings(args.model, args.max_tokens, args.overlap),
+        encode=lambda texts: embedder.encode(texts, batch_size=64, convert_to_numpy=True),
+        embedding_model=args.model,
+        store_path=args.store,
+        index_path=args.index,
+        manifest_path=args.manifest,
+        embed_batch_size=args.batch_size,
+        index_spec=index_spec(args.index_backend),
+        store_dtype=args.store_dtype,
+    )
+    load_or_build_bm25(args.bm25, store.hashes, docs)
+    logger.info(f"✅ Knowledge base ready with {len(docs)} chunks")
+
+
+if __name__ == "__main__":
+    main()
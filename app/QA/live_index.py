@@ -0,0 +1,532 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.QA.bm25_index import BM25Index, load_or_build_bm25
+from app.QA.ingest import SUPPORTED_EXTENSIONS
+from app.QA.rag_cache import corpus_fingerprint, load_manifest
+
+# Search results carry the segment epoch in the high bits, so ids handed out
+# before a merge still resolve to the right chunk after it.
+ROW_BITS = 40
+ROW_MASK = (1 << ROW_BITS) - 1
+DEFAULT_MERGE_THRESHOLD = 2000
+DEFAULT_MERGE_INTERVAL = 600.0
+DEFAULT_SYNC_INTERVAL = 1.0
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers still share the delta, but merges are not serialised across processes.
+    fcntl = None
+
+logger = logging.getLogger("QA-LiveIndex")
+
+
+class _Segments:
+    """Immutable view of the main segment plus the delta; replaced, never mutated."""
+
+    def __init__(self, epoch, chunks, index, bm25, docs, delta_chunks, delta_vectors, delta_docs, alive):
+        self.epoch = epoch
+        self.chunks = chunks
+        self.index = index
+        self.bm25 = bm25
+        self.docs = docs
+        self.delta_chunks = delta_chunks
+        self.delta_vectors = delta_vectors
+        self.delta_docs = delta_docs
+        self.alive = alive
+        self.delta_index = None
+        self.delta_bm25 = None
+        if delta_chunks:
+            self.delta_index = faiss.IndexFlatL2(delta_vectors.shape[1])
+            self.delta_index.add(delta_vectors)
+            if bm25 is not None:
+                self.delta_bm25 = BM25Index.build(delta_chunks)
+
+    def __len__(self):
+        return len(self.chunks) + len(self.delta_chunks)
+
+    def text(self, row: int) -> str:
+        return self.chunks[row] if row < len(self.chunks) else self.delta_chunks[row - len(self.chunks)]
+
+    def rows(self, name: str) -> Optional[Tuple[int, int]]:
+        return self.delta_docs.get(name) or self.docs.get(name)
+
+
+def document_rows(sources: List[str], manifest: Dict) -> Dict[str, Tuple[int, int]]:
+    """Row range of every source document in the store, keyed by source path."""
+    rows, start = {}, 0
+    for path in sources:
+        count = len(manifest["documents"][path]["chunks"])
+        rows[path] = (start, start + count)
+        start += count
+    return rows
+
+
+@contextmanager
+def _file_lock(path: str, exclusive: bool = True, blocking: bool = True) -> Iterator[bool]:
+    """Cross-process lock on `path`; yields False if `blocking` is off and another process holds it."""
+    with open(path, "a") as f:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(f, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class _SharedDelta:
+    """
+    Delta documents, tombstones and the main segment's source list in
+    SQLite, shared by every worker process serving the same manifest. Each
+    change bumps `revision`; workers poll it and rebuild their segments.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents (path TEXT PRIMARY KEY, seq INTEGER NOT NULL, chunks TEXT NOT NULL, vectors BLOB NOT NULL, dim INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS tombstones (path TEXT PRIMARY KEY, seq INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', '0'), ('main_generation', '0')")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self, write: bool = True) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, key: str = "revision") -> int:
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = ?", (key,))
+        return int(conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0])
+
+    def revision(self) -> int:
+        return int(self._connection().execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0])
+
+    def snapshot(self) -> Dict:
+        """Everything at one revision; delta documents in the order they were added."""
+        with self._transaction(write=False) as conn:
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+            documents = [
+                (path, seq, json.loads(chunks), np.frombuffer(vectors, dtype="float32").reshape(-1, dim))
+                for path, seq, chunks, vectors, dim in conn.execute(
+                    "SELECT path, seq, chunks, vectors, dim FROM documents ORDER BY seq"
+                )
+            ]
+            tombstones = {path for (path,) in conn.execute("SELECT path FROM tombstones")}
+        return {
+            "revision": int(meta["revision"]),
+            "main": json.loads(meta["main"]) if "main" in meta else None,
+            "main_generation": int(meta["main_generation"]),
+            "documents": documents,
+            "tombstones": tombstones,
+        }
+
+    def add(self, path: str, chunks: List[str], vectors: np.ndarray) -> int:
+        with self._transaction() as conn:
+            revision = self._bump(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (path, seq, chunks, vectors, dim) VALUES (?, ?, ?, ?, ?)",
+                (path, revision, json.dumps(chunks, ensure_ascii=False), vectors.tobytes(), vectors.shape[1]),
+            )
+            conn.execute("DELETE FROM tombstones WHERE path = ?", (path,))
+        return revision
+
+    def delete(self, paths: List[str]) -> int:
+        with self._transaction() as conn:
+            revision = self._bump(conn)
+            for path in paths:
+                conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+                conn.execute("INSERT OR REPLACE INTO tombstones (path, seq) VALUES (?, ?)", (path, revision))
+        return revision
+
+    def record_main(self, sources: List[str], merged_through: Optional[int] = None) -> int:
+        """Publish a new main segment; delta documents up to `merged_through` are now part of it."""
+        with self._transaction() as conn:
+            if merged_through is not None:
+                conn.execute("DELETE FROM documents WHERE seq <= ?", (merged_through,))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('main', ?)", (json.dumps(sources),))
+            generation = self._bump(conn, "main_generation")
+            self._bump(conn)
+        return generation
+
+
+class LiveIndex:
+    """
+    The QA corpus as a memory-mapped main segment plus a delta.
+
+    Uploaded documents are chunked, embedded and appended to the delta, which
+    is searched alongside the main index right away. Deletions are recorded
+    as tombstones: rows stay in place but are filtered from results. A
+    background merge rebuilds the main store, index and BM25 postings from
+    the live documents through the incremental corpus cache (delta vectors
+    are reused, not re-embedded) and swaps them in; queries keep using the
+    previous segments until the swap.
+
+    The delta, tombstones and the main segment's source list live in SQLite
+    next to the manifest, so every worker process serving the manifest sees
+    the same documents: each polls the shared revision and republishes its
+    segments when it changes. Merges (and rebuilds of the main segment) hold
+    a cross-process file lock, so one worker merges while the others keep
+    searching and then load the merged files.
+    """
+
+    def __init__(
+        self,
+        build_corpus: Callable[[List[str], Dict[str, np.ndarray]], Tuple[List[str], object, object]],
+        base_sources: List[str],
+        upload_dir: str,
+        manifest_path: str,
+        bm25_path: Optional[str] = None,
+        merge_threshold: int = DEFAULT_MERGE_THRESHOLD,
+        merge_interval: float = DEFAULT_MERGE_INTERVAL,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+        on_change: Optional[Callable[[str], None]] = None,
+    ):
+        self.build_corpus = build_corpus
+        self.base_sources = base_sources
+        self.upload_dir = upload_dir
+        self.manifest_path = manifest_path
+        self.bm25_path = bm25_path
+        self.merge_threshold = merge_threshold
+        self.merge_interval = merge_interval
+        self.sync_interval = sync_interval
+        self.on_change = on_change
+        os.makedirs(upload_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        shared_path = os.path.splitext(manifest_path)[0]
+        self._shared = _SharedDelta(f"{shared_path}.live.db")
+        self._lock_path = f"{shared_path}.live.lock"
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._merge_wanted = threading.Event()
+        self._revision = -1
+        self._merges = 0
+        self._last_merge_s = None
+        self._fingerprint = None
+        self._history: Dict[int, _Segments] = {}
+        self._state: Optional[_Segments] = None
+        with _file_lock(self._lock_path):
+            self._import_deleted_file()
+            snapshot = self._shared.snapshot()
+            # Pick up corpus files added or changed since the last start.
+            sources = self._live_sources(snapshot, include_delta=False)
+            self._main = self._load_main(sources, {})
+            if sources != snapshot["main"]:
+                self._main_generation = self._shared.record_main(sources)
+            else:
+                self._main_generation = snapshot["main_generation"]
+        self._sync()
+        threading.Thread(target=self._sync_loop, name="qa-live-sync", daemon=True).start()
+        threading.Thread(target=self._merge_loop, name="qa-live-merge", daemon=True).start()
+
+    # Segments
+
+    def _upload_files(self) -> List[str]:
+        return sorted(
+            os.path.join(self.upload_dir, name)
+            for name in os.listdir(self.upload_dir)
+            if name.lower().endswith(SUPPORTED_EXTENSIONS)
+        )
+
+    def _live_sources(self, snapshot: Dict, include_delta: bool) -> List[str]:
+        """
+        Sources for a main segment: the corpus plus the uploads already in
+        the main segment (and, for merges, in the delta). Uploads still being
+        ingested are left out, as are tombstoned documents.
+        """
+        delta = {path for path, _, _, _ in snapshot["documents"]}
+        if snapshot["main"] is None:
+            known = set(self._upload_files()) - delta
+        else:
+            known = set(snapshot["main"])
+        if include_delta:
+            known |= delta
+        uploads = [path for path in self._upload_files() if path in known]
+        return [path for path in self.base_sources + uploads if path not in snapshot["tombstones"]]
+
+    def _import_deleted_file(self):
+        """Tombstones used to be kept per process in deleted.json (by file name at first)."""
+        deleted_path = os.path.join(self.upload_dir, "deleted.json")
+        if not os.path.exists(deleted_path):
+            return
+        with open(deleted_path, "r", encoding="utf-8") as f:
+            deleted = set(json.load(f))
+        deleted |= {path for path in self.base_sources if os.path.basename(path) in deleted}
+        if deleted:
+            self._shared.delete(sorted(deleted))
+        os.remove(deleted_path)
+
+    def _load_main(self, sources: List[str], cached_vectors: Dict[str, np.ndarray]) -> _Segments:
+        chunks, store, index = self.build_corpus(sources, cached_vectors)
+        bm25 = load_or_build_bm25(self.bm25_path, store.hashes, chunks) if self.bm25_path else None
+        docs = document_rows(sources, load_manifest(self.manifest_path))
+        self._fingerprint = corpus_fingerprint(self.manifest_path)
+        return _Segments(0, chunks, index, bm25, docs, [], None, {}, np.ones(len(chunks), dtype=bool))
+
+    def _compose(self, main: _Segments, snapshot: Dict) -> _Segments:
+        """The main segment with the shared delta appended and tombstones applied, as a new epoch."""
+        base = len(main.chunks)
+        delta_chunks, delta_vectors, delta_docs = [], [], {}
+        for path, _, chunks, vectors in snapshot["documents"]:
+            start = base + len(delta_chunks)
+            delta_docs[path] = (start, start + len(chunks))
+            delta_chunks.extend(chunks)
+            delta_vectors.append(vectors)
+        alive = np.ones(base + len(delta_chunks), dtype=bool)
+        for path, (start, stop) in main.docs.items():
+            # A document re-uploaded since the merge is replaced by its delta rows.
+            if path in snapshot["tombstones"] or path in delta_docs:
+                alive[start:stop] = False
+        epoch = self._state.epoch + 1 if self._state is not None else 0
+        return _Segments(
+            epoch, main.chunks, main.index, main.bm25, main.docs,
+            delta_chunks, np.vstack(delta_vectors) if delta_vectors else None, delta_docs, alive,
+        )
+
+    def _sync(self):
+        """Republish the segments if the shared revision moved, reloading the main segment after a merge."""
+        with self._sync_lock:
+            if self._shared.revision() == self._revision:
+                return
+            snapshot = self._shared.snapshot()
+            if snapshot["main_generation"] != self._main_generation:
+                # Wait out a merge in progress, then load what it wrote.
+                with _file_lock(self._lock_path, exclusive=False):
+                    snapshot = self._shared.snapshot()
+                    self._main = self._load_main(snapshot["main"], {})
+                    self._main_generation = snapshot["main_generation"]
+            with self._lock:
+                self._revision = snapshot["revision"]
+                self._publish(self._compose(self._main, snapshot))
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self._sync()
+            except Exception as e:
+                logger.error(f"❌ Segment sync failed, keeping current segments: {e}")
+
+    def _publish(self, state: _Segments):
+        self._state = state
+        self._history[state.epoch] = state
+        # Ids from the previous epoch may still be in flight; older ones are not.
+        for epoch in [e for e in self._history if e < state.epoch - 1]:
+            del self._history[epoch]
+        if self.on_change is not None:
+            self.on_change(self.version)
+
+    @property
+    def version(self) -> str:
+        return f"{self._fingerprint}:{self._revision}"
+
+    def __len__(self):
+        return int(self._state.alive.sum())
+
+    def chunk(self, chunk_id: int) -> Optional[str]:
+        """Text for an id returned by `search` or `lexical_search`; None once it is stale."""
+        state = self._history.get(chunk_id >> ROW_BITS)
+        row = chunk_id & ROW_MASK
+        if state is None or chunk_id < 0 or row >= len(state) or not state.alive[row]:
+            return None
+        return state.text(row)
+
+    # Search
+
+    def search(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """FAISS-style (distances, ids) over both segments, skipping tombstoned rows."""
+        state = self._state
+        depth = k + int(len(state.alive) - state.alive.sum())
+        distances, ids = state.index.search(vectors, min(depth, len(state.chunks)) or 1)
+        if state.delta_index is not None:
+            delta_distances, delta_ids = state.delta_index.search(vectors, min(depth, len(state.delta_chunks)))
+            distances = np.hstack([distances, delta_distances])
+            ids = np.hstack([ids, np.where(delta_ids >= 0, delta_ids + len(state.chunks), -1)])
+
+        out_distances = np.full((len(vectors), k), np.inf, dtype="float32")
+        out_ids = np.full((len(vectors), k), -1, dtype="int64")
+        for q in range(len(vectors)):
+            found = 0
+            for j in np.argsort(distances[q], kind="stable"):
+                row = ids[q, j]
+                if row < 0 or not state.alive[row]:
+                    continue
+                out_distances[q, found] = distances[q, j]
+                out_ids[q, found] = (state.epoch << ROW_BITS) | int(row)
+                found += 1
+                if found == k:
+                    break
+        return out_distances, out_ids
+
+    def lexical_search(self, query: str, k: int) -> List[int]:
+        """
+        BM25 over both segments. The delta keeps its own term statistics, so its
+        scores are slightly off until the next merge folds it into the main postings.
+        """
+        state = self._state
+        if state.bm25 is None:
+            return []
+        scores = state.bm25.scores(query)
+        if state.delta_bm25 is not None:
+            scores = np.concatenate([scores, state.delta_bm25.scores(query)])
+        scores[~state.alive] = 0
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [(state.epoch << ROW_BITS) | int(i) for i in top[np.argsort(-scores[top])]]
+
+    def idf(self, term: str) -> float:
+        bm25 = self._state.bm25
+        return bm25.idf(term) if bm25 is not None else 1.0
+
+    # Documents
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        Source path of a live document given its path or, when unambiguous,
+        its file name; None if nothing matches. ValueError if several do.
+        """
+        state = self._state
+        paths = [path for path in {**state.docs, **state.delta_docs} if self._is_live(state, path)]
+        if name in paths:
+            return name
+        matches = [path for path in paths if os.path.basename(path) == name]
+        if len(matches) > 1:
+            raise ValueError(f"{name} matches several documents: {', '.join(sorted(matches))}")
+        return matches[0] if matches else None
+
+    def name_conflict(self, path: str) -> Optional[str]:
+        """Another source document with the same file name as the upload `path`, if any."""
+        name = os.path.basename(path)
+        for source in self.base_sources:
+            if source != path and os.path.basename(source) == name:
+                return source
+        return None
+
+    @staticmethod
+    def _is_live(state: _Segments, path: str) -> bool:
+        rows = state.rows(path)
+        return rows is not None and bool(state.alive[rows[0]:rows[1]].any())
+
+    def documents(self) -> List[Dict]:
+        state = self._state
+        listing = []
+        for segment, docs in (("main", state.docs), ("delta", state.delta_docs)):
+            for name, (start, stop) in docs.items():
+                if stop > start and state.alive[start:stop].any():
+                    listing.append({"document": name, "segment": segment, "chunks": stop - start})
+        return listing
+
+    def add_document(self, path: str, chunks: List[str], vectors: np.ndarray) -> Dict:
+        """Append a document to the shared delta; an existing document with the same path is replaced."""
+        vectors = np.ascontiguousarray(vectors, dtype="float32").reshape(len(chunks), -1)
+        self._shared.add(path, list(chunks), vectors)
+        self._sync()
+        if len(self._state.delta_chunks) >= self.merge_threshold:
+            self._merge_wanted.set()
+        return {"document": path, "segment": "delta", "chunks": len(chunks)}
+
+    def delete_document(self, path: str) -> bool:
+        # Another worker may have added or deleted it since this one last synced.
+        self._sync()
+        if not self._is_live(self._state, path):
+            return False
+        self._shared.delete([path])
+        self._sync()
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.upload_dir) and os.path.exists(path):
+            os.remove(path)
+        return True
+
+    # Merging
+
+    def request_merge(self):
+        self._merge_wanted.set()
+
+    def _merge_loop(self):
+        while True:
+            self._merge_wanted.wait(timeout=self.merge_interval)
+            self._merge_wanted.clear()
+            state = self._state
+            if state.delta_chunks or not state.alive.all():
+                try:
+                    self.merge()
+                except Exception as e:
+                    logger.error(f"❌ Segment merge failed, keeping current segments: {e}")
+
+    def merge(self):
+        """
+        Fold the shared delta and tombstones into a new main segment. Skipped
+        when another worker is already merging. Documents added or deleted
+        while the merge runs stay in the shared delta for the next one.
+        """
+        with self._merge_lock:
+            started = time.perf_counter()
+            with _file_lock(self._lock_path, blocking=False) as locked:
+                if not locked:
+                    logger.info("Another worker is merging the QA segments")
+                    return
+                snapshot = self._shared.snapshot()
+                main_sources = set(snapshot["main"] or [])
+                if not snapshot["documents"] and not main_sources & snapshot["tombstones"]:
+                    return
+                sources = self._live_sources(snapshot, include_delta=True)
+                cached = {
+                    text: vectors[i]
+                    for _, _, chunks, vectors in snapshot["documents"]
+                    for i, text in enumerate(chunks)
+                }
+                merged = self._load_main(sources, cached)
+                generation = self._shared.record_main(sources, merged_through=snapshot["revision"])
+            with self._sync_lock:
+                self._main, self._main_generation = merged, generation
+            self._sync()
+            self._merges += 1
+            self._last_merge_s = round(time.perf_counter() - started, 3)
+            logger.info(f"🔀 Merged segments into {len(merged.chunks)} main chunks in {self._last_merge_s}s")
+
+    def stats(self) -> Dict:
+        state = self._state
+        return {
+            "epoch": state.epoch,
+            "revision": self._revision,
+            "main_chunks": len(state.chunks),
+            "delta_chunks": len(state.delta_chunks),
+            "tombstoned_chunks": int(len(state.alive) - state.alive.sum()),
+            "merges": self._merges,
+            "last_merge_s": self._last_merge_s,
+        }
@@ -0,0 +1,99 @@
+import random
+import asyncio
+import logging
+from typing import AsyncIterator
+
+import httpx
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError, RateLimitError
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+logger = logging.getLogger("QA-LLM")
+
+
+class AsyncLLMClient:
+    """
+    Non-blocking chat-completions client for any OpenAI-compatible server.
+
+    Reuses keep-alive connections from one pooled HTTP client, caps in-flight
+    completions at `max_concurrency` and retries connection errors, timeouts,
+    429s and 5xx with jittered exponential backoff. Streams are only retried
+    until the first token has been handed to the caller.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        model: str,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+    ):
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        )
+        # Retries are handled here so streaming and backoff share one policy.
+        self._client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=self._http, max_retries=0)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _backoff(self, attempt: int, error: Exception):
+        delay = self.backoff_seconds * (2 ** attempt) * (1 + random.random())
+        logger.warning(f"LLM call failed ({error.__class__.__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def complete(self, prompt: str, temperature: float = 0.7, max_tokens: int = 512) -> str:
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._client.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                    )
+                    return response.choices[0].message.content.strip()
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    await self._backoff(attempt, e)
+
+    async def stream(self, prompt: str, temperature: float = 0.7, max_tokens: int = 512) -> AsyncIterator[str]:
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                started = False
+                try:
+                    response = await self._client.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                    )
+                    async for chunk in response:
+                        if not chunk.choices:
+                            continue
+                        token = chunk.choices[0].delta.content
+                        if token:
+                            started = True
+                            yield token
+                    return
+                except RETRYABLE_ERRORS as e:
+                    if started or attempt == self.max_retries:
+                        raise
+                    await self._backoff(attempt, e)
+
+    async def aclose(self):
+        await self._http.aclose()
+
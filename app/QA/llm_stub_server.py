@@ -0,0 +1,85 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import random
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+# Offline stand-in for OpenRouter: point LLM_BASE_URL at http://127.0.0.1:8090/v1
+FIRST_TOKEN_MS = float(os.getenv("STUB_FIRST_TOKEN_MS", "300"))
+TOKEN_DELAY_MS = float(os.getenv("STUB_TOKEN_DELAY_MS", "20"))
+NUM_TOKENS = int(os.getenv("STUB_NUM_TOKENS", "60"))
+FAILURE_RATE = float(os.getenv("STUB_FAILURE_RATE", "0"))
+WORDS = "Wolaytta is an Omotic language spoken in the Wolaita Zone of southern Ethiopia by several million people".split()
+
+app = FastAPI(title="Stub OpenAI-compatible LLM")
+
+
+class Message(BaseModel):
+    role: str
+    content: str
+
+
+class ChatRequest(BaseModel):
+    model: str
+    messages: List[Message]
+    stream: bool = False
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+
+def _tokens(max_tokens: Optional[int]) -> List[str]:
+    count = min(NUM_TOKENS, max_tokens or NUM_TOKENS)
+    return [WORDS[i % len(WORDS)] + " " for i in range(count)]
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(payload: ChatRequest):
+    if random.random() < FAILURE_RATE:
+        raise HTTPException(status_code=503, detail="Injected stub failure")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    tokens = _tokens(payload.max_tokens)
+
+    if not payload.stream:
+        await asyncio.sleep((FIRST_TOKEN_MS + TOKEN_DELAY_MS * len(tokens)) / 1000)
+        prompt_tokens = sum(len(m.content.split()) for m in payload.messages)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)},
+        }
+
+    async def events():
+        await asyncio.sleep(FIRST_TOKEN_MS / 1000)
+        yield _chunk(completion_id, payload.model, {"role": "assistant", "content": ""})
+        for token in tokens:
+            yield _chunk(completion_id, payload.model, {"content": token})
+            await asyncio.sleep(TOKEN_DELAY_MS / 1000)
+        yield _chunk(completion_id, payload.model, {}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("llm_stub_server:app", host="127.0.0.1", port=8090)
@@ -0,0 +1,65 @@
+import time
+import asyncio
+import argparse
+import statistics
+from typing import Dict, List
+
+import httpx
+
+DEFAULT_QUESTIONS = [
+    "What is the origin of the Wolaytta language?",
+    "Who were the kings of Wolaita?",
+    "Describe the long distance trade routes of Wolaita.",
+]
+
+
+async def _one_request(client: httpx.AsyncClient, url: str, question: str, stream: bool) -> Dict:
+    payload = {"question": question, "lang": "en"}
+    start = time.perf_counter()
+    first_byte = None
+    if stream:
+        async with client.stream("POST", url + "/stream", json=payload) as response:
+            async for line in response.aiter_lines():
+                if first_byte is None and line.startswith("data:"):
+                    first_byte = time.perf_counter() - start
+    else:
+        response = await client.post(url, json=payload)
+        first_byte = time.perf_counter() - start
+    return {"ttfb": first_byte, "total": time.perf_counter() - start, "status": response.status_code}
+
+
+def _percentiles(values: List[float]) -> Dict:
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"p50_ms": round(pick(0.50) * 1000, 1), "p99_ms": round(pick(0.99) * 1000, 1), "mean_ms": round(statistics.mean(values) * 1000, 1)}
+
+
+async def run(url: str, requests: int, concurrency: int, stream: bool) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=120) as client:
+        async def limited(i):
+            async with semaphore:
+                return await _one_request(client, url, DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)] + f" ({i})", stream)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(limited(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+    ok = [r for r in results if r["status"] == 200]
+    return {
+        "mode": "stream" if stream else "blocking",
+        "requests": requests,
+        "errors": requests - len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "ttfb": _percentiles([r["ttfb"] for r in ok]) if ok else {},
+        "total": _percentiles([r["total"] for r in ok]) if ok else {},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test /qa and /qa/stream, e.g. against the stub LLM server.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/api/qa/qa")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    for stream in (False, True):
+        print(asyncio.run(run(args.url, args.requests, args.concurrency, stream)))
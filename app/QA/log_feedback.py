@@ -1,12 +1,14 @@
-import csv
 import os
+import sys
 from datetime import datetime
 from typing import Literal
 import logging
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.core.event_log import EventLog
 FEEDBACK_LOG_PATH = "app/QA/feedback_logs.csv"
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("FeedbackLogger")
-os.makedirs(os.path.dirname(FEEDBACK_LOG_PATH), exist_ok=True)
+feedback_log = EventLog(FEEDBACK_LOG_PATH, ["timestamp", "user_id", "question", "answer", "feedback", "comment"])
 def log_feedback(
     question: str,
     answer: str,
@@ -24,14 +26,14 @@ def log_feedback(
         comment (str): Optional additional comment.
         user_id (str): ID or name of the user (optional).
     """
-    timestamp = datetime.now().isoformat()
-    file_exists = os.path.exists(FEEDBACK_LOG_PATH)
-    with open(FEEDBACK_LOG_PATH, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(["timestamp", "user_id", "question", "answer", "feedback", "comment"])
-        writer.writerow([timestamp, user_id, question, answer, user_feedback, comment])
-    
+    feedback_log.log(
+        timestamp=datetime.now().isoformat(),
+        user_id=user_id,
+        question=question,
+        answer=answer,
+        feedback=user_feedback,
+        comment=comment,
+    )
     logger.info(f"📝 Feedback logged: {user_feedback} - {comment}")
     return {"status": "success", "message": "Feedback logged."}
 if __name__ == "__main__":
@@ -1,96 +1,173 @@
 import torch
 import faiss
+import numpy as np
 from sentence_transformers import SentenceTransformer
-from openai import OpenAI
 import os
-import fitz
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, File, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel 
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-import pickle
-import csv
+import json
 import sys
+import time
+from datetime import datetime
+from functools import partial
+from typing import Optional
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from app.translation.translation import translate_text 
+from app.QA.rag_cache import load_or_build_corpus
+from app.QA.ingest import SUPPORTED_EXTENSIONS, chunk_documents, chunker_settings, discover_sources
+from app.QA.index_factory import index_spec
+from app.QA.query_batcher import QueryBatcher
+from app.QA.answer_cache import AnswerCache
+from app.QA.llm_client import AsyncLLMClient
+from app.QA.history_store import HistoryStore
+from app.QA.bm25_index import reciprocal_rank_fusion
+from app.QA.context_budget import ContextBudgeter
+from app.QA.live_index import LiveIndex
+from app.QA.sharded_index import ShardedIndex, build_shards, parse_addresses
+from app.core.event_log import EventLog
+from app.core.inference_executor import ClientDisconnected, executor, install_disconnect_handler
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "xxxxxxxxx")
+# Point at app/QA/llm_stub_server.py (http://127.0.0.1:8090/v1) to load-test offline.
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "openrouter/cypher-alpha:free")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
 PDF_PATH = r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\kuye.pdf"
 EMBEDDING_CACHE_PATH = r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\embeddings.pkl"
 FAISS_INDEX_PATH = r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\faiss_index.idx"
 QA_HISTORY_PATH = r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\qa_history.pkl"
+QA_HISTORY_DB_PATH = r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\qa_history.sqlite3"
 QA_LOG_PATH = r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\qa_logs.csv"
+VECTOR_STORE_PATH = r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\vector_store"
+RAG_MANIFEST_PATH = r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\rag_manifest.json"
+BM25_INDEX_PATH = r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\bm25_index"
+UPLOAD_DIR = os.getenv("QA_UPLOAD_DIR", r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\qa_uploads")
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-TOP_K = 3
+TOP_K = int(os.getenv("QA_TOP_K", "3"))
+# Dense and BM25 each contribute this many candidates to reciprocal rank fusion; 0 disables BM25.
+HYBRID_CANDIDATES = int(os.getenv("QA_HYBRID_CANDIDATES", "20"))
+CORPUS_DIR = os.getenv("QA_CORPUS_DIR")
+# Cold starts chunk in-process; use `python -m app.QA.ingest` for parallel ingestion.
+INGEST_WORKERS = int(os.getenv("QA_INGEST_WORKERS", "1"))
+# One of flat, ivf_flat, ivf_pq, hnsw; see app/QA/bench_index.py to compare them.
+INDEX_BACKEND = os.getenv("QA_INDEX_BACKEND", "flat")
+# float16/int8 shrink the shared vector store at a small recall cost.
+STORE_DTYPE = os.getenv("QA_STORE_DTYPE", "float32")
+QUERY_BATCH_SIZE = int(os.getenv("QA_QUERY_BATCH_SIZE", "32"))
+QUERY_BATCH_WAIT_MS = float(os.getenv("QA_QUERY_BATCH_WAIT_MS", "5"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("QA_ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_SIZE = int(os.getenv("QA_ANSWER_CACHE_SIZE", "10000"))
+ANSWER_CACHE_TTL = float(os.getenv("QA_ANSWER_CACHE_TTL", str(24 * 3600)))
+# Upper bound on retrieved context per prompt, in embedding-tokenizer tokens.
+CONTEXT_MAX_TOKENS = int(os.getenv("QA_CONTEXT_MAX_TOKENS", "320"))
+# Uploaded documents sit in a delta segment until this many chunks or seconds accumulate.
+MERGE_THRESHOLD = int(os.getenv("QA_MERGE_THRESHOLD", "2000"))
+MERGE_INTERVAL = float(os.getenv("QA_MERGE_INTERVAL", "600"))
+SHARDS = os.getenv("QA_SHARDS")
+SHARD_DIR = os.getenv("QA_SHARD_DIR", r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\shards")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("QA-RAG")
-def extract_text_from_pdf(pdf_path):
-    text = ""
-    with fitz.open(pdf_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
-def chunk_text(text, chunk_size=500):
-    paragraphs = text.split("\n\n")
-    chunks, current = [], ""
-    for para in paragraphs:
-        if len(current) + len(para) < chunk_size:
-            current += para + "\n"
-        else:
-            chunks.append(current.strip())
-            current = para
-    if current:
-        chunks.append(current.strip())
-    return chunks
-logger.info("📥 Reading PDF and preparing chunks...")
-raw_text = extract_text_from_pdf(PDF_PATH)
-docs = chunk_text(raw_text)
-logger.info(f"📚 Loaded and chunked {len(docs)} segments from PDF")
-logger.info("🔍 Generating embeddings and preparing FAISS index...")
+logger.info("🔍 Loading embedder and preparing FAISS index...")
 embedder = SentenceTransformer(EMBEDDING_MODEL)
 
-if os.path.exists(EMBEDDING_CACHE_PATH) and os.path.exists(FAISS_INDEX_PATH):
-    with open(EMBEDDING_CACHE_PATH, "rb") as file:
-        embeddings = pickle.load(file)
-    index = faiss.read_index(FAISS_INDEX_PATH)
-    logger.info("✅ Loaded cached embeddings and FAISS index.")
-else:
-    embeddings = embedder.encode(docs, convert_to_tensor=True).cpu().numpy()
-    os.makedirs(os.path.dirname(EMBEDDING_CACHE_PATH), exist_ok=True)
-    with open(EMBEDDING_CACHE_PATH, "wb") as file:
-        pickle.dump(embeddings, file)
-
-    index = faiss.IndexFlatL2(embeddings.shape[1])
-    index.add(embeddings)
-    faiss.write_index(index, FAISS_INDEX_PATH)
-    logger.info(f"✅ FAISS index built and cached with {len(docs)} chunks")
-client = OpenAI(api_key=OPENROUTER_API_KEY, base_url="https://openrouter.ai/api/v1")
-if os.path.exists(QA_HISTORY_PATH):
-    with open(QA_HISTORY_PATH, "rb") as file:
-        qa_history = pickle.load(file)
-else:
-    qa_history = []
+def encode_chunks(texts, cached=None):
+    """Embed chunk texts, reusing vectors already computed for the live delta."""
+    cached = cached or {}
+    missing = [text for text in texts if text not in cached]
+    if missing:
+        vectors = embedder.encode(missing, batch_size=64, convert_to_tensor=True).cpu().numpy()
+        cached = {**cached, **dict(zip(missing, vectors))}
+    return np.stack([cached[text] for text in texts]) if texts else np.zeros((0, embedder.get_sentence_embedding_dimension()), dtype="float32")
 
-def retrieve_chunks(question, k=TOP_K):
-    query_embed = embedder.encode(question, convert_to_tensor=True).cpu().numpy()
-    D, I = index.search(query_embed.reshape(1, -1), k)
-    return [docs[i] for i in I[0] if i < len(docs)]
+def build_corpus(sources, cached_vectors):
+    docs, store, index = load_or_build_corpus(
+        sources=sources,
+        chunk_documents=partial(chunk_documents, tokenizer_name=EMBEDDING_MODEL, workers=INGEST_WORKERS),
+        chunker_settings=chunker_settings(EMBEDDING_MODEL),
+        encode=partial(encode_chunks, cached=cached_vectors),
+        embedding_model=EMBEDDING_MODEL,
+        store_path=VECTOR_STORE_PATH,
+        index_path=FAISS_INDEX_PATH,
+        manifest_path=RAG_MANIFEST_PATH,
+        index_spec=index_spec(INDEX_BACKEND),
+        store_dtype=STORE_DTYPE,
+        legacy_store_path=EMBEDDING_CACHE_PATH,
+    )
+    if sharded_index is None:
+        return docs, store, index
+    # The view searches only the shard files built from this store, so the
+    # chunk list LiveIndex publishes with it always matches, whatever the
+    # other workers sharing the shard processes have published.
+    meta = build_shards(store, SHARD_DIR, len(sharded_index.addresses), index_spec(INDEX_BACKEND))
+    return docs, store, sharded_index.view(meta)
 
-def generate_answer(question, lang="en"):
-    if not question.strip():
-        return "Please enter a valid question."
+# Set QA_SHARDS=host:port,... to search shard processes (app/QA/sharded_index.py serve) instead of in-process.
+sharded_index = ShardedIndex(parse_addresses(SHARDS)) if SHARDS else None
+live_index = LiveIndex(
+    build_corpus=build_corpus,
+    base_sources=discover_sources(CORPUS_DIR) if CORPUS_DIR else [PDF_PATH],
+    upload_dir=UPLOAD_DIR,
+    manifest_path=RAG_MANIFEST_PATH,
+    bm25_path=BM25_INDEX_PATH if HYBRID_CANDIDATES else None,
+    merge_threshold=MERGE_THRESHOLD,
+    merge_interval=MERGE_INTERVAL,
+)
+logger.info(f"📚 {len(live_index)} segments ready for retrieval")
+query_batcher = QueryBatcher(
+    encode=lambda questions: embedder.encode(questions, convert_to_tensor=True).cpu().numpy(),
+    search=live_index.search,
+    max_batch_size=QUERY_BATCH_SIZE,
+    max_wait_ms=QUERY_BATCH_WAIT_MS,
+)
+count_tokens = lambda text: len(embedder.tokenizer.encode(text, add_special_tokens=False))
+context_budgeter = ContextBudgeter(
+    count_tokens=count_tokens,
+    max_tokens=CONTEXT_MAX_TOKENS,
+    term_weight=live_index.idf,
+)
+llm_client = AsyncLLMClient(
+    api_key=OPENROUTER_API_KEY,
+    base_url=LLM_BASE_URL,
+    model=LLM_MODEL,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    timeout=LLM_TIMEOUT,
+)
+history_store = HistoryStore(QA_HISTORY_DB_PATH)
+qa_log = EventLog(QA_LOG_PATH, ["timestamp", "question", "answer", "lang"])
+history_store.migrate_pickle(QA_HISTORY_PATH)
+answer_cache = AnswerCache(
+    corpus_version=live_index.version,
+    similarity_threshold=ANSWER_CACHE_THRESHOLD,
+    max_entries=ANSWER_CACHE_SIZE,
+    ttl_seconds=ANSWER_CACHE_TTL,
+)
+answer_cache.seed(
+    history_store.query(since=time.time() - ANSWER_CACHE_TTL, limit=ANSWER_CACHE_SIZE),
+    lambda questions: embedder.encode(questions, convert_to_tensor=True).cpu().numpy(),
+)
+# Answers given before a document was added or removed may be stale.
+live_index.on_change = answer_cache.invalidate
 
-    if lang != "en":
-        question_en = translate_text(question, source_lang=lang, target_lang="en")
-    else:
-        question_en = question
+def rank_chunks(dense_ids, lexical_query, k=TOP_K):
+    """
+    Fuse the dense ranking with BM25 over `lexical_query` (reciprocal rank
+    fusion), so exact Wolaytta names and terms the embedder blurs still count.
+    """
+    dense_ids = [int(i) for i in dense_ids if i >= 0]
+    ranked = reciprocal_rank_fusion([dense_ids, live_index.lexical_search(lexical_query, HYBRID_CANDIDATES)]) if HYBRID_CANDIDATES else dense_ids
+    chunks = [live_index.chunk(i) for i in ranked]
+    return [chunk for chunk in chunks if chunk is not None][:k]
 
-    chunks = retrieve_chunks(question_en)
-    if not chunks:
-        return "Sorry, I couldn't find relevant context to answer this question."
+def retrieve_chunks(question, k=TOP_K):
+    _, _, ids = query_batcher.search(question, max(k, HYBRID_CANDIDATES))
+    return rank_chunks(ids, question, k)
 
-    context = "\n\n".join(chunks)
-    prompt = f"""
+def build_prompt(context, question_en):
+    return f"""
     You are a multilingual assistant for Wolaytta and English users.
     Answer the QUESTION using CONTEXT if available, or your own knowledge if not.And. Answer carefully and concisely.Don't hallucinate.
 
@@ -102,29 +179,107 @@ def generate_answer(question, lang="en"):
 
     ANSWER:
     """
-    try:
-        response = client.chat.completions.create(
-            model="openrouter/cypher-alpha:free",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=512,
-        )
-        answer_en = response.choices[0].message.content.strip()
-        answer = translate_text(answer_en, source_lang="en", target_lang=lang) if lang != "en" else answer_en
-
-        os.makedirs(os.path.dirname(QA_LOG_PATH), exist_ok=True)
-        with open(QA_LOG_PATH, "a", newline='', encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow([question, answer])
-
-        qa_history.append({"question": question, "answer": answer, "lang": lang})
-        with open(QA_HISTORY_PATH, "wb") as file:
-            pickle.dump(qa_history, file)
 
+def prepare_answer(question, lang="en"):
+    """
+    Run the blocking steps before the LLM call. Returns either a final answer
+    string (validation message or cache hit) or a dict describing the prompt.
+    """
+    if not question.strip():
+        return "Please enter a valid question."
+
+    cached = answer_cache.get_exact(question, lang)
+    if cached is not None:
+        return cached
+
+    if lang != "en":
+        question_en = translate_text(question, source_lang=lang, target_lang="en")
+    else:
+        question_en = question
+
+    query_vector, _, ids = query_batcher.search(question_en, max(TOP_K, HYBRID_CANDIDATES))
+    cached = answer_cache.get_semantic(query_vector, lang)
+    if cached is not None:
+        return cached
+
+    # Names often survive only in the original wording, so BM25 sees both.
+    lexical_query = question_en if lang == "en" else f"{question_en} {question}"
+    chunks = rank_chunks(ids, lexical_query)
+    if not chunks:
+        return "Sorry, I couldn't find relevant context to answer this question."
+
+    context = context_budgeter.assemble(chunks, question_en)
+    prompt = build_prompt(context["context"], question_en)
+    return {
+        "question_en": question_en,
+        "query_vector": query_vector,
+        "prompt": prompt,
+        "prompt_tokens": count_tokens(prompt),
+    }
+
+def finish_answer(question, lang, prepared, answer_en):
+    """Translate the English answer back and record it in the logs, cache and history."""
+    answer = translate_text(answer_en, source_lang="en", target_lang=lang) if lang != "en" else answer_en
+
+    qa_log.log(timestamp=datetime.utcnow().isoformat(), question=question, answer=answer, lang=lang)
+
+    # A failed translation either way must not be served again from the cache or history.
+    if answer.startswith("[Translation failed") or prepared["question_en"].startswith("[Translation failed"):
         return answer
+    answer_cache.put(question, lang, answer, vector=prepared["query_vector"])
+    history_store.append({
+        "question": question,
+        "answer": answer,
+        "lang": lang,
+        "question_en": prepared["question_en"],
+        "timestamp": time.time(),
+        "corpus_version": answer_cache.corpus_version,
+        "prompt_tokens": prepared["prompt_tokens"],
+    })
+    return answer
+
+async def generate_answer(question, lang="en", request=None):
+    prepared = await executor.run("qa", prepare_answer, question, lang, request=request)
+    if isinstance(prepared, str):
+        return prepared
+    try:
+        answer_en = await llm_client.complete(prepared["prompt"], temperature=0.7, max_tokens=512)
     except Exception as e:
         logger.error(f"OpenRouter API error: {e}")
         return "❌ Failed to generate answer from OpenRouter."
+    return await executor.run("qa", finish_answer, question, lang, prepared, answer_en)
+
+def _sse(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_answer(question, lang="en", request=None):
+    """
+    Server-Sent Events: one `token` event per LLM token (English), then a
+    `done` event with the final answer in the requested language. The
+    stream ends quietly if the client disconnects.
+    """
+    try:
+        prepared = await executor.run("qa", prepare_answer, question, lang, request=request)
+    except ClientDisconnected:
+        return
+    if isinstance(prepared, str):
+        yield _sse({"answer": prepared}, event="done")
+        return
+    tokens = []
+    try:
+        async for token in llm_client.stream(prepared["prompt"], temperature=0.7, max_tokens=512):
+            tokens.append(token)
+            yield _sse({"token": token}, event="token")
+    except Exception as e:
+        logger.error(f"OpenRouter API error: {e}")
+        yield _sse({"detail": "❌ Failed to generate answer from OpenRouter."}, event="error")
+        return
+    try:
+        answer = await executor.run("qa", finish_answer, question, lang, prepared, "".join(tokens).strip(), request=request)
+    except ClientDisconnected:
+        return
+    yield _sse({"answer": answer}, event="done")
 
 class QuestionRequest(BaseModel):
     question: str
@@ -133,14 +288,82 @@ class QuestionRequest(BaseModel):
 router = APIRouter()
 
 @router.post("/qa")
-async def qa_endpoint(payload: QuestionRequest):
+async def qa_endpoint(payload: QuestionRequest, request: Request):
     try:
-        answer = generate_answer(payload.question, lang=payload.lang)
+        answer = await generate_answer(payload.question, lang=payload.lang, request=request)
         return {"question": payload.question, "answer": answer, "lang": payload.lang}
+    except ClientDisconnected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to answer question: {str(e)}")
 
+@router.post("/qa/stream")
+async def qa_stream_endpoint(payload: QuestionRequest, request: Request):
+    return StreamingResponse(
+        stream_answer(payload.question, lang=payload.lang, request=request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/qa/history")
+def qa_history(lang: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None, limit: int = 100):
+    return {"history": history_store.query(since=since, until=until, lang=lang, limit=limit)}
+
+def ingest_upload(path):
+    _, chunks = next(iter(chunk_documents([path], tokenizer_name=EMBEDDING_MODEL, workers=1)))
+    if not chunks:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail="No text could be extracted from the document.")
+    return live_index.add_document(path, chunks, encode_chunks(chunks))
+
+@router.post("/documents")
+async def add_document(request: Request, file: UploadFile = File(...)):
+    name = os.path.basename(file.filename or "")
+    if not name.lower().endswith(SUPPORTED_EXTENSIONS):
+        raise HTTPException(status_code=400, detail=f"Supported document types: {', '.join(SUPPORTED_EXTENSIONS)}")
+    path = os.path.join(UPLOAD_DIR, name)
+    conflict = live_index.name_conflict(path)
+    if conflict is not None:
+        raise HTTPException(status_code=409, detail=f"{name} is already the name of corpus document {conflict}; rename the upload.")
+    # Written aside first so a concurrent merge never reads a partial file.
+    with open(f"{path}.part", "wb") as f:
+        f.write(await file.read())
+    os.replace(f"{path}.part", path)
+    return await executor.run("ingest", ingest_upload, path, request=request)
+
+@router.get("/documents")
+def list_documents():
+    return {"documents": live_index.documents(), "segments": live_index.stats()}
+
+@router.delete("/documents/{name:path}")
+def delete_document(name: str):
+    """`name` is a document's source path, or its file name when that is unambiguous."""
+    try:
+        path = live_index.resolve(name)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=f"{e}; delete by source path.")
+    if path is None or not live_index.delete_document(path):
+        raise HTTPException(status_code=404, detail=f"No document named {name}")
+    return {"document": path, "deleted": True}
+
+@router.post("/documents/merge")
+def merge_documents():
+    live_index.request_merge()
+    return {"merge": "scheduled", "segments": live_index.stats()}
+
+@router.get("/qa/stats")
+def qa_stats():
+    return {
+        "query_batching": query_batcher.stats(),
+        "answer_cache": answer_cache.stats(),
+        "context_budget": context_budgeter.stats(),
+        "segments": live_index.stats(),
+        "log": qa_log.stats(),
+        "executor": executor.stats(),
+    }
+
 app = FastAPI(title="QA RAG API")
+install_disconnect_handler(app)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
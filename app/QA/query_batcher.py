@@ -0,0 +1,125 @@
+import time
+import queue
+import logging
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+# Number of recent queue waits kept for the percentile stats.
+WAIT_SAMPLES = 2048
+
+logger = logging.getLogger("QA-QueryBatcher")
+
+
+class _Query:
+    __slots__ = ("question", "k", "future", "enqueued")
+
+    def __init__(self, question: str, k: int):
+        self.question = question
+        self.k = k
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class QueryBatcher:
+    """
+    Collects questions arriving from concurrent requests for up to `max_wait_ms`
+    (or until `max_batch_size` are waiting), embeds them in one `encode` call
+    and runs one batched `search`. Each caller gets back its own
+    (query vector, distances, ids).
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        search: Callable[[np.ndarray, int], Tuple[np.ndarray, np.ndarray]],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+    ):
+        self.encode = encode
+        self.search_fn = search
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_Query]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._waits_ms = deque(maxlen=WAIT_SAMPLES)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="qa-query-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, question: str, k: int) -> Future:
+        self._ensure_started()
+        item = _Query(question, k)
+        self._queue.put(item)
+        return item.future
+
+    def search(self, question: str, k: int, timeout: float = None):
+        return self.submit(question, k).result(timeout=timeout)
+
+    def _collect(self) -> List[_Query]:
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Past the deadline, still take whatever is already queued.
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [item for item in self._collect() if item.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._waits_ms.extend((started - item.enqueued) * 1000 for item in batch)
+            try:
+                vectors = np.asarray(self.encode([item.question for item in batch]), dtype="float32")
+                distances, ids = self.search_fn(vectors, max(item.k for item in batch))
+            except Exception as e:
+                logger.error(f"Batched retrieval failed: {e}")
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+            for row, item in enumerate(batch):
+                item.future.set_result((vectors[row], distances[row, :item.k], ids[row, :item.k]))
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            sizes = dict(sorted(self._batch_sizes.items()))
+            waits = np.array(self._waits_ms) if self._waits_ms else np.zeros(1)
+        batches = sum(sizes.values())
+        queries = sum(size * count for size, count in sizes.items())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "queries": queries,
+            "mean_batch_size": round(queries / batches, 3) if batches else 0.0,
+            "batch_size_histogram": sizes,
+            "queue_wait_ms": {
+                "mean": round(float(waits.mean()), 3),
+                "p50": round(float(np.percentile(waits, 50)), 3),
+                "p99": round(float(np.percentile(waits, 99)), 3),
+            },
+            "pending": self._queue.qsize(),
+        }
@@ -0,0 +1,219 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.QA.index_factory import build_index, configure_search, index_spec as default_index_spec
+from app.QA.vector_store import MmapFlatIndex, VectorStore, load_store, migrate_pickle, save_store
+
+CACHE_VERSION = 1
+DEFAULT_EMBED_BATCH_SIZE = 256
+
+logger = logging.getLogger("QA-RAG-Cache")
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Hash a source document without parsing it."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _atomic_write(path: str, write: Callable, mode: str = "wb"):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode) as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Ignoring unreadable cache manifest {path}: {e}")
+        return None
+    if manifest.get("version") != CACHE_VERSION:
+        logger.info("♻️ Cache manifest version changed, rebuilding.")
+        return None
+    return manifest
+
+
+def corpus_fingerprint(manifest_path: str) -> str:
+    """Identify the indexed corpus, so caches keyed on it can detect rebuilds."""
+    with open(manifest_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def save_manifest(path: str, manifest: Dict):
+    _atomic_write(path, lambda f: json.dump(manifest, f, indent=2), mode="w")
+
+
+def open_index(index_path: str, spec: Dict, store: VectorStore):
+    """
+    Flat search runs directly on the mapped store. IVF inverted lists are
+    mapped from the index file; HNSW graphs still have to be read into RAM.
+    """
+    if spec["backend"] == "flat":
+        return MmapFlatIndex(store)
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if spec["backend"].startswith("ivf") else 0
+    return configure_search(faiss.read_index(index_path, flags), spec)
+
+
+def _write_index(index_path: str, spec: Dict, store: VectorStore):
+    if spec["backend"] != "flat":
+        # Replace rather than overwrite: running workers may have the old file mapped.
+        tmp_path = f"{index_path}.tmp"
+        faiss.write_index(build_index(np.ascontiguousarray(store.dense()), spec), tmp_path)
+        os.replace(tmp_path, index_path)
+    return open_index(index_path, spec, store)
+
+
+def is_fresh(manifest: Optional[Dict], doc_hashes: Dict[str, str], chunker: Dict, embedding_model: str) -> bool:
+    if not manifest:
+        return False
+    return (
+        manifest.get("embedding_model") == embedding_model
+        and manifest.get("chunker") == chunker
+        and {path: doc["sha256"] for path, doc in manifest.get("documents", {}).items()} == doc_hashes
+    )
+
+
+def load_or_build_corpus(
+    sources: List[str],
+    chunk_documents: Callable[[List[str]], Iterable[Tuple[str, List[str]]]],
+    chunker_settings: Dict,
+    encode: Callable[[List[str]], np.ndarray],
+    embedding_model: str,
+    store_path: str,
+    index_path: str,
+    manifest_path: str,
+    embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+    index_spec: Optional[Dict] = None,
+    store_dtype: str = "float32",
+    legacy_store_path: Optional[str] = None,
+) -> Tuple[List[str], VectorStore, "faiss.Index"]:
+    """
+    Return (docs, vector store, index) for the given sources.
+
+    A warm start only hashes the source files and loads the cached chunks,
+    vectors and index. Otherwise only changed documents are handed to
+    `chunk_documents`, which yields (path, chunks) as each one is ready, and
+    new chunk texts are embedded in batches of `embed_batch_size` while the
+    remaining documents are still being chunked. A change of `index_spec`
+    alone rebuilds the index from the cached vectors.
+
+    Vectors live in a memory-mapped store under `store_path`, quantized to
+    `store_dtype`; an `embeddings.pkl` at `legacy_store_path` is migrated once.
+    """
+    index_spec = index_spec or default_index_spec()
+    doc_hashes = {path: file_sha256(path) for path in sources}
+    manifest = load_manifest(manifest_path)
+    previous = load_store(store_path)
+    if previous is None and legacy_store_path:
+        try:
+            previous = migrate_pickle(legacy_store_path, store_path, store_dtype)
+        except ValueError as e:
+            logger.warning(f"⚠️ Not migrating legacy embeddings, re-embedding instead: {e}")
+
+    same_dtype = previous is not None and previous.dtype == store_dtype
+    if same_dtype and is_fresh(manifest, doc_hashes, chunker_settings, embedding_model):
+        if manifest.get("index") == index_spec and (index_spec["backend"] == "flat" or os.path.exists(index_path)):
+            index = open_index(index_path, index_spec, previous)
+            if index.ntotal == len(previous):
+                logger.info(f"✅ Warm start: mapped {index.ntotal} cached chunks and {index_spec['backend']} index.")
+                return previous.chunks, previous, index
+        logger.info(f"🔧 {index_spec['backend']} index missing or stale, rebuilding from cached vectors.")
+        index = _write_index(index_path, index_spec, previous)
+        save_manifest(manifest_path, {**manifest, "index": index_spec})
+        return previous.chunks, previous, index
+
+    same_model = manifest is not None and manifest.get("embedding_model") == embedding_model
+    same_settings = same_model and manifest.get("chunker") == chunker_settings
+    previous_chunks, known = {}, {}
+    if previous is not None:
+        previous_chunks = dict(zip(previous.hashes, previous.chunks))
+        # Dequantized int8/float16 vectors are only reused when staying at that precision.
+        if same_model and (same_dtype or previous.dtype == "float32"):
+            vectors = previous.dense()
+            known = {h: vectors[i] for i, h in enumerate(previous.hashes)}
+
+    doc_chunks = {}
+    for path in sources:
+        cached_doc = manifest.get("documents", {}).get(path) if same_settings else None
+        if cached_doc and cached_doc["sha256"] == doc_hashes[path] and all(h in previous_chunks for h in cached_doc["chunks"]):
+            doc_chunks[path] = [previous_chunks[h] for h in cached_doc["chunks"]]
+            logger.info(f"📄 {os.path.basename(path)} unchanged, reusing {len(doc_chunks[path])} chunks")
+
+    pending = {}
+    embedded = 0
+
+    def flush():
+        nonlocal embedded
+        if not pending:
+            return
+        vectors = np.asarray(encode(list(pending.values())), dtype="float32")
+        known.update(zip(pending.keys(), vectors))
+        embedded += len(pending)
+        pending.clear()
+
+    def queue(chunks):
+        for text in chunks:
+            h = chunk_hash(text)
+            if h not in known:
+                pending[h] = text
+        if len(pending) >= embed_batch_size:
+            flush()
+
+    # Reused documents may still need vectors, e.g. after a store dtype change.
+    for chunks in doc_chunks.values():
+        queue(chunks)
+    to_parse = [path for path in sources if path not in doc_chunks]
+    if to_parse:
+        logger.info(f"📥 Parsing and chunking {len(to_parse)} documents...")
+    for path, chunks in chunk_documents(to_parse):
+        doc_chunks[path] = chunks
+        queue(chunks)
+    flush()
+
+    documents, docs, hashes = {}, [], []
+    for path in sources:
+        doc_chunk_hashes = [chunk_hash(c) for c in doc_chunks[path]]
+        documents[path] = {"sha256": doc_hashes[path], "chunks": doc_chunk_hashes}
+        docs.extend(doc_chunks[path])
+        hashes.extend(doc_chunk_hashes)
+    logger.info(f"🧮 Embedded {embedded} new chunks, reused {len(set(hashes)) - embedded}")
+
+    dim = next(iter(known.values())).shape[0] if known else 0
+    embeddings = np.zeros((len(docs), dim), dtype="float32")
+    for i, h in enumerate(hashes):
+        embeddings[i] = known[h]
+
+    save_store(store_path, hashes, docs, embeddings, store_dtype)
+    del embeddings, known
+    store = load_store(store_path)
+    index = _write_index(index_path, index_spec, store)
+    save_manifest(manifest_path, {
+        "version": CACHE_VERSION,
+        "embedding_model": embedding_model,
+        "chunker": chunker_settings,
+        "index": index_spec,
+        "store_dtype": store_dtype,
+        "documents": documents,
+        "num_chunks": len(docs),
+    })
+    logger.info(f"✅ {index_spec['backend']} index built and cached with {len(docs)} chunks")
+    return store.chunks, store, index
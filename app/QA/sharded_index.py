@@ -0,0 +1,489 @@
+import os
+import sys
+import glob
+import json
+import time
+import struct
+import socket
+import hashlib
+import logging
+import argparse
+import secrets
+import tempfile
+import ipaddress
+import threading
+import multiprocessing
+from collections import OrderedDict
+from multiprocessing.connection import AuthenticationError, Connection, answer_challenge, deliver_challenge
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.QA.bm25_index import corpus_id
+from app.QA.index_factory import build_index, configure_search, index_spec
+from app.QA.vector_store import VectorStore, load_store, save_store
+
+SHARDS_VERSION = 2
+DEFAULT_BASE_PORT = 7100
+# Shared secret for the shard connections; required, there is no default.
+AUTHKEY_ENV = "QA_SHARD_AUTHKEY"
+MIN_REMOTE_AUTHKEY_BYTES = 16
+# Shard file versions kept on disk (and loaded per shard process), so
+# workers still publishing the previous corpus can finish their searches.
+KEEP_VERSIONS = 2
+# Wire format, both directions: a fixed header (op or status, rows, k,
+# shard version), then raw arrays. Requests carry rows x dim float32
+# query vectors; search replies carry rows x k float32 distances followed
+# by rows x k int64 ids. Nothing received is ever unpickled.
+HEADER = struct.Struct("<cIIq")
+OP_SEARCH, OP_NTOTAL, OP_STOP = b"S", b"N", b"Q"
+STATUS_OK, STATUS_UNKNOWN_VERSION = b"O", b"V"
+MAX_QUERY_ROWS = 4096
+MAX_K = 4096
+MAX_REQUEST_BYTES = HEADER.size + MAX_QUERY_ROWS * 4096 * 4
+# Seconds allowed for the authkey handshake on either side.
+HANDSHAKE_TIMEOUT = 10.0
+REPORTS_DIR = "app/QA/reports/"
+
+logger = logging.getLogger("QA-Shards")
+
+
+class StaleShardVersion(RuntimeError):
+    """A shard no longer has the index files for the requested corpus version."""
+
+
+def _is_loopback(host: str) -> bool:
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def shard_authkey(host: Optional[str] = None) -> bytes:
+    """
+    The shared secret from QA_SHARD_AUTHKEY. Missing keys are refused, and
+    shards bound to a non-loopback `host` need at least 16 bytes of key.
+    """
+    key = os.getenv(AUTHKEY_ENV, "").encode("utf-8")
+    if not key:
+        raise RuntimeError(f"{AUTHKEY_ENV} must be set to a shared secret for the QA shard connections")
+    if host is not None and not _is_loopback(host) and len(key) < MIN_REMOTE_AUTHKEY_BYTES:
+        raise RuntimeError(f"Refusing to serve on {host}: {AUTHKEY_ENV} needs at least {MIN_REMOTE_AUTHKEY_BYTES} bytes off loopback")
+    return key
+
+
+def _version_tag(source_id: str, num_shards: int, spec: Dict) -> str:
+    """15 hex digits, so the version also fits the wire header as an int64."""
+    identity = json.dumps([source_id, num_shards, spec], sort_keys=True)
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()[:15]
+
+
+def _shard_path(shard_dir: str, shard: int, tag: str) -> str:
+    return os.path.join(shard_dir, f"shard-{shard}-{tag}.idx")
+
+
+def _meta_path(shard_dir: str, tag: Optional[str] = None) -> str:
+    return os.path.join(shard_dir, f"shards-{tag}.json" if tag else "shards.json")
+
+
+def load_shard_meta(shard_dir: str, version: Optional[int] = None) -> Optional[Dict]:
+    """The latest shard layout, or the one for a given `version`."""
+    meta_path = _meta_path(shard_dir, f"{version:015x}" if version is not None else None)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta if meta.get("version") == SHARDS_VERSION else None
+
+
+def _write_json(path: str, data: Dict):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _remove_old_versions(shard_dir: str, keep: int):
+    metas = sorted(glob.glob(_meta_path(shard_dir, "*")), key=os.path.getmtime, reverse=True)
+    for meta_path in metas[keep:]:
+        tag = os.path.basename(meta_path)[len("shards-"):-len(".json")]
+        for path in glob.glob(os.path.join(shard_dir, f"shard-*-{tag}.idx")) + [meta_path]:
+            try:
+                os.remove(path)
+            except OSError:
+                # Still open in a shard process (Windows); retry after the next build.
+                pass
+
+
+def build_shards(store: VectorStore, shard_dir: str, num_shards: int, spec: Optional[Dict] = None) -> Dict:
+    """
+    Split the store into `num_shards` contiguous row ranges and persist one
+    FAISS index per range. Files are named by a version derived from the
+    store's contents, so building never overwrites files a running search
+    uses; the previous version stays until the next build. Skipped when the
+    files already match the store.
+    """
+    spec = spec or index_spec("flat")
+    source_id = corpus_id(store.hashes)
+    tag = _version_tag(source_id, num_shards, spec)
+    meta = load_shard_meta(shard_dir, int(tag, 16))
+    if meta is not None and all(os.path.exists(_shard_path(shard_dir, shard, tag)) for shard in range(num_shards)):
+        if (load_shard_meta(shard_dir) or {}).get("tag") != tag:
+            _write_json(_meta_path(shard_dir), meta)
+        return meta
+    os.makedirs(shard_dir, exist_ok=True)
+    bounds = np.linspace(0, len(store), num_shards + 1).astype(int)
+    for shard in range(num_shards):
+        path = _shard_path(shard_dir, shard, tag)
+        index = build_index(np.ascontiguousarray(store.rows(int(bounds[shard]), int(bounds[shard + 1]))), spec)
+        faiss.write_index(index, f"{path}.tmp{os.getpid()}")
+        os.replace(f"{path}.tmp{os.getpid()}", path)
+    meta = {
+        "version": SHARDS_VERSION,
+        "tag": tag,
+        "shard_version": int(tag, 16),
+        "source_id": source_id,
+        "num_shards": num_shards,
+        "offsets": bounds.tolist(),
+        "index": spec,
+        "dim": store.dim,
+    }
+    _write_json(_meta_path(shard_dir, tag), meta)
+    _write_json(_meta_path(shard_dir), meta)
+    _remove_old_versions(shard_dir, KEEP_VERSIONS)
+    logger.info(f"✅ Wrote {num_shards} shards of {len(store)} vectors to {shard_dir} (version {tag})")
+    return meta
+
+
+def _io_timeout(conn: Connection, seconds: float):
+    """Bound blocking reads and writes on the connection's socket; 0 removes the bound."""
+    if sys.platform == "win32":
+        value = struct.pack("<I", int(seconds * 1000))
+    else:
+        value = struct.pack("ll", int(seconds), int(seconds % 1 * 1e6))
+    sock = socket.socket(fileno=conn.fileno())
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, value)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, value)
+    finally:
+        sock.detach()
+
+
+class _ShardVersions:
+    """The index files of one shard, opened per version on first use; the last KEEP_VERSIONS stay open."""
+
+    def __init__(self, shard_dir: str, shard: int):
+        self.shard_dir = shard_dir
+        self.shard = shard
+        self._open: "OrderedDict[int, Tuple[object, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: int) -> Optional[Tuple[object, int]]:
+        with self._lock:
+            return self._get(version)
+
+    def _get(self, version: int) -> Optional[Tuple[object, int]]:
+        if version in self._open:
+            self._open.move_to_end(version)
+            return self._open[version]
+        meta = load_shard_meta(self.shard_dir, version)
+        if meta is None or self.shard >= meta["num_shards"]:
+            return None
+        path = _shard_path(self.shard_dir, self.shard, meta["tag"])
+        if not os.path.exists(path):
+            return None
+        spec = meta["index"]
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if spec["backend"].startswith("ivf") else 0
+        self._open[version] = (configure_search(faiss.read_index(path, flags), spec), meta["offsets"][self.shard])
+        while len(self._open) > KEEP_VERSIONS:
+            self._open.popitem(last=False)
+        return self._open[version]
+
+
+def _answer(conn, versions: _ShardVersions, request: bytes) -> bool:
+    """Handle one request; False ends the connection (malformed request or stop)."""
+    if len(request) < HEADER.size:
+        return False
+    op, rows, k, version = HEADER.unpack_from(request)
+    if op == OP_STOP:
+        conn.send_bytes(HEADER.pack(STATUS_OK, 0, 0, version))
+        raise SystemExit
+    opened = versions.get(version)
+    if opened is None:
+        conn.send_bytes(HEADER.pack(STATUS_UNKNOWN_VERSION, 0, 0, version))
+        return True
+    index, offset = opened
+    if op == OP_NTOTAL:
+        conn.send_bytes(HEADER.pack(STATUS_OK, index.ntotal, 0, version))
+        return True
+    if op != OP_SEARCH or not 0 < rows <= MAX_QUERY_ROWS or not 0 < k <= MAX_K:
+        return False
+    payload = memoryview(request)[HEADER.size:]
+    if len(payload) != rows * index.d * 4:
+        return False
+    vectors = np.frombuffer(payload, dtype="<f4").reshape(rows, index.d)
+    k = min(k, index.ntotal)
+    if k == 0:
+        conn.send_bytes(HEADER.pack(STATUS_OK, rows, 0, version))
+        return True
+    distances, ids = index.search(vectors, k)
+    ids = np.where(ids >= 0, ids + offset, -1)
+    conn.send_bytes(
+        HEADER.pack(STATUS_OK, rows, k, version)
+        + np.ascontiguousarray(distances, dtype="<f4").tobytes()
+        + np.ascontiguousarray(ids, dtype="<i8").tobytes()
+    )
+    return True
+
+
+def _serve_connection(conn: Connection, versions: _ShardVersions, authkey: bytes, stop: threading.Event):
+    """One client (a QA worker): authenticate, then answer requests until it disconnects."""
+    with conn:
+        try:
+            _io_timeout(conn, HANDSHAKE_TIMEOUT)
+            deliver_challenge(conn, authkey)
+            answer_challenge(conn, authkey)
+            _io_timeout(conn, 0)
+        except (AuthenticationError, EOFError, OSError) as e:
+            logger.warning(f"Rejected shard connection: {e!r}")
+            return
+        while True:
+            try:
+                if not _answer(conn, versions, conn.recv_bytes(MAX_REQUEST_BYTES)):
+                    return
+            except (EOFError, OSError):
+                return
+            except SystemExit:
+                stop.set()
+                return
+
+
+def serve_shard(shard_dir: str, shard: int, host: str, port: int, threads: int = 1):
+    """
+    Shard process: answers searches against this shard's index files, for
+    whichever corpus version each request names (see HEADER for the format).
+    Every QA worker keeps its own connection, served by its own thread.
+    """
+    logging.basicConfig(level=logging.INFO)
+    authkey = shard_authkey(host)
+    # Parallelism comes from the shard processes, not from OpenMP inside each.
+    faiss.omp_set_num_threads(threads)
+    versions = _ShardVersions(shard_dir, shard)
+    latest = load_shard_meta(shard_dir)
+    if latest is not None:
+        versions.get(latest["shard_version"])
+    stop = threading.Event()
+    with socket.create_server((host, port), backlog=64) as server:
+        # Wake up now and then to notice a stop request.
+        server.settimeout(0.5)
+        logger.info(f"🧩 Shard {shard} serving {shard_dir} on {host}:{port}")
+        while not stop.is_set():
+            try:
+                sock, _ = server.accept()
+            except socket.timeout:
+                continue
+            sock.setblocking(True)
+            conn = Connection(sock.detach())
+            threading.Thread(target=_serve_connection, args=(conn, versions, authkey, stop), daemon=True).start()
+
+
+class ShardedIndex:
+    """
+    Coordinator for shard processes, local or on other hosts. `search` sends
+    the query batch to every shard before reading any reply, so shards scan
+    their parts in parallel, then keeps the global top-k per query.
+
+    Every search names the shard version (see `build_shards`) its caller's
+    chunk list belongs to; `view` binds one, so a published corpus and the
+    shard files it searches always match.
+    """
+
+    def __init__(self, addresses: Sequence[Tuple[str, int]], connect_timeout: float = 30.0):
+        self.addresses = list(addresses)
+        self._authkey = shard_authkey()
+        self._lock = threading.Lock()
+        self._conns = [self._connect(address, connect_timeout) for address in self.addresses]
+
+    def _connect(self, address: Tuple[str, int], timeout: float) -> Connection:
+        """Connect (retrying until the shard is up) and authenticate; a shard that never answers raises TimeoutError."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                sock = socket.create_connection(address, timeout=max(deadline - time.monotonic(), 0.1))
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        sock.setblocking(True)
+        conn = Connection(sock.detach())
+        try:
+            _io_timeout(conn, HANDSHAKE_TIMEOUT)
+            answer_challenge(conn, self._authkey)
+            deliver_challenge(conn, self._authkey)
+            _io_timeout(conn, 0)
+        except (BlockingIOError, socket.timeout) as e:
+            conn.close()
+            raise TimeoutError(f"Shard {address[0]}:{address[1]} did not complete the handshake within {HANDSHAKE_TIMEOUT}s") from e
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _broadcast(self, request: bytes, version: int) -> List[Tuple[int, int, bytes]]:
+        with self._lock:
+            for conn in self._conns:
+                conn.send_bytes(request)
+            replies = [conn.recv_bytes() for conn in self._conns]
+        parsed = []
+        for reply in replies:
+            status, rows, k, _ = HEADER.unpack_from(reply)
+            if status == STATUS_UNKNOWN_VERSION:
+                raise StaleShardVersion(f"Shard files for version {version:015x} are gone; reload the corpus")
+            parsed.append((rows, k, reply[HEADER.size:]))
+        return parsed
+
+    def ntotal(self, version: int) -> int:
+        return sum(rows for rows, _, _ in self._broadcast(HEADER.pack(OP_NTOTAL, 0, 0, version), version))
+
+    def search(self, vectors: np.ndarray, k: int, version: int) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.ascontiguousarray(vectors, dtype="<f4")
+        request = HEADER.pack(OP_SEARCH, len(vectors), k, version) + vectors.tobytes()
+        all_distances, all_ids = [], []
+        for rows, shard_k, body in self._broadcast(request, version):
+            split = rows * shard_k * 4
+            all_distances.append(np.frombuffer(body[:split], dtype="<f4").reshape(rows, shard_k))
+            all_ids.append(np.frombuffer(body[split:], dtype="<i8").reshape(rows, shard_k))
+        distances = np.hstack(all_distances)
+        ids = np.hstack(all_ids)
+        distances = np.where(ids >= 0, distances, np.inf)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def view(self, meta: Dict) -> "ShardView":
+        return ShardView(self, meta["shard_version"], meta["offsets"][-1])
+
+    def close(self, stop_shards: bool = False):
+        if stop_shards:
+            self._broadcast(HEADER.pack(OP_STOP, 0, 0, 0), 0)
+        for conn in self._conns:
+            conn.close()
+
+
+class ShardView:
+    """A faiss-like index over the shards, pinned to one version."""
+
+    def __init__(self, sharded: ShardedIndex, version: int, ntotal: int):
+        self.sharded = sharded
+        self.version = version
+        self.ntotal = ntotal
+
+    def search(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.sharded.search(vectors, k, self.version)
+
+
+def parse_addresses(spec: str) -> List[Tuple[str, int]]:
+    """Parse QA_SHARDS, e.g. "10.0.0.5:7100,10.0.0.6:7100"."""
+    addresses = []
+    for item in spec.split(","):
+        host, port = item.strip().rsplit(":", 1)
+        addresses.append((host, int(port)))
+    return addresses
+
+
+def launch_local_shards(shard_dir: str, host: str = "127.0.0.1", base_port: int = DEFAULT_BASE_PORT, threads: int = 1):
+    """Start one process per shard on this machine; returns (processes, addresses)."""
+    meta = load_shard_meta(shard_dir)
+    ctx = multiprocessing.get_context("spawn")
+    processes, addresses = [], []
+    for shard in range(meta["num_shards"]):
+        address = (host, base_port + shard)
+        process = ctx.Process(target=serve_shard, args=(shard_dir, shard, host, address[1], threads), daemon=True)
+        process.start()
+        processes.append(process)
+        addresses.append(address)
+    return processes, addresses
+
+
+def benchmark(store: VectorStore, shard_counts: Sequence[int], num_queries: int, batch_size: int, k: int, base_port: int) -> List[Dict]:
+    rng = np.random.default_rng(0)
+    queries = np.ascontiguousarray(store.rows(0, min(len(store), num_queries)), dtype="float32")
+    queries = queries + rng.normal(scale=0.01, size=queries.shape).astype("float32")
+    report = []
+    for num_shards in shard_counts:
+        with tempfile.TemporaryDirectory() as shard_dir:
+            meta = build_shards(store, shard_dir, num_shards)
+            processes, addresses = launch_local_shards(shard_dir, base_port=base_port)
+            sharded = ShardedIndex(addresses)
+            index = sharded.view(meta)
+            index.search(queries[:batch_size], k)
+            started = time.perf_counter()
+            for start in range(0, len(queries), batch_size):
+                index.search(queries[start:start + batch_size], k)
+            elapsed = time.perf_counter() - started
+            sharded.close(stop_shards=True)
+            for process in processes:
+                process.join(timeout=10)
+        report.append({"shards": num_shards, "vectors": len(store), "queries": len(queries), "qps": round(len(queries) / elapsed, 1)})
+        logger.info(report[-1])
+    base = report[0]["qps"] / report[0]["shards"]
+    for row in report:
+        row["scaling_efficiency"] = round(row["qps"] / (base * row["shards"]), 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, serve and benchmark a sharded QA vector index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Split the vector store into shard index files")
+    build.add_argument("--store", default="data/vector_store")
+    build.add_argument("--shard-dir", default="data/shards")
+    build.add_argument("--shards", type=int, default=4)
+    build.add_argument("--index-backend", default="flat")
+    serve = sub.add_parser("serve", help="Serve one shard (run one per shard, on any host)")
+    serve.add_argument("--shard-dir", default="data/shards")
+    serve.add_argument("--shard", type=int, required=True)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=None)
+    serve.add_argument("--threads", type=int, default=1)
+    bench = sub.add_parser("bench", help="Measure query throughput against the number of local shards")
+    bench.add_argument("--store", default="data/vector_store")
+    bench.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    bench.add_argument("--queries", type=int, default=2000)
+    bench.add_argument("--batch-size", type=int, default=32)
+    bench.add_argument("--k", type=int, default=20)
+    bench.add_argument("--base-port", type=int, default=DEFAULT_BASE_PORT)
+    bench.add_argument("--synthetic", type=int, default=0, help="Benchmark on this many random vectors instead of --store")
+    bench.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "serve":
+        serve_shard(args.shard_dir, args.shard, args.host, args.port or DEFAULT_BASE_PORT + args.shard, args.threads)
+        return
+    if args.command == "bench" and args.synthetic:
+        synthetic_dir = tempfile.mkdtemp()
+        vectors = np.random.default_rng(0).standard_normal((args.synthetic, args.dim), dtype="float32")
+        save_store(synthetic_dir, [str(i) for i in range(args.synthetic)], [""] * args.synthetic, vectors)
+        args.store = synthetic_dir
+    store = load_store(args.store)
+    if store is None:
+        logger.error(f"No vector store at {args.store}; run app/QA/ingest.py first.")
+        sys.exit(1)
+    if args.command == "build":
+        build_shards(store, args.shard_dir, args.shards, index_spec(args.index_backend))
+        return
+    # Local loopback shards only; a throwaway key is fine.
+    os.environ.setdefault(AUTHKEY_ENV, secrets.token_hex(16))
+    report = benchmark(store, args.shards, args.queries, args.batch_size, args.k, args.base_port)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    with open(os.path.join(REPORTS_DIR, "shard_benchmark.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for row in report:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import os
+import json
+import glob
+import pickle
+import logging
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+STORE_VERSION = 1
+STORE_DTYPES = ("float32", "float16", "int8")
+SEARCH_BLOCK_ROWS = 65536
+
+logger = logging.getLogger("QA-VectorStore")
+
+
+class VectorStore:
+    """
+    Chunk texts plus their embeddings, memory-mapped read-only from an .npy file
+    so every worker process shares one copy through the OS page cache.
+
+    float16 halves and int8 quarters the footprint; int8 uses a per-dimension
+    affine quantizer and rows are dequantized block by block at search time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        generation = self.meta["generation"]
+        with open(os.path.join(path, f"chunks-{generation}.json"), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        self.hashes: List[str] = chunks["hashes"]
+        self.chunks: List[str] = chunks["chunks"]
+        self.dtype: str = self.meta["dtype"]
+        self.codes = np.load(os.path.join(path, f"embeddings-{generation}.npy"), mmap_mode="r")
+        self.scale = self.offset = None
+        if self.dtype == "int8":
+            quant = np.load(os.path.join(path, f"quant-{generation}.npz"))
+            self.scale, self.offset = quant["scale"], quant["offset"]
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1]
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Return rows as float32; float32 stores return a zero-copy view."""
+        block = self.codes[start:stop]
+        if self.dtype == "float32":
+            return block
+        if self.dtype == "float16":
+            return block.astype("float32")
+        return (block.astype("float32") + 128.0) * self.scale + self.offset
+
+    def dense(self) -> np.ndarray:
+        return self.rows()
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact L2 search straight over the mapped vectors, shaped like faiss' `search`."""
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        if self.dtype == "float32":
+            return _pad(*faiss.knn(queries, self.codes, min(k, len(self))), k)
+        best_d = np.full((len(queries), k), np.inf, dtype="float32")
+        best_i = np.full((len(queries), k), -1, dtype="int64")
+        for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+            d, i = faiss.knn(queries, np.ascontiguousarray(self.rows(start, start + SEARCH_BLOCK_ROWS)), min(k, len(self) - start))
+            merged_d = np.concatenate([best_d, d], axis=1)
+            merged_i = np.concatenate([best_i, i + start], axis=1)
+            order = np.argsort(merged_d, axis=1)[:, :k]
+            best_d = np.take_along_axis(merged_d, order, axis=1)
+            best_i = np.take_along_axis(merged_i, order, axis=1)
+        return best_d, best_i
+
+
+def _pad(distances: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Widen results to exactly k columns, empty slots as faiss marks them (id -1, infinite distance)."""
+    missing = k - distances.shape[1]
+    if missing <= 0:
+        return distances, ids
+    return (
+        np.hstack([distances, np.full((len(distances), missing), np.inf, dtype="float32")]),
+        np.hstack([ids, np.full((len(ids), missing), -1, dtype="int64")]),
+    )
+
+
+class MmapFlatIndex:
+    """Exact-search stand-in for `faiss.IndexFlatL2` that does not copy the vectors."""
+
+    def __init__(self, store: VectorStore):
+        self.store = store
+        self.ntotal = len(store)
+        self.d = store.dim
+
+    def search(self, queries: np.ndarray, k: int):
+        return self.store.search(queries, k)
+
+
+def _quantize(embeddings: np.ndarray, dtype: str):
+    if dtype == "float32":
+        return embeddings.astype("float32"), None
+    if dtype == "float16":
+        return embeddings.astype("float16"), None
+    low, high = embeddings.min(axis=0), embeddings.max(axis=0)
+    scale = np.maximum(high - low, 1e-12) / 255.0
+    codes = np.clip(np.rint((embeddings - low) / scale) - 128, -128, 127).astype("int8")
+    return codes, {"scale": scale.astype("float32"), "offset": low.astype("float32")}
+
+
+def save_store(path: str, hashes: List[str], chunks: List[str], embeddings: np.ndarray, dtype: str = "float32"):
+    """
+    Write a new store generation and switch meta.json to it. Files of older
+    generations are left for processes still mapping them and removed later.
+    """
+    if dtype not in STORE_DTYPES:
+        raise ValueError(f"Unsupported store dtype '{dtype}', expected one of {STORE_DTYPES}")
+    os.makedirs(path, exist_ok=True)
+    meta_path = os.path.join(path, "meta.json")
+    previous_generation = 0
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            previous_generation = json.load(f)["generation"]
+    generation = previous_generation + 1
+
+    codes, quant = _quantize(np.asarray(embeddings), dtype)
+    out = np.lib.format.open_memmap(os.path.join(path, f"embeddings-{generation}.npy"), mode="w+", dtype=codes.dtype, shape=codes.shape)
+    out[:] = codes
+    out.flush()
+    del out
+    if quant is not None:
+        np.savez(os.path.join(path, f"quant-{generation}.npz"), **quant)
+    with open(os.path.join(path, f"chunks-{generation}.json"), "w", encoding="utf-8") as f:
+        json.dump({"hashes": hashes, "chunks": chunks}, f, ensure_ascii=False)
+
+    meta = {"version": STORE_VERSION, "generation": generation, "dtype": dtype, "count": len(chunks), "dim": int(codes.shape[1]) if codes.ndim == 2 else 0}
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+    _remove_old_generations(path, generation)
+
+
+def _remove_old_generations(path: str, keep: int):
+    for pattern in ("embeddings-*.npy", "quant-*.npz", "chunks-*.json"):
+        for file_path in glob.glob(os.path.join(path, pattern)):
+            generation = os.path.basename(file_path).split("-")[1].split(".")[0]
+            if generation.isdigit() and int(generation) < keep - 1:
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    # Still mapped by a running worker (Windows); retry on the next save.
+                    pass
+
+
+def load_store(path: str) -> Optional[VectorStore]:
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    store = VectorStore(path)
+    if store.meta.get("version") != STORE_VERSION:
+        logger.info("♻️ Vector store version changed, rebuilding.")
+        return None
+    return store
+
+
+def migrate_pickle(pickle_path: str, store_path: str, dtype: str = "float32") -> Optional[VectorStore]:
+    """
+    Convert an `embeddings.pkl` written by the previous cache (a dict of
+    hashes, chunks and embeddings) into a mapped store. Raises ValueError for
+    other shapes, such as the bare embedding array the original qa.py
+    pickled: without chunk texts its rows cannot be matched to chunks.
+    """
+    if not os.path.exists(pickle_path):
+        return None
+    with open(pickle_path, "rb") as f:
+        legacy = pickle.load(f)
+    if isinstance(legacy, np.ndarray):
+        raise ValueError(
+            f"{pickle_path} holds a bare {legacy.shape} embedding array without chunk texts; "
+            "only the {hashes, chunks, embeddings} cache format can be migrated"
+        )
+    if not isinstance(legacy, dict) or not {"hashes", "chunks", "embeddings"} <= set(legacy):
+        raise ValueError(
+            f"{pickle_path} is not a {{hashes, chunks, embeddings}} embedding cache "
+            f"(found {type(legacy).__name__}); it cannot be migrated"
+        )
+    save_store(store_path, legacy["hashes"], legacy["chunks"], legacy["embeddings"], dtype)
+    logger.info(f"📦 Migrated {len(legacy['chunks'])} vectors from {pickle_path} to {store_path}")
+    return load_store(store_path)
@@ -1,23 +1,20 @@
+import os
+import sys
 import pandas as pd
 import torch
 import torch.nn.functional as F
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
-MODEL_DIR = "models/sentiment_model"
-LABELS = ["negative", "neutral", "positive"]
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.core.model_registry import registry
+from app.Sentiment.infer_sentiment import LABELS, MODEL_DIR, device
+
 INPUT_CSV = "data/test_sentences.csv"  
 OUTPUT_CSV = "data/test_predictions.csv"
 
-# Load model & tokenizer
-tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
-model.eval()
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model.to(device)
-
 def predict(texts):
-    inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=128).to(device)
-    with torch.no_grad():
+    # The model is the registry's shared instance, registered by infer_sentiment.
+    with registry.use(MODEL_DIR) as (tokenizer, model), torch.no_grad():
+        inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=128).to(device)
         outputs = model(**inputs)
         probs = F.softmax(outputs.logits, dim=1)
         preds = torch.argmax(probs, dim=1)
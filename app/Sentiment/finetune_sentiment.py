@@ -1,36 +1,27 @@
-import pandas as pd
-from datasets import Dataset
+import os
+import sys
+import logging
 from transformers import (
     AutoTokenizer, AutoModelForSequenceClassification,
     TrainingArguments, Trainer, DataCollatorWithPadding
 )
 import torch
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.core.finetune_data import PaddingMeter, ThroughputCallback, classification_dataset, max_length_padding_ratio
 MODEL_NAME = "distilbert-base-multilingual-cased"
 DATA_PATH = r"C:\Users\admin\Desktop\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\wolayta_sentiment_labeled.csv"
 MODEL_DIR = "models/sentiment_model"
+REPORT_PATH = "app/Sentiment/reports/finetune_sentiment.json"
+MAX_LENGTH = 128
 NUM_LABELS = 3
 LABEL_MAP = {"negative": 0, "neutral": 1, "positive": 2}
-def load_dataset_from_csv(path):
-    df = pd.read_csv(path)
-    df = df[df['label'].isin(LABEL_MAP.keys())].copy()
-    df['label_id'] = df['label'].map(LABEL_MAP)
-    return Dataset.from_pandas(df[['text', 'label_id']].dropna())
-def tokenize_dataset(dataset, tokenizer):
-    def preprocess(examples):
-        return tokenizer(examples['text'], truncation=True, padding=True, max_length=128)
-    tokenized = dataset.map(preprocess, batched=True)
-    tokenized = tokenized.rename_column("label_id", "label")
-    tokenized.set_format("torch", columns=["input_ids", "attention_mask", "label"])
-    return tokenized.train_test_split(test_size=0.2, seed=42)
 def train_sentiment_model():
-    print("📥 Loading dataset...")
-    dataset = load_dataset_from_csv(DATA_PATH)
-
     print("🔤 Loading tokenizer...")
     tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
 
-    print("🧼 Tokenizing dataset...")
-    encoded = tokenize_dataset(dataset, tokenizer)
+    print("📥 Loading tokenized dataset...")
+    # Tokenised once and memory-mapped from data/tokenized afterwards; padding happens per batch in the collator.
+    encoded = classification_dataset(DATA_PATH, tokenizer, LABEL_MAP, max_length=MAX_LENGTH)
 
     print("🧠 Loading model...")
     model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, num_labels=NUM_LABELS)
@@ -44,7 +35,16 @@ def train_sentiment_model():
         #evaluation_strategy="epoch",
         #save_strategy="epoch",
         logging_steps=20,
-        report_to="none"
+        report_to="none",
+        # Batches of similar-length texts, so little of each batch is padding.
+        group_by_length=True,
+        length_column_name="length",
+    )
+    collator = PaddingMeter(DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8 if torch.cuda.is_available() else None))
+    throughput = ThroughputCallback(
+        collator,
+        REPORT_PATH,
+        extra={"max_length_padding_ratio": round(max_length_padding_ratio(encoded["train"], MAX_LENGTH), 4)},
     )
 
     trainer = Trainer(
@@ -53,7 +53,8 @@ def train_sentiment_model():
         train_dataset=encoded["train"],
         eval_dataset=encoded["test"],
         tokenizer=tokenizer,
-        data_collator=DataCollatorWithPadding(tokenizer)
+        data_collator=collator,
+        callbacks=[throughput],
     )
 
     print("🚀 Training model...")
@@ -65,6 +66,7 @@ def train_sentiment_model():
     print(f"✅ Model saved to {MODEL_DIR}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     if not torch.cuda.is_available():
         print("⚠️ CUDA not available. Using CPU.")
     train_sentiment_model()
@@ -1,19 +1,28 @@
+import os
 import sys
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch.nn.functional as F
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.core.model_registry import registry
 MODEL_DIR = "models/sentiment_model"
 LABELS = ["negative", "neutral", "positive"]
-print("📦 Loading model...")
-tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
-model.eval()
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model.to(device)
+
+def load_sentiment_model():
+    print("📦 Loading model...")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
+    model.eval()
+    model.to(device)
+    return tokenizer, model
+
+# Shared with batch_infer_sentiment.py; loaded on the first prediction.
+registry.register(MODEL_DIR, load_sentiment_model)
 
 def predict_sentiment(text):
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=128).to(device)
-    with torch.no_grad():
+    with registry.use(MODEL_DIR) as (tokenizer, model), torch.no_grad():
+        inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=128).to(device)
         outputs = model(**inputs)
         logits = outputs.logits
         probs = F.softmax(logits, dim=1)
@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.core.model_registry import registry
+from app.QA.eval_metrics import compute_rouge
+from app.Symmerize import summarizer
+
+REPORTS_DIR = "app/Symmerize/reports/"
+
+logger = logging.getLogger("Summarizer-RoutingBench")
+
+
+def held_out_pairs(csv_path: str, size: int, seed: int) -> List[Tuple[str, str]]:
+    """A seeded sample of (text, reference summary) rows of the fine-tuning data."""
+    df = pd.read_csv(csv_path).dropna(subset=["text", "summary"])
+    pairs = list(zip(df["text"].astype(str), df["summary"].astype(str)))
+    random.Random(seed).shuffle(pairs)
+    return pairs[:size]
+
+
+def run_mode(pairs: List[Tuple[str, str]], route: bool, profile: str) -> Dict:
+    latencies, scored, models = [], [], Counter()
+    escalated = 0
+    for text, reference in pairs:
+        start = time.perf_counter()
+        result = summarizer.summarize_document(text, profile=profile, route=route)
+        latencies.append((time.perf_counter() - start) * 1000)
+        scored.append((reference, result["summary"]))
+        models[os.path.basename(result["model"])] += 1
+        escalated += result["escalated"]
+    ms = np.array(latencies)
+    loaded = registry.stats()
+    return {
+        "mode": "routed" if route else "mbart-only",
+        "profile": profile,
+        "samples": len(pairs),
+        "latency_p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "latency_p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "mean_latency_ms": round(float(ms.mean()), 1),
+        "served_by": dict(models),
+        "escalated": escalated,
+        "models_loaded_mb": loaded["loaded_mb"],
+        "rss_mb": round(psutil.Process().memory_info().rss / 2**20, 1) if psutil else None,
+        **{key: round(value, 4) for key, value in compute_rouge(scored).items()},
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Latency, memory and ROUGE of routed summarization vs mBART-50 alone.")
+    parser.add_argument("--data", default="data/wolayta_summarization.csv")
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--profile", default="fast", help="Quality tier; \"best\" always routes to mBART-50")
+    args = parser.parse_args()
+
+    pairs = held_out_pairs(args.data, args.samples, args.seed)
+    # Chunk summaries must be generated every time for the timings to mean anything.
+    summarizer.map_reduce.cache = None
+    report = [run_mode(pairs, route=False, profile=args.profile), run_mode(pairs, route=True, profile=args.profile)]
+    report.append({"routing": summarizer.summary_router.stats(), "models": registry.stats()["models"]})
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = os.path.join(REPORTS_DIR, "summary_routing.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for row in report[:2]:
+        print(row)
+    logger.info(f"Saved routing report to {path}")
+
+
+if __name__ == "__main__":
+    main()
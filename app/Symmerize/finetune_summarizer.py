@@ -1,7 +1,7 @@
 import os
-import pandas as pd
+import sys
+import logging
 import torch
-from datasets import Dataset
 from transformers import (
     T5ForConditionalGeneration, 
     T5Tokenizer, 
@@ -9,25 +9,21 @@ from transformers import (
     Seq2SeqTrainer, 
     DataCollatorForSeq2Seq
 )
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.core.finetune_data import PaddingMeter, ThroughputCallback, max_length_padding_ratio, seq2seq_dataset
+logging.basicConfig(level=logging.INFO)
 DATA_PATH = "data/wolayta_summarization.csv"
 MODEL_NAME = "t5-small"
 SAVE_DIR = "models/summarization_model"
-df = pd.read_csv(DATA_PATH)
-df = df.dropna(subset=["text", "summary"])
-df["input"] = "summarize: " + df["text"]
-df["target"] = df["summary"]
-dataset = Dataset.from_pandas(df[["input", "target"]])
-dataset = dataset.train_test_split(test_size=0.1)
+REPORT_PATH = "app/Symmerize/reports/finetune_summarizer.json"
+MAX_SOURCE_LENGTH = 512
+MAX_TARGET_LENGTH = 64
 tokenizer = T5Tokenizer.from_pretrained(MODEL_NAME)
 model = T5ForConditionalGeneration.from_pretrained(MODEL_NAME)
-def preprocess(example):
-    model_inputs = tokenizer(example["input"], max_length=512, truncation=True, padding="max_length")
-    with tokenizer.as_target_tokenizer():
-        labels = tokenizer(example["target"], max_length=64, truncation=True, padding="max_length")
-    model_inputs["labels"] = labels["input_ids"]
-    return model_inputs
-
-tokenized_dataset = dataset.map(preprocess, batched=True)
+# Tokenised once and memory-mapped from data/tokenized afterwards; padding happens per batch in the collator.
+tokenized_dataset = seq2seq_dataset(
+    DATA_PATH, tokenizer, prefix="summarize: ", max_source_length=MAX_SOURCE_LENGTH, max_target_length=MAX_TARGET_LENGTH
+)
 training_args = Seq2SeqTrainingArguments(
     output_dir=SAVE_DIR,
     per_device_train_batch_size=8,
@@ -38,16 +34,27 @@ training_args = Seq2SeqTrainingArguments(
     logging_dir="./logs",
     predict_with_generate=True,
     fp16=torch.cuda.is_available(),
-    logging_steps=20
+    logging_steps=20,
+    # Batches of similar-length texts, so little of each batch is padding.
+    group_by_length=True,
+    length_column_name="length",
+)
+data_collator = PaddingMeter(
+    DataCollatorForSeq2Seq(tokenizer=tokenizer, model=model, pad_to_multiple_of=8 if torch.cuda.is_available() else None)
+)
+throughput = ThroughputCallback(
+    data_collator,
+    REPORT_PATH,
+    extra={"max_length_padding_ratio": round(max_length_padding_ratio(tokenized_dataset["train"], MAX_SOURCE_LENGTH), 4)},
 )
-data_collator = DataCollatorForSeq2Seq(tokenizer=tokenizer, model=model)
 trainer = Seq2SeqTrainer(
     model=model,
     args=training_args,
     train_dataset=tokenized_dataset["train"],
     eval_dataset=tokenized_dataset["test"],
     tokenizer=tokenizer,
-    data_collator=data_collator
+    data_collator=data_collator,
+    callbacks=[throughput],
 )
 trainer.train()
 model.save_pretrained(SAVE_DIR)
@@ -0,0 +1,165 @@
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.translation.segmenter import segment_document
+from app.core.decoding import resolve_profile
+
+# mBART-50 reads at most 1024 positions; 480 leaves the chunk under the
+# 512-token truncation the summarizer applies, special tokens included.
+CHUNK_TOKENS = 480
+BATCH_SIZE = 8
+MAX_ROUNDS = 4
+# Bump when chunking or prompting changes so cached chunk summaries are not reused.
+CACHE_VERSION = 1
+
+logger = logging.getLogger("Summarizer-MapReduce")
+
+
+def chunk_by_tokens(text: str, count_tokens: Callable[[str], int], max_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """
+    Pack whole sentences into chunks of at most `max_tokens` tokens.
+    Sentences longer than a chunk arrive pre-cut into word windows.
+    """
+    _, segments = segment_document(text, max_words=max(max_tokens // 2, 1))
+    chunks, current, total = [], [], 0
+    for segment, _ in segments:
+        n = count_tokens(segment)
+        if current and total + n > max_tokens:
+            chunks.append(" ".join(current))
+            current, total = [], 0
+        current.append(segment)
+        total += n
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class ChunkSummaryCache:
+    """Chunk summaries in SQLite keyed by a hash of the chunk text and everything that shaped its summary."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.hits = Counter()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL, created REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(text: str, *settings) -> str:
+        payload = "\x1f".join([str(CACHE_VERSION), *map(str, settings), text])
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        found = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self._connection().execute(
+                f"SELECT key, summary FROM summaries WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            found.update(rows)
+        self.hits["hit"] += len(found)
+        self.hits["miss"] += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, str]):
+        now = time.time()
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO summaries (key, summary, created) VALUES (?, ?, ?)",
+                [(key, summary, now) for key, summary in items.items()],
+            )
+
+    def stats(self) -> Dict:
+        entries = self._connection().execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        return {"entries": entries, "lookups": dict(self.hits)}
+
+
+class MapReduceSummarizer:
+    """
+    Hierarchical summarization for inputs longer than one model window.
+
+    Map: the document is cut into token-bounded chunks whose summaries are
+    looked up by content hash, and the misses are generated in padded
+    batches of similar length. Reduce: the partial summaries are joined
+    and, if still over one chunk, chunked and summarized again, until a
+    single chunk remains for the final summary.
+    """
+
+    def __init__(
+        self,
+        summarize_batch: Callable[[List[str], str, str, Optional[str]], List[str]],
+        count_tokens: Callable[[str], int],
+        cache: Optional[ChunkSummaryCache] = None,
+        model_name: str = "",
+        chunk_tokens: int = CHUNK_TOKENS,
+        batch_size: int = BATCH_SIZE,
+        max_rounds: int = MAX_ROUNDS,
+    ):
+        self.summarize_batch = summarize_batch
+        self.count_tokens = count_tokens
+        self.cache = cache
+        self.model_name = model_name
+        self.chunk_tokens = chunk_tokens
+        self.batch_size = batch_size
+        self.max_rounds = max_rounds
+
+    def summarize_chunks(self, chunks: List[str], src_lang: str, tgt_lang: str, profile: Optional[str] = None) -> List[str]:
+        """Summaries of `chunks` in order: cached ones are reused, the rest generated in length-sorted batches."""
+        settings = (self.model_name, src_lang, tgt_lang, resolve_profile(profile))
+        keys = [ChunkSummaryCache.key(chunk, *settings) for chunk in chunks]
+        found = self.cache.get_many(keys) if self.cache else {}
+        missing = {}
+        for key, chunk in zip(keys, chunks):
+            if key not in found:
+                missing.setdefault(key, chunk)
+        pending = sorted(missing.items(), key=lambda item: len(item[1]))
+        generated = {}
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            summaries = self.summarize_batch([chunk for _, chunk in batch], src_lang, tgt_lang, profile)
+            generated.update((key, summary) for (key, _), summary in zip(batch, summaries))
+        if self.cache and generated:
+            self.cache.put_many(generated)
+        found.update(generated)
+        return [found[key] for key in keys]
+
+    def summarize(self, text: str, src_lang: str, tgt_lang: str, profile: Optional[str] = None) -> Dict:
+        start = time.perf_counter()
+        chunks = chunk_by_tokens(text, self.count_tokens, self.chunk_tokens) or [text]
+        chunk_summaries = self.summarize_chunks(chunks, src_lang, tgt_lang, profile)
+        summaries, rounds = chunk_summaries, 1
+        # Partial summaries are already in the target language.
+        while len(summaries) > 1:
+            joined = " ".join(summaries)
+            level = chunk_by_tokens(joined, self.count_tokens, self.chunk_tokens) or [joined]
+            if len(level) >= len(summaries) or rounds + 1 >= self.max_rounds:
+                # Not shrinking, or out of rounds: the last pass reads as much as fits in one window.
+                level = [joined]
+            summaries = self.summarize_chunks(level, tgt_lang, tgt_lang, profile)
+            rounds += 1
+        logger.info(f"Summarized {len(chunks)} chunks in {rounds} rounds")
+        return {
+            "summary": summaries[0],
+            "chunks": len(chunks),
+            "chunk_texts": chunks,
+            "chunk_summaries": chunk_summaries,
+            "rounds": rounds,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
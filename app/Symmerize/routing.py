@@ -0,0 +1,85 @@
+import math
+from typing import Dict, Optional, Sequence
+
+from app.core.decoding import resolve_profile
+
+# Longest input (small-model tokens) each tier sends to the small model;
+# "best" always uses mBART-50.
+SMALL_MAX_TOKENS = {"fast": 480, "balanced": 240, "best": 0}
+# Below this mean per-token probability the small model's summary is
+# discarded and the request escalates to mBART-50.
+MIN_CONFIDENCE = 0.35
+MIN_SUMMARY_WORDS = 4
+# Summaries with a lower unique-word ratio are degenerate repetition.
+MIN_DISTINCT_RATIO = 0.5
+
+
+def sequence_confidence(output, step_log_probs=None) -> float:
+    """
+    exp(mean log-probability) of the generated tokens: the beam's
+    length-normalised score when beam search ran, otherwise the mean of
+    the chosen tokens' log-probabilities per step.
+    """
+    scores = getattr(output, "sequences_scores", None)
+    if scores is not None:
+        return float(math.exp(float(scores[0])))
+    if step_log_probs:
+        return float(math.exp(sum(step_log_probs) / len(step_log_probs)))
+    return 0.0
+
+
+class SummaryRouter:
+    """
+    Picks the model for a summarization request.
+
+    The fine-tuned t5-small serves inputs in its languages that fit the
+    tier's length limit; everything else, and any small-model summary that
+    looks unreliable (low confidence, too short, repetitive), goes to
+    mBART-50.
+    """
+
+    def __init__(
+        self,
+        small_available: bool,
+        small_languages: Sequence[str],
+        small_max_tokens: Optional[Dict[str, int]] = None,
+        min_confidence: float = MIN_CONFIDENCE,
+    ):
+        self.small_available = small_available
+        self.small_languages = set(small_languages)
+        self.small_max_tokens = {**SMALL_MAX_TOKENS, **(small_max_tokens or {})}
+        self.min_confidence = min_confidence
+        self.routed = {"small": 0, "large": 0, "escalated": 0}
+
+    def choose(self, input_tokens: int, src_lang: str, tgt_lang: str, profile: Optional[str]) -> str:
+        """"small" or "large" for a request before any generation."""
+        tier = resolve_profile(profile)
+        small = (
+            self.small_available
+            and src_lang == tgt_lang
+            and src_lang in self.small_languages
+            and input_tokens <= self.small_max_tokens[tier]
+        )
+        self.routed["small" if small else "large"] += 1
+        return "small" if small else "large"
+
+    def accept(self, summary: str, confidence: float) -> bool:
+        """Whether a small-model summary is good enough to return; False escalates to mBART-50."""
+        words = summary.split()
+        ok = (
+            confidence >= self.min_confidence
+            and len(words) >= MIN_SUMMARY_WORDS
+            and len(set(words)) / len(words) >= MIN_DISTINCT_RATIO
+        )
+        if not ok:
+            self.routed["escalated"] += 1
+        return ok
+
+    def stats(self) -> Dict:
+        total = self.routed["small"] + self.routed["large"]
+        return {
+            "small_model_available": self.small_available,
+            "requests": total,
+            **self.routed,
+            "small_share": round((self.routed["small"] - self.routed["escalated"]) / total, 3) if total else 0.0,
+        }
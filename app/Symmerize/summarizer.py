@@ -1,30 +1,111 @@
+import os
+import sys
+import math
+import time
+import argparse
+import threading
 import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers import AutoTokenizer
 import textwrap
 import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.core.decoding import generation_kwargs
+from app.core.seq2seq_backend import load_seq2seq
+from app.core.model_registry import registry
+from app.Symmerize.map_reduce import ChunkSummaryCache, MapReduceSummarizer
+from app.Symmerize.routing import SMALL_MAX_TOKENS, SummaryRouter, sequence_confidence
 
 MODEL_NAME = "facebook/mbart-large-50-many-to-many-mmt"
 SRC_LANG = "en_XX"
 TGT_LANG = "en_XX"
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", "data/summary_cache.sqlite3")
+# Chunks summarized per padded generate call in map-reduce mode.
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "8"))
+# t5-small fine-tuned by finetune_summarizer.py; serves short inputs in these mBART language codes.
+SMALL_MODEL_DIR = os.getenv("SMALL_SUMMARY_MODEL_DIR", "models/summarization_model")
+SMALL_MODEL_LANGS = os.getenv("SMALL_SUMMARY_MODEL_LANGS", "en_XX").split(",")
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=False)
 tokenizer.src_lang = SRC_LANG 
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME).to(device)
-model.eval()
-def summarize(text, src_lang=SRC_LANG, tgt_lang=TGT_LANG):
-    tokenizer.src_lang = src_lang
-    inputs = tokenizer(text, return_tensors="pt", max_length=512, truncation=True).to(device)
-    summary_ids = model.generate(
-        **inputs,
-        decoder_start_token_id=tokenizer.lang_code_to_id[tgt_lang],
-        forced_bos_token_id=tokenizer.lang_code_to_id[tgt_lang],
-        num_beams=4,
-        min_length=30,
-        max_length=120,
-        length_penalty=2.0,
-        early_stopping=True
-    )
-    return tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+# Shared with app/routes/summarizer_api.py through the model registry; loaded on first use.
+registry.register(MODEL_NAME, lambda: load_seq2seq(MODEL_NAME, device))
+# `src_lang` is tokenizer state, so setting it and encoding must not interleave across threads.
+tokenizer_lock = threading.Lock()
+def summarize_batch(texts, src_lang=SRC_LANG, tgt_lang=TGT_LANG, profile=None):
+    """One padded `generate` over texts in the same language; the length limits follow the longest."""
+    with tokenizer_lock:
+        tokenizer.src_lang = src_lang
+        inputs = tokenizer(texts, return_tensors="pt", max_length=512, truncation=True, padding=True).to(device)
+    decoding = generation_kwargs("summarization", profile, inputs["input_ids"].shape[1])
+    with registry.use(MODEL_NAME) as model:
+        summary_ids = model.generate(
+            **inputs,
+            decoder_start_token_id=tokenizer.lang_code_to_id[tgt_lang],
+            forced_bos_token_id=tokenizer.lang_code_to_id[tgt_lang],
+            **decoding
+        )
+    return tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+def summarize(text, src_lang=SRC_LANG, tgt_lang=TGT_LANG, profile=None):
+    return summarize_batch([text], src_lang, tgt_lang, profile)[0]
+def count_tokens(text):
+    return len(tokenizer.tokenize(text)) + 2
+map_reduce = MapReduceSummarizer(
+    summarize_batch,
+    count_tokens,
+    cache=ChunkSummaryCache(SUMMARY_CACHE_PATH),
+    model_name=MODEL_NAME,
+    batch_size=SUMMARY_BATCH_SIZE,
+)
+small_tokenizer = AutoTokenizer.from_pretrained(SMALL_MODEL_DIR) if os.path.isdir(SMALL_MODEL_DIR) else None
+if small_tokenizer is not None:
+    registry.register(SMALL_MODEL_DIR, lambda: load_seq2seq(SMALL_MODEL_DIR, device))
+summary_router = SummaryRouter(small_tokenizer is not None, SMALL_MODEL_LANGS)
+def summarize_small(text, profile=None):
+    """Summary from the fine-tuned t5-small and its confidence (exp of the mean token log-probability)."""
+    inputs = small_tokenizer("summarize: " + text, return_tensors="pt", max_length=512, truncation=True).to(device)
+    decoding = generation_kwargs("summarization", profile, inputs["input_ids"].shape[1])
+    with registry.use(SMALL_MODEL_DIR) as model:
+        output = model.generate(**inputs, **decoding, output_scores=True, return_dict_in_generate=True)
+    step_log_probs = None
+    if getattr(output, "sequences_scores", None) is None:
+        # Greedy decoding: scores[i] are the logits that chose sequences[0, i + 1].
+        step_log_probs = [
+            float(torch.log_softmax(logits[0].float(), dim=-1)[output.sequences[0, step + 1]])
+            for step, logits in enumerate(output.scores or [])
+        ]
+    summary = small_tokenizer.decode(output.sequences[0], skip_special_tokens=True)
+    return summary, sequence_confidence(output, step_log_probs)
+def summarize_document(text, src_lang=SRC_LANG, tgt_lang=TGT_LANG, profile=None, route=True):
+    """
+    Summarize text of any length. Short inputs the router assigns to the
+    small model are answered by it unless its summary looks unreliable;
+    the rest go through mBART-50, in a single pass when the text fits one
+    chunk and map-reduce otherwise.
+    """
+    start = time.perf_counter()
+    escalated = False
+    if route:
+        # Word count bounds token count from below, so long inputs skip tokenization.
+        fits = small_tokenizer is not None and len(text.split()) <= max(SMALL_MAX_TOKENS.values())
+        input_tokens = len(small_tokenizer.tokenize(text)) if fits else math.inf
+        if summary_router.choose(input_tokens, src_lang, tgt_lang, profile) == "small":
+            summary, confidence = summarize_small(text, profile)
+            if summary_router.accept(summary, confidence):
+                return {
+                    "summary": summary,
+                    "chunks": 1,
+                    "chunk_texts": [text],
+                    "chunk_summaries": [summary],
+                    "rounds": 1,
+                    "seconds": round(time.perf_counter() - start, 3),
+                    "model": SMALL_MODEL_DIR,
+                    "confidence": round(confidence, 3),
+                    "escalated": False,
+                }
+            escalated = True
+    result = map_reduce.summarize(text, src_lang, tgt_lang, profile)
+    result.update(model=MODEL_NAME, escalated=escalated, seconds=round(time.perf_counter() - start, 3))
+    return result
 def read_text_chunks(file_path, chunk_size=450):
     with open(file_path, 'r', encoding='utf-8') as f:
         text = f.read()
@@ -40,20 +121,30 @@ def read_text_chunks(file_path, chunk_size=450):
         chunks.append(current.strip())
     return chunks
 if __name__ == "__main__":
-    input_path = r"C:\Users\admin\Multimodal_Wolayta_Engilsh-Intelligent-Chat-Assistant\data\wolayta.csv"
-    chunks = read_text_chunks(input_path)
-    print("📚 Total Chunks:", len(chunks))
+    parser = argparse.ArgumentParser(description="Summarize a long document with map-reduce.")
+    parser.add_argument("input", help="Text file to summarize")
+    parser.add_argument("--output", default="data/wolayta_summaries.csv", help="CSV of per-chunk summaries")
+    parser.add_argument("--src-lang", default=SRC_LANG)
+    parser.add_argument("--tgt-lang", default=TGT_LANG)
+    parser.add_argument("--profile", default=None)
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        text = f.read()
     print("🔍 Summarizing...\n")
+    result = summarize_document(text, args.src_lang, args.tgt_lang, args.profile)
+    print("📚 Total Chunks:", result["chunks"])
 
-    for i, chunk in enumerate(chunks, 1):
-        summary = summarize(chunk)
+    for i, summary in enumerate(result["chunk_summaries"], 1):
         print(f"🧩 Chunk {i} Summary:")
         print(textwrap.fill(summary, width=80))
         print("="*80)
+    print("📝 Document Summary:")
+    print(textwrap.fill(result["summary"], width=80))
 
     all_summaries = [
-        {"chunk": i+1, "text": chunks[i], "summary": summarize(chunks[i])}
-        for i in range(len(chunks))
+        {"chunk": i+1, "text": chunk, "summary": summary}
+        for i, (chunk, summary) in enumerate(zip(result["chunk_texts"], result["chunk_summaries"]))
     ]
-    pd.DataFrame(all_summaries).to_csv("data/wolayta_summaries.csv", index=False)
-    print("✅ Saved summarized chunks to CSV.")
+    pd.DataFrame(all_summaries).to_csv(args.output, index=False)
+    print(f"✅ Saved summarized chunks to {args.output} ({result['rounds']} rounds, {result['seconds']}s).")
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from typing import Dict, List
+
+import httpx
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.core.inference_executor import InferenceExecutor
+
+REPORTS_DIR = "app/core/reports/"
+
+
+def _matmul_steps(steps: int) -> float:
+    a = np.random.default_rng(0).random((256, 256), dtype=np.float32)
+    for _ in range(steps):
+        a = np.tanh(a @ a)
+    return float(a[0, 0])
+
+
+def calibrate(work_ms: float) -> int:
+    """Matmul steps that take about `work_ms` on one idle thread, so the work is fixed CPU, not wall time."""
+    start = time.perf_counter()
+    _matmul_steps(50)
+    return max(int(50 * work_ms / ((time.perf_counter() - start) * 1000)), 1)
+
+
+def blocking_work(steps: int) -> float:
+    """Stand-in for model.generate: native matmuls that release the GIL."""
+    return _matmul_steps(steps)
+
+
+def build_app(mode: str, steps: int, workers: int) -> FastAPI:
+    app = FastAPI()
+    executor = InferenceExecutor({"bench": workers})
+
+    @app.post("/infer")
+    async def infer(request: Request):
+        if mode == "inline":
+            # What the routes used to do: a synchronous model call inside `async def`.
+            return {"value": blocking_work(steps)}
+        return {"value": await executor.run("bench", blocking_work, steps, request=request)}
+
+    @app.get("/")
+    async def health():
+        return {"ok": True}
+
+    return app
+
+
+def serve(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def load(url: str, concurrency: int) -> Dict:
+    async with httpx.AsyncClient(timeout=300) as client:
+        async def infer():
+            start = time.perf_counter()
+            await client.post(url + "/infer")
+            return time.perf_counter() - start
+
+        async def health():
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            await client.get(url + "/")
+            return time.perf_counter() - start
+
+        started = time.perf_counter()
+        results = await asyncio.gather(health(), *(infer() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies = np.array(results[1:]) * 1000
+    return {
+        "concurrency": concurrency,
+        "wall_ms": round(elapsed * 1000, 1),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "latency_max_ms": round(float(latencies.max()), 1),
+        "health_check_ms": round(results[0] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent request latency with inline model calls vs the inference executor.")
+    parser.add_argument("--work-ms", type=float, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    steps = calibrate(args.work_ms)
+    report: List[Dict] = []
+    for offset, mode in enumerate(("inline", "executor")):
+        port = args.port + offset
+        server = serve(build_app(mode, steps, args.workers), port)
+        for concurrency in args.concurrency:
+            row = {"mode": mode, "work_ms": args.work_ms, "workers": args.workers, "cpus": os.cpu_count()}
+            row.update(asyncio.run(load(f"http://127.0.0.1:{port}", concurrency)))
+            print(row)
+            report.append(row)
+        server.should_exit = True
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = os.path.join(REPORTS_DIR, "inference_executor.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved executor benchmark to {path}")
+
+
+if __name__ == "__main__":
+    main()
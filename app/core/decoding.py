@@ -0,0 +1,43 @@
+import math
+from typing import Dict, Optional
+
+# Named generate() settings per task: "fast" is greedy for chat-style latency,
+# "best" is the beam search the services always used, "balanced" sits between.
+DECODING_PROFILES = {
+    "translation": {
+        "fast": {"num_beams": 1},
+        "balanced": {"num_beams": 3, "early_stopping": True},
+        "best": {"num_beams": 5, "early_stopping": True},
+    },
+    "summarization": {
+        "fast": {"num_beams": 1, "no_repeat_ngram_size": 3},
+        "balanced": {"num_beams": 2, "length_penalty": 1.0, "early_stopping": True, "no_repeat_ngram_size": 3},
+        "best": {"num_beams": 4, "length_penalty": 2.0, "early_stopping": True},
+    },
+}
+DEFAULT_PROFILE = "best"
+
+# Output length bounds derived from the input length, in tokens:
+# max_length = clamp(ratio * input + slack, floor, cap); min_length = min(min_cap, max_length * min_share).
+LENGTH_RULES = {
+    "translation": {"ratio": 1.5, "slack": 10, "floor": 16, "cap": 512, "min_cap": 0, "min_share": 0.0},
+    "summarization": {"ratio": 0.5, "slack": 16, "floor": 24, "cap": 120, "min_cap": 30, "min_share": 0.5},
+}
+
+
+def resolve_profile(profile: Optional[str]) -> str:
+    profile = profile or DEFAULT_PROFILE
+    if profile not in DECODING_PROFILES["translation"]:
+        raise ValueError(f"Unknown decoding profile {profile!r}; choose one of {', '.join(DECODING_PROFILES['translation'])}")
+    return profile
+
+
+def generation_kwargs(task: str, profile: Optional[str], input_tokens: int) -> Dict:
+    """Keyword arguments for `model.generate` for a task, profile and (longest) input length."""
+    rules = LENGTH_RULES[task]
+    max_length = int(min(rules["cap"], max(rules["floor"], math.ceil(rules["ratio"] * input_tokens + rules["slack"]))))
+    kwargs = {**DECODING_PROFILES[task][resolve_profile(profile)], "max_length": max_length}
+    min_length = int(min(rules["min_cap"], max_length * rules["min_share"]))
+    if min_length:
+        kwargs["min_length"] = min_length
+    return kwargs
@@ -0,0 +1,181 @@
+import io
+import os
+import csv
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: rows from one process stay whole, but processes are not serialised.
+    fcntl = None
+
+FLUSH_SECONDS = float(os.getenv("EVENT_LOG_FLUSH_SECONDS", "1.0"))
+MAX_BYTES = int(os.getenv("EVENT_LOG_MAX_BYTES", str(50 * 2**20)))
+ROTATE_SECONDS = float(os.getenv("EVENT_LOG_ROTATE_SECONDS", str(24 * 3600)))
+MAX_QUEUE = 100000
+MAX_BATCH = 1000
+SCHEMA_FIELD = "schema_version"
+
+logger = logging.getLogger("EventLog")
+
+_open_logs: List["EventLog"] = []
+
+
+class EventLog:
+    """
+    Append-only CSV event log written by a background thread.
+
+    `log` only enqueues, so request handlers never touch the disk; when the
+    queue is full the event is dropped and counted. The writer appends
+    queued rows in batches every `flush_seconds`. Each batch is written
+    under an exclusive lock on `<path>.lock`, so rows from several worker
+    processes never interleave, and the log is rotated to
+    `<name>.<created>.csv` once it exceeds `max_bytes`, is older than
+    `rotate_seconds`, or was written with another schema version. The
+    creation time and schema version live in `<path>.meta`; every row also
+    carries its schema version in the last column.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fields: List[str],
+        schema_version: int = 1,
+        flush_seconds: float = FLUSH_SECONDS,
+        max_bytes: int = MAX_BYTES,
+        rotate_seconds: float = ROTATE_SECONDS,
+        max_queue: int = MAX_QUEUE,
+    ):
+        self.path = path
+        self.fields = list(fields)
+        self.schema_version = schema_version
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._written = 0
+        self._dropped = 0
+        self._batches = 0
+        self._rotations = 0
+        self._closed = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name=f"event-log-{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+        _open_logs.append(self)
+
+    def log(self, **event):
+        """Queue one event; unknown keys are ignored and missing fields are left empty."""
+        try:
+            self._queue.put_nowait([event.get(field, "") for field in self.fields] + [self.schema_version])
+        except queue.Full:
+            self._dropped += 1
+
+    def flush(self, timeout: float = None):
+        """Block until every event queued so far is on disk (for shutdown and scripts)."""
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        done.wait(timeout)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.flush(timeout=10)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            rows, waiters = [], []
+            deadline = time.monotonic() + self.flush_seconds
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                rows.append(item)
+                if len(rows) >= MAX_BATCH:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if rows:
+                try:
+                    self._write(rows)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(rows)} events to {self.path}: {e}")
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, rows: List[list]):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        with open(self.path + ".lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                meta = self._rotate_if_needed()
+                if meta is None:
+                    writer.writerow(self.fields + [SCHEMA_FIELD])
+                    self._write_meta()
+                writer.writerows(rows)
+                with open(self.path, "a", encoding="utf-8", newline="") as f:
+                    f.write(buffer.getvalue())
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        self._written += len(rows)
+        self._batches += 1
+
+    def _read_meta(self) -> Optional[Dict]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path + ".meta", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # A log from before the event logger: treat it as schema 0 so it is rotated aside.
+            return {"created": os.path.getmtime(self.path), "schema_version": 0}
+
+    def _write_meta(self):
+        with open(self.path + ".meta", "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "schema_version": self.schema_version, "fields": self.fields}, f)
+
+    def _rotate_if_needed(self) -> Optional[Dict]:
+        """Returns the live file's metadata, or None when a new file (and header) is needed."""
+        meta = self._read_meta()
+        if meta is None:
+            return None
+        too_big = os.path.getsize(self.path) >= self.max_bytes
+        too_old = self.rotate_seconds and time.time() - meta["created"] >= self.rotate_seconds
+        if not (too_big or too_old or meta["schema_version"] != self.schema_version):
+            return meta
+        root, ext = os.path.splitext(self.path)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(meta["created"]))
+        target, n = f"{root}.{stamp}{ext}", 1
+        while os.path.exists(target):
+            target, n = f"{root}.{stamp}-{n}{ext}", n + 1
+        os.replace(self.path, target)
+        self._rotations += 1
+        logger.info(f"Rotated {self.path} to {target}")
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "schema_version": self.schema_version,
+            "queued": self._queue.qsize(),
+            "written": self._written,
+            "dropped": self._dropped,
+            "batches": self._batches,
+            "rotations": self._rotations,
+        }
+
+
+@atexit.register
+def _flush_all():
+    for event_log in _open_logs:
+        event_log.close()
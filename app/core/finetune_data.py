@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+import torch
+from datasets import Dataset, DatasetDict, load_from_disk
+from transformers import TrainerCallback
+
+CACHE_DIR = os.getenv("FINETUNE_CACHE_DIR", "data/tokenized")
+# Bumped when the cached layout changes, so old caches are rebuilt.
+CACHE_VERSION = 1
+
+logger = logging.getLogger("FinetuneData")
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Class, name and full vocabulary, so a retrained or swapped tokenizer never reuses a cache."""
+    vocab = json.dumps(sorted(tokenizer.get_vocab().items()), ensure_ascii=False)
+    identity = f"{type(tokenizer).__name__}|{tokenizer.name_or_path}|{len(tokenizer)}|{vocab}"
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+def _cached(data_path: str, tokenizer, settings: Dict, build: Callable[[], DatasetDict], cache_dir: str) -> DatasetDict:
+    """
+    The tokenised train/test split for (tokenizer, data file, settings),
+    built once and saved as Arrow files; later runs memory-map them
+    instead of re-tokenising.
+    """
+    key = json.dumps(
+        {"version": CACHE_VERSION, "tokenizer": tokenizer_fingerprint(tokenizer), "data": file_digest(data_path), **settings},
+        sort_keys=True,
+    )
+    path = os.path.join(cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16])
+    if os.path.isdir(path):
+        logger.info(f"Using tokenised dataset cached at {path}")
+        return load_from_disk(path)
+
+    start = time.perf_counter()
+    dataset = build()
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    dataset.save_to_disk(tmp_path)
+    with open(os.path.join(tmp_path, "cache_key.json"), "w", encoding="utf-8") as f:
+        f.write(key)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another run cached the same dataset first.
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    logger.info(f"Tokenised {data_path} in {time.perf_counter() - start:.1f}s, cached at {path}")
+    return load_from_disk(path)
+
+
+def seq2seq_dataset(
+    data_path: str,
+    tokenizer,
+    source_column: str = "text",
+    target_column: str = "summary",
+    prefix: str = "",
+    max_source_length: int = 512,
+    max_target_length: int = 64,
+    test_size: float = 0.1,
+    seed: int = 42,
+    cache_dir: str = CACHE_DIR,
+) -> DatasetDict:
+    """Unpadded input_ids/labels plus a `length` column for length-grouped sampling."""
+    settings = {
+        "task": "seq2seq",
+        "columns": [source_column, target_column],
+        "prefix": prefix,
+        "max_lengths": [max_source_length, max_target_length],
+        "split": [test_size, seed],
+    }
+
+    def build() -> DatasetDict:
+        df = pd.read_csv(data_path).dropna(subset=[source_column, target_column])
+        dataset = Dataset.from_dict(
+            {"source": (prefix + df[source_column].astype(str)).tolist(), "target": df[target_column].astype(str).tolist()}
+        )
+
+        def tokenize(batch):
+            encoded = tokenizer(batch["source"], max_length=max_source_length, truncation=True)
+            encoded["labels"] = tokenizer(text_target=batch["target"], max_length=max_target_length, truncation=True)["input_ids"]
+            encoded["length"] = [len(ids) for ids in encoded["input_ids"]]
+            return encoded
+
+        tokenized = dataset.map(tokenize, batched=True, remove_columns=["source", "target"])
+        return tokenized.train_test_split(test_size=test_size, seed=seed)
+
+    return _cached(data_path, tokenizer, settings, build, cache_dir)
+
+
+def classification_dataset(
+    data_path: str,
+    tokenizer,
+    label_map: Dict[str, int],
+    text_column: str = "text",
+    label_column: str = "label",
+    max_length: int = 128,
+    test_size: float = 0.2,
+    seed: int = 42,
+    cache_dir: str = CACHE_DIR,
+) -> DatasetDict:
+    """Unpadded input_ids with integer labels and a `length` column."""
+    settings = {
+        "task": "classification",
+        "columns": [text_column, label_column],
+        "labels": label_map,
+        "max_length": max_length,
+        "split": [test_size, seed],
+    }
+
+    def build() -> DatasetDict:
+        df = pd.read_csv(data_path)
+        df = df[df[label_column].isin(label_map.keys())].dropna(subset=[text_column])
+        dataset = Dataset.from_dict({"text": df[text_column].astype(str).tolist(), "label": df[label_column].map(label_map).tolist()})
+
+        def tokenize(batch):
+            encoded = tokenizer(batch["text"], max_length=max_length, truncation=True)
+            encoded["length"] = [len(ids) for ids in encoded["input_ids"]]
+            return encoded
+
+        tokenized = dataset.map(tokenize, batched=True, remove_columns=["text"])
+        return tokenized.train_test_split(test_size=test_size, seed=seed)
+
+    return _cached(data_path, tokenizer, settings, build, cache_dir)
+
+
+def max_length_padding_ratio(dataset: Dataset, max_length: int, column: str = "input_ids") -> float:
+    """Share of padding had every example been padded to `max_length`, as the scripts used to do."""
+    real = sum(min(len(ids), max_length) for ids in dataset[column])
+    return 1 - real / (len(dataset) * max_length) if len(dataset) else 0.0
+
+
+class PaddingMeter:
+    """
+    Wraps a dynamic-padding collator and counts real vs padded tokens
+    (inputs and, for seq2seq, labels) in the batches built while active.
+    """
+
+    def __init__(self, collator):
+        self.collator = collator
+        self.active = False
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.batches = 0
+
+    def __call__(self, features):
+        batch = self.collator(features)
+        if self.active:
+            self.batches += 1
+            mask = batch["attention_mask"]
+            self.real_tokens += int(mask.sum())
+            self.padded_tokens += mask.numel()
+            labels = batch.get("labels")
+            if labels is not None and labels.dim() == 2:
+                self.real_tokens += int((labels != -100).sum())
+                self.padded_tokens += labels.numel()
+        return batch
+
+    @property
+    def padding_ratio(self) -> float:
+        return 1 - self.real_tokens / self.padded_tokens if self.padded_tokens else 0.0
+
+
+class ThroughputCallback(TrainerCallback):
+    """
+    Logs training tokens/sec and padding ratio with the Trainer's logs and
+    writes a JSON report at the end of training. Only training batches are
+    counted; evaluation runs between epochs.
+    """
+
+    def __init__(self, meter: PaddingMeter, report_path: str, extra: Optional[Dict] = None):
+        self.meter = meter
+        self.report_path = report_path
+        self.extra = extra or {}
+        self.train_seconds = 0.0
+        self._epoch_start = None
+
+    def _elapsed(self) -> float:
+        running = time.perf_counter() - self._epoch_start if self._epoch_start is not None else 0.0
+        return self.train_seconds + running
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self.meter.active = True
+        self._epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        self.meter.active = False
+        self.train_seconds += time.perf_counter() - self._epoch_start
+        self._epoch_start = None
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        elapsed = self._elapsed()
+        if elapsed and self.meter.batches:
+            logger.info(
+                f"step {state.global_step}: {self.meter.real_tokens / elapsed:.0f} tokens/s, "
+                f"padding {self.meter.padding_ratio:.1%}"
+            )
+
+    def on_train_end(self, args, state, control, **kwargs):
+        elapsed = self._elapsed()
+        report = {
+            "train_seconds": round(elapsed, 1),
+            "steps": state.global_step,
+            "batches": self.meter.batches,
+            "real_tokens": self.meter.real_tokens,
+            "padded_tokens": self.meter.padded_tokens,
+            "tokens_per_second": round(self.meter.real_tokens / elapsed, 1) if elapsed else 0.0,
+            "padding_ratio": round(self.meter.padding_ratio, 4),
+            "device": "cuda" if torch.cuda.is_available() else "cpu",
+            **self.extra,
+        }
+        os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Saved training throughput report to {self.report_path}: {report}")
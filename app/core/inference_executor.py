@@ -0,0 +1,202 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+# Concurrent calls per model class. Translation callers mostly wait on the
+# dynamic batcher, so they need many slots for batches to fill; mBART runs
+# its own padded batches and is memory-bound, so it gets few.
+DEFAULT_LIMITS = {
+    "translation": 16,
+    "summarization": 2,
+    "qa": 8,
+    "sentiment": 2,
+    "ingest": 1,
+    "evaluation": 1,
+}
+# How often a waiting request checks whether its client went away.
+DISCONNECT_POLL_SECONDS = 0.25
+LATENCY_SAMPLES = 2048
+
+logger = logging.getLogger("InferenceExecutor")
+
+
+class ClientDisconnected(Exception):
+    """The client went away before its inference call finished."""
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """"translation=8,summarization=1" -> {"translation": 8, "summarization": 1}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, value = item.split("=", 1)
+        limits[name.strip()] = int(value)
+    return limits
+
+
+class _Pool:
+    def __init__(self, name: str, workers: int, kind: str):
+        self.name = name
+        self.workers = workers
+        self.kind = kind
+        if kind == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"infer-{name}")
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.abandoned = 0
+        self.waits_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.runs_ms = deque(maxlen=LATENCY_SAMPLES)
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model calls off the event loop, in one pool per model class.
+
+    Each class has its own workers, so a burst of summaries cannot starve
+    translation, and its worker count is its concurrency limit; callers
+    beyond it wait in the pool's queue without blocking the loop. `run`
+    is awaitable. Given the Starlette request, it stops waiting when the
+    client disconnects: work still queued is cancelled, and work already
+    running finishes but its result is dropped.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default_limit: int = 4):
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.default_limit = default_limit
+        self._pools: Dict[str, _Pool] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, name: str, workers: int, kind: str = "thread"):
+        """
+        Set a class's limit before first use. kind="process" suits pure-Python
+        CPU work; the function and arguments must then be picklable, and a
+        model the function needs is loaded once per worker process.
+        """
+        with self._lock:
+            if name in self._pools:
+                raise RuntimeError(f"Pool {name!r} is already running")
+            self.limits[name] = workers
+            if kind == "process":
+                self._pools[name] = _Pool(name, workers, kind)
+
+    def _pool(self, name: str) -> _Pool:
+        pool = self._pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(name)
+                if pool is None:
+                    pool = self._pools[name] = _Pool(name, self.limits.get(name, self.default_limit), "thread")
+        return pool
+
+    def submit(self, name: str, fn: Callable, *args, **kwargs) -> Future:
+        pool = self._pool(name)
+        enqueued = time.perf_counter()
+        with pool.lock:
+            pool.queued += 1
+        if pool.kind == "process":
+            future = pool.executor.submit(fn, *args, **kwargs)
+            future.add_done_callback(lambda f: self._finished(pool, f, enqueued, enqueued))
+            return future
+
+        def call():
+            started = time.perf_counter()
+            with pool.lock:
+                pool.queued -= 1
+                pool.running += 1
+                pool.waits_ms.append((started - enqueued) * 1000)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with pool.lock:
+                    pool.running -= 1
+                    pool.runs_ms.append((time.perf_counter() - started) * 1000)
+
+        future = pool.executor.submit(call)
+        future.add_done_callback(lambda f: self._finished(pool, f))
+        return future
+
+    @staticmethod
+    def _finished(pool: _Pool, future: Future, enqueued: float = None, started: float = None):
+        with pool.lock:
+            if future.cancelled():
+                pool.queued -= 1
+                pool.cancelled += 1
+                return
+            if enqueued is not None:  # process pools: no per-call hooks inside the worker
+                pool.queued -= 1
+                pool.runs_ms.append((time.perf_counter() - started) * 1000)
+            if future.exception() is not None:
+                pool.failed += 1
+            else:
+                pool.completed += 1
+
+    async def run(self, name: str, fn: Callable, *args, request=None, **kwargs):
+        """Await `fn(*args, **kwargs)` on the `name` pool; raises ClientDisconnected if `request`'s client leaves."""
+        future = self.submit(name, fn, *args, **kwargs)
+        result = asyncio.wrap_future(future)
+        if request is None:
+            return await result
+        watcher = asyncio.ensure_future(self._wait_for_disconnect(request))
+        try:
+            done, _ = await asyncio.wait({result, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+        if result in done:
+            return result.result()
+        if not future.cancel():
+            pool = self._pool(name)
+            with pool.lock:
+                pool.abandoned += 1
+        result.cancel()
+        raise ClientDisconnected(f"Client disconnected during {name} inference")
+
+    @staticmethod
+    async def _wait_for_disconnect(request):
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+    def stats(self) -> Dict:
+        stats = {}
+        for name, pool in list(self._pools.items()):
+            with pool.lock:
+                waits = np.array(pool.waits_ms) if pool.waits_ms else np.zeros(1)
+                runs = np.array(pool.runs_ms) if pool.runs_ms else np.zeros(1)
+                stats[name] = {
+                    "kind": pool.kind,
+                    "workers": pool.workers,
+                    "queued": pool.queued,
+                    "running": pool.running,
+                    "completed": pool.completed,
+                    "failed": pool.failed,
+                    "cancelled": pool.cancelled,
+                    "abandoned": pool.abandoned,
+                    "queue_wait_ms_p50": round(float(np.percentile(waits, 50)), 2),
+                    "queue_wait_ms_p99": round(float(np.percentile(waits, 99)), 2),
+                    "run_ms_p50": round(float(np.percentile(runs, 50)), 2),
+                    "run_ms_p99": round(float(np.percentile(runs, 99)), 2),
+                }
+        return stats
+
+
+executor = InferenceExecutor(parse_limits(os.getenv("INFERENCE_LIMITS", "")))
+
+
+def install_disconnect_handler(app):
+    """Answer abandoned requests with 499 (client closed request) instead of logging a server error."""
+    from fastapi.responses import Response
+
+    @app.exception_handler(ClientDisconnected)
+    async def _client_disconnected(request, exc):
+        return Response(status_code=499)
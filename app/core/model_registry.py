@@ -0,0 +1,189 @@
+import gc
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+import torch
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 0 keeps every loaded model; otherwise idle models are unloaded, least
+# recently used first, while the loaded total is above the budget.
+MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+
+logger = logging.getLogger("ModelRegistry")
+
+
+def _rss_bytes() -> int:
+    return psutil.Process().memory_info().rss if psutil else 0
+
+
+def estimate_bytes(obj: Any) -> int:
+    """Weights held by a loaded object: torch parameters and buffers, or its own `memory_bytes()`."""
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_bytes(item) for item in obj)
+    if hasattr(obj, "memory_bytes"):
+        return obj.memory_bytes()
+    if isinstance(obj, torch.nn.Module):
+        tensors = list(obj.parameters()) + list(obj.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+    return 0
+
+
+class _Entry:
+    __slots__ = ("value", "bytes", "rss_delta", "load_seconds", "loads", "hits", "users", "last_used")
+
+    def __init__(self):
+        self.value = None
+        self.bytes = 0
+        self.rss_delta = 0
+        self.load_seconds = 0.0
+        self.loads = 0
+        self.hits = 0
+        self.users = 0
+        self.last_used = 0.0
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of lazily loaded models.
+
+    Modules `register` a loader under a shared name at import and fetch
+    the instance with `get` (or `use` around inference), so every module
+    in the server shares one copy and nothing is loaded until first use.
+    With a memory budget, loading a model unloads the least recently used
+    models that are not inside a `use` block until the total fits.
+    """
+
+    def __init__(self, memory_budget_mb: float = MEMORY_BUDGET_MB):
+        self.memory_budget = int(memory_budget_mb * 2**20)
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.evictions = 0
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register a loader; the first registration of a name wins, so shared names can be registered anywhere."""
+        with self._lock:
+            if name not in self._loaders:
+                self._loaders[name] = loader
+                self._entries[name] = _Entry()
+                self._load_locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        with self._lock:
+            entry = self._entries[name]
+            value = self._touch(name, entry)
+        return value if value is not None else self._load(name)
+
+    @contextmanager
+    def use(self, name: str):
+        """Hold a model for the duration of a block; it cannot be evicted meanwhile."""
+        with self._lock:
+            self._entries[name].users += 1
+        try:
+            yield self.get(name)
+        finally:
+            with self._lock:
+                self._entries[name].users -= 1
+
+    def _touch(self, name: str, entry: _Entry):
+        if entry.value is not None:
+            entry.hits += 1
+            entry.last_used = time.time()
+            self._entries.move_to_end(name)
+        return entry.value
+
+    def _load(self, name: str) -> Any:
+        with self._load_locks[name]:
+            entry = self._entries[name]
+            if entry.value is not None:
+                with self._lock:
+                    return self._touch(name, entry)
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            value = self._loaders[name]()
+            load_seconds = time.perf_counter() - start
+            rss_delta = max(_rss_bytes() - rss_before, 0)
+            with self._lock:
+                entry.value = value
+                entry.bytes = estimate_bytes(value) or rss_delta
+                entry.rss_delta = rss_delta
+                entry.load_seconds = load_seconds
+                entry.loads += 1
+                entry.last_used = time.time()
+                self._entries.move_to_end(name)
+                evicted = self._enforce_budget(keep=name)
+            logger.info(f"Loaded model {name!r} in {load_seconds:.1f}s ({entry.bytes / 2**20:.0f} MB)")
+            if evicted:
+                self._release(evicted)
+            return value
+
+    def _enforce_budget(self, keep: str):
+        if not self.memory_budget:
+            return []
+        evicted = []
+        total = sum(entry.bytes for entry in self._entries.values() if entry.value is not None)
+        for name, entry in list(self._entries.items()):
+            if total <= self.memory_budget:
+                break
+            if name == keep or entry.value is None or entry.users:
+                continue
+            total -= entry.bytes
+            entry.value = None
+            evicted.append(name)
+            self.evictions += 1
+        if total > self.memory_budget:
+            logger.warning(f"Loaded models use {total / 2**20:.0f} MB, over the {self.memory_budget / 2**20:.0f} MB budget; all are in use")
+        return evicted
+
+    def _release(self, names):
+        logger.info(f"Evicted idle models {', '.join(names)} to stay within the memory budget")
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def evict(self, name: str) -> bool:
+        """Unload a model now (it reloads on next use); refused while it is in use."""
+        with self._lock:
+            entry = self._entries[name]
+            if entry.value is None or entry.users:
+                return False
+            entry.value = None
+        self._release([name])
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            models = {
+                name: {
+                    "loaded": entry.value is not None,
+                    "backend": getattr(entry.value, "backend", None),
+                    "memory_mb": round(entry.bytes / 2**20, 1),
+                    "rss_delta_mb": round(entry.rss_delta / 2**20, 1) if psutil else None,
+                    "load_seconds": round(entry.load_seconds, 2),
+                    "loads": entry.loads,
+                    "hits": entry.hits,
+                    "in_use": entry.users,
+                    "idle_seconds": round(time.time() - entry.last_used, 1) if entry.value is not None else None,
+                }
+                for name, entry in self._entries.items()
+            }
+        loaded = sum(model["memory_mb"] for model in models.values() if model["loaded"])
+        return {
+            "memory_budget_mb": round(self.memory_budget / 2**20, 1) if self.memory_budget else None,
+            "loaded_mb": round(loaded, 1),
+            "evictions": self.evictions,
+            "models": models,
+        }
+
+
+registry = ModelRegistry()
@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "20000"))
+MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "64"))
+TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Empty keeps the cache in memory only.
+DISK_PATH = os.getenv("RESULT_CACHE_DISK_PATH", "")
+
+logger = logging.getLogger("ResultCache")
+
+
+def normalize_input(text: str) -> str:
+    """
+    Unicode NFC with spaces collapsed within each line. Line breaks stay
+    (documents are segmented on them), as do case and punctuation, which
+    change the model's output.
+    """
+    lines = unicodedata.normalize("NFC", text).strip().splitlines()
+    return "\n".join(" ".join(line.split()) for line in lines)
+
+
+def cache_key(namespace: str, text: str, **settings) -> Tuple[str, str]:
+    """(namespace, digest) of the normalised input and everything that shapes the result (model, languages, profile)."""
+    payload = json.dumps([normalize_input(text), sorted(settings.items())], ensure_ascii=False, default=str)
+    return namespace, hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results (namespace TEXT, key TEXT, value TEXT NOT NULL, created REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: Tuple[str, str], ttl: float) -> Optional[Tuple[Any, float]]:
+        row = self._connection().execute("SELECT value, created FROM results WHERE namespace = ? AND key = ?", key).fetchone()
+        if row is None or time.time() - row[1] > ttl:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: Tuple[str, str], value: Any, created: float):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (namespace, key, value, created) VALUES (?, ?, ?, ?)",
+                (*key, json.dumps(value, ensure_ascii=False), created),
+            )
+
+    def purge(self, ttl: float) -> int:
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM results WHERE created < ?", (time.time() - ttl,)).rowcount
+
+
+class ResultCache:
+    """
+    Result cache for generation endpoints with single-flight deduplication.
+
+    Results (JSON-serialisable) live in an in-memory LRU bounded by entry
+    count, approximate size and TTL, and optionally in a SQLite tier that
+    survives restarts and is shared by worker processes. Identical requests
+    that arrive while the first is still computing wait for its result
+    instead of starting their own. Failures are never cached; if the
+    computation fails, the waiters get the same error. Results rejected by
+    `store_if` are shared with the waiters but not stored either.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        max_mb: float = MAX_MB,
+        ttl_seconds: float = TTL_SECONDS,
+        disk_path: str = DISK_PATH,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 2**20)
+        self.ttl_seconds = ttl_seconds
+        self._disk = _DiskTier(disk_path) if disk_path else None
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Counter] = {}
+        if self._disk:
+            removed = self._disk.purge(ttl_seconds)
+            if removed:
+                logger.info(f"Purged {removed} expired results from {disk_path}")
+
+    def _count(self, namespace: str, event: str):
+        self._counters.setdefault(namespace, Counter())[event] += 1
+
+    def _get_memory(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created, size = entry
+            if time.time() - created > self.ttl_seconds:
+                del self._entries[key]
+                self._bytes -= size
+                self._count(key[0], "expired")
+                return None
+            self._entries.move_to_end(key)
+            self._count(key[0], "memory_hits")
+            return value
+
+    def _store_memory(self, key, value, created: float):
+        size = len(json.dumps(value, ensure_ascii=False))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (value, created, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                evicted, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._count(evicted[0], "evictions")
+
+    def get(self, key: Tuple[str, str]) -> Optional[Any]:
+        value = self._get_memory(key)
+        if value is not None or self._disk is None:
+            return value
+        found = self._disk.get(key, self.ttl_seconds)
+        if found is None:
+            return None
+        value, created = found
+        self._store_memory(key, value, created)
+        with self._lock:
+            self._count(key[0], "disk_hits")
+        return value
+
+    def put(self, key: Tuple[str, str], value: Any):
+        created = time.time()
+        self._store_memory(key, value, created)
+        if self._disk:
+            try:
+                self._disk.put(key, value, created)
+            except sqlite3.Error as e:
+                logger.warning(f"Result cache disk write failed: {e}")
+
+    def _claim(self, key) -> Tuple[Future, bool]:
+        """The in-flight future for `key` and whether the caller owns (must compute) it."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._count(key[0], "coalesced")
+                return future, False
+            future = self._inflight[key] = Future()
+            self._count(key[0], "misses")
+            return future, True
+
+    def _settle(self, key, future: Future, value=None, error: BaseException = None):
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def get_or_compute(self, key: Tuple[str, str], compute: Callable[[], Any], store_if: Callable[[Any], bool] = None) -> Any:
+        """Blocking form, for code already running in a worker thread."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        future, owner = self._claim(key)
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        if store_if is None or store_if(value):
+            self.put(key, value)
+        self._settle(key, future, value)
+        return value
+
+    async def aget_or_compute(
+        self,
+        key: Tuple[str, str],
+        compute: Callable[[], Awaitable[Any]],
+        store_if: Callable[[Any], bool] = None,
+        retry_on: tuple = (),
+    ) -> Any:
+        """
+        Awaitable form for route handlers; disk lookups and writes run off the
+        event loop. A waiter whose leader failed with one of `retry_on` (for
+        example the leader's client disconnecting) computes for itself instead.
+        """
+        while True:
+            value = self._get_memory(key)
+            if value is None and self._disk is not None:
+                value = await asyncio.to_thread(self.get, key)
+            if value is not None:
+                return value
+            future, owner = self._claim(key)
+            if not owner:
+                try:
+                    return await asyncio.wrap_future(future)
+                except retry_on:
+                    continue
+            try:
+                value = await compute()
+            except BaseException as e:
+                self._settle(key, future, error=e)
+                raise
+            # Waiters get the value even if the leader is cancelled while storing it.
+            try:
+                if store_if is None or store_if(value):
+                    if self._disk is not None:
+                        await asyncio.to_thread(self.put, key, value)
+                    else:
+                        self.put(key, value)
+            finally:
+                self._settle(key, future, value)
+            return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = {namespace: dict(counter) for namespace, counter in self._counters.items()}
+            entries, size, inflight = len(self._entries), self._bytes, len(self._inflight)
+        for counter in counters.values():
+            lookups = sum(counter.get(event, 0) for event in ("memory_hits", "disk_hits", "misses", "coalesced"))
+            hits = counter.get("memory_hits", 0) + counter.get("disk_hits", 0) + counter.get("coalesced", 0)
+            counter["hit_ratio"] = round(hits / lookups, 3) if lookups else 0.0
+        return {
+            "entries": entries,
+            "memory_mb": round(size / 2**20, 2),
+            "max_entries": self.max_entries,
+            "max_mb": round(self.max_bytes / 2**20, 1),
+            "ttl_seconds": self.ttl_seconds,
+            "disk_tier": self._disk.path if self._disk else None,
+            "in_flight": inflight,
+            "namespaces": counters,
+        }
+
+
+result_cache = ResultCache()
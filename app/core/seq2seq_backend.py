@@ -0,0 +1,381 @@
+import os
+import sys
+import csv
+import json
+import glob
+import time
+import shutil
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.core.decoding import generation_kwargs
+
+# "auto" serves a drift-checked ONNX export when one exists (CPU only), "onnx"
+# serves any export, "torch" always uses the eager PyTorch model.
+BACKEND = os.getenv("SEQ2SEQ_BACKEND", "auto")
+VARIANT = os.getenv("SEQ2SEQ_VARIANT", "int8")
+EXPORT_ROOT = os.getenv("SEQ2SEQ_EXPORT_DIR", "models/onnx")
+ORT_THREADS = int(os.getenv("SEQ2SEQ_ORT_THREADS", "0"))
+MANIFEST = "export.json"
+VARIANTS = ("fp32", "int8")
+ONNX_PARTS = ("encoder_model", "decoder_model", "decoder_with_past_model")
+
+# An export is served in "auto" mode only if, against PyTorch, its first-step
+# top-1 token agrees this often and its greedy outputs are this similar.
+DRIFT_MIN_TOP1 = 0.98
+DRIFT_MIN_SIMILARITY = 0.90
+
+REPORTS_DIR = "app/core/reports/"
+
+logger = logging.getLogger("Seq2Seq-Backend")
+
+
+def export_dir(model_name: str) -> str:
+    return os.path.join(EXPORT_ROOT, model_name.replace("/", "--"))
+
+
+def read_manifest(directory: str) -> Optional[Dict]:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(directory: str, manifest: Dict):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _session_options():
+    if not ORT_THREADS:
+        return None
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = ORT_THREADS
+    return options
+
+
+def load_onnx(model_name: str, variant: str):
+    """The exported encoder, decoder and decoder-with-past (KV cache) sessions as one generate()-able model."""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    manifest = read_manifest(export_dir(model_name))
+    if manifest is None or variant not in manifest["variants"]:
+        raise FileNotFoundError(f"No {variant} ONNX export of {model_name} under {export_dir(model_name)}")
+    entry = manifest["variants"][variant]
+    return ORTModelForSeq2SeqLM.from_pretrained(
+        os.path.join(export_dir(model_name), entry["dir"]),
+        encoder_file_name=entry["files"]["encoder_model"],
+        decoder_file_name=entry["files"]["decoder_model"],
+        decoder_with_past_file_name=entry["files"]["decoder_with_past_model"],
+        use_cache=True,
+        session_options=_session_options(),
+    )
+
+
+def load_torch(model_name: str, device="cpu"):
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name).to(device)
+    model.eval()
+    return model
+
+
+class Seq2SeqModel:
+    """
+    `generate` on the configured backend for a seq2seq checkpoint.
+
+    With an ONNX export in use, any load or generation error switches the
+    instance to the PyTorch model for good, so callers keep working on
+    exports that are stale or missing an operator.
+    """
+
+    def __init__(self, model_name: str, device="cpu", backend: str = BACKEND, variant: str = VARIANT):
+        self.model_name = model_name
+        self.device = device
+        self.variant = variant
+        self._lock = threading.Lock()
+        self._model = None
+        self.backend = "torch"
+        if backend != "torch" and str(device) == "cpu":
+            self._model = self._try_onnx(backend == "onnx")
+        if self._model is None:
+            self._model = load_torch(model_name, device)
+        logger.info(f"Serving {model_name} with the {self.backend} backend")
+
+    def _try_onnx(self, forced: bool):
+        manifest = read_manifest(export_dir(self.model_name))
+        drift = (manifest or {}).get("drift", {}).get(self.variant)
+        if not forced and not (drift and drift["passed"]):
+            return None
+        try:
+            model = load_onnx(self.model_name, self.variant)
+        except Exception as e:
+            logger.warning(f"ONNX {self.variant} export of {self.model_name} unavailable, using PyTorch: {e}")
+            return None
+        self.backend = f"onnx-{self.variant}"
+        return model
+
+    def _fall_back(self, error: Exception):
+        with self._lock:
+            if self.backend != "torch":
+                logger.error(f"ONNX generation failed for {self.model_name}, switching to PyTorch: {error}")
+                self._model = load_torch(self.model_name, self.device)
+                self.backend = "torch"
+
+    def generate(self, **kwargs):
+        model = self._model
+        if self.backend == "torch":
+            with torch.no_grad():
+                return model.generate(**kwargs)
+        try:
+            return model.generate(**kwargs)
+        except Exception as e:
+            self._fall_back(e)
+            return self.generate(**kwargs)
+
+    def memory_bytes(self) -> int:
+        """PyTorch parameter and buffer bytes, or the size of the ONNX graphs being served."""
+        if self.backend == "torch":
+            tensors = list(self._model.parameters()) + list(self._model.buffers())
+            return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+        directory = os.path.join(export_dir(self.model_name), self.variant)
+        return sum(os.path.getsize(path) for path in glob.glob(os.path.join(directory, "*.onnx*")))
+
+    def __call__(self, **kwargs):
+        with torch.no_grad():
+            return self._model(**kwargs)
+
+
+def load_seq2seq(model_name: str, device="cpu") -> Seq2SeqModel:
+    return Seq2SeqModel(model_name, device)
+
+
+# ---- Export, drift check and report -----------------------------------------------------------
+
+MBART_LANG = "en_XX"
+
+
+def sample_inputs(model_name: str, corpus_path: str, size: int) -> List[str]:
+    """
+    Inputs for the model's task from wolayta.csv: translation prompts in both
+    directions for T5, multi-sentence English passages for mBART.
+    """
+    from app.translation.translation_memory import clean_corpus_pair
+
+    with open(corpus_path, "r", encoding="utf-8-sig", newline="") as f:
+        pairs = [clean_corpus_pair(row["English"], row["Wolaytta"]) for row in csv.DictReader(f)]
+    pairs = [(en, wal) for en, wal in pairs if en and wal][::7]
+    if "mbart" in model_name:
+        sentences = [en for en, _ in pairs[:size * 8]]
+        return [" ".join(sentences[i * 8:(i + 1) * 8]) for i in range(size)]
+    half = size // 2
+    texts = [f"translate en to wolaytta: {en}" for en, _ in pairs[:half]]
+    texts += [f"translate wolaytta to en: {wal}" for _, wal in pairs[half:size]]
+    return texts
+
+
+def _tokenizer(model_name: str):
+    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast="mbart" not in model_name)
+    extra = {}
+    if "mbart" in model_name:
+        tokenizer.src_lang = MBART_LANG
+        lang_id = tokenizer.convert_tokens_to_ids(MBART_LANG)
+        extra = {"decoder_start_token_id": lang_id, "forced_bos_token_id": lang_id}
+    return tokenizer, extra
+
+
+def _task(model_name: str) -> str:
+    return "summarization" if "mbart" in model_name else "translation"
+
+
+def export_model(model_name: str, quantize: bool = True) -> Dict:
+    """
+    Export encoder, decoder and decoder-with-past graphs to ONNX (fp32), and
+    dynamically quantize their weights to int8 (activations stay fp32).
+    """
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    root = export_dir(model_name)
+    fp32_dir = os.path.join(root, "fp32")
+    shutil.rmtree(root, ignore_errors=True)
+    start = time.perf_counter()
+    ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True).save_pretrained(fp32_dir)
+    manifest = {
+        "model": model_name,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "variants": {"fp32": {"dir": "fp32", "files": {part: f"{part}.onnx" for part in ONNX_PARTS}}},
+        "drift": {},
+    }
+    if quantize:
+        int8_dir = os.path.join(root, "int8")
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        for part in ONNX_PARTS:
+            quantizer = ORTQuantizer.from_pretrained(fp32_dir, file_name=f"{part}.onnx")
+            quantizer.quantize(save_dir=int8_dir, quantization_config=config)
+        for name in glob.glob(os.path.join(fp32_dir, "*.json")):
+            shutil.copy(name, int8_dir)
+        manifest["variants"]["int8"] = {"dir": "int8", "files": {part: f"{part}_quantized.onnx" for part in ONNX_PARTS}}
+    manifest["export_seconds"] = round(time.perf_counter() - start, 1)
+    _write_manifest(root, manifest)
+    logger.info(f"Exported {model_name} to {root} ({', '.join(manifest['variants'])})")
+    return manifest
+
+
+def drift_check(model_name: str, variant: str, texts: List[str], reference=None) -> Dict:
+    """
+    Compare an export with the PyTorch model on `texts`: first decoder step
+    logits (max abs difference, top-1 agreement) and greedy outputs (exact
+    match rate, mean character similarity).
+    """
+    tokenizer, extra = _tokenizer(model_name)
+    reference = reference or load_torch(model_name)
+    candidate = load_onnx(model_name, variant)
+    start_id = extra.get("decoder_start_token_id", reference.config.decoder_start_token_id)
+    max_diff, top1, exact, similarity = 0.0, [], [], []
+    for text in texts:
+        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+        decoder_input_ids = torch.tensor([[start_id]])
+        with torch.no_grad():
+            ref_logits = reference(**inputs, decoder_input_ids=decoder_input_ids).logits[0, -1]
+            cand_logits = candidate(**inputs, decoder_input_ids=decoder_input_ids).logits[0, -1]
+        max_diff = max(max_diff, float((ref_logits - cand_logits).abs().max()))
+        top1.append(int(ref_logits.argmax()) == int(cand_logits.argmax()))
+        kwargs = {**generation_kwargs(_task(model_name), "fast", inputs["input_ids"].shape[1]), **extra}
+        with torch.no_grad():
+            ref_text = tokenizer.decode(reference.generate(**inputs, **kwargs)[0], skip_special_tokens=True)
+        cand_text = tokenizer.decode(candidate.generate(**inputs, **kwargs)[0], skip_special_tokens=True)
+        exact.append(ref_text == cand_text)
+        similarity.append(SequenceMatcher(None, ref_text, cand_text).ratio())
+    result = {
+        "samples": len(texts),
+        "logit_max_abs_diff": round(max_diff, 5),
+        "top1_agreement": round(float(np.mean(top1)), 4),
+        "exact_match": round(float(np.mean(exact)), 4),
+        "char_similarity": round(float(np.mean(similarity)), 4),
+    }
+    result["passed"] = result["top1_agreement"] >= DRIFT_MIN_TOP1 and result["char_similarity"] >= DRIFT_MIN_SIMILARITY
+    return result
+
+
+def verify_export(model_name: str, texts: List[str]) -> Dict:
+    """Drift-check every exported variant and record the verdicts in the manifest."""
+    root = export_dir(model_name)
+    manifest = read_manifest(root)
+    reference = load_torch(model_name)
+    for variant in manifest["variants"]:
+        manifest["drift"][variant] = drift_check(model_name, variant, texts, reference)
+        logger.info(f"{model_name} {variant} drift: {manifest['drift'][variant]}")
+    _write_manifest(root, manifest)
+    return manifest["drift"]
+
+
+def _rss_bytes() -> Optional[int]:
+    return psutil.Process().memory_info().rss if psutil else None
+
+
+def _measure_backend(model_name: str, backend: str, texts: List[str], profile: str) -> Dict:
+    """Load one backend and time `generate` per text; run in a fresh process so RSS is not shared."""
+    tokenizer, extra = _tokenizer(model_name)
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    model = load_torch(model_name) if backend == "torch" else load_onnx(model_name, backend.split("-", 1)[1])
+    load_seconds = time.perf_counter() - start
+    rss_loaded = _rss_bytes()
+    latencies = []
+    for text in texts:
+        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+        kwargs = {**generation_kwargs(_task(model_name), profile, inputs["input_ids"].shape[1]), **extra}
+        start = time.perf_counter()
+        with torch.no_grad():
+            model.generate(**inputs, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+    rss_after = _rss_bytes()
+    return {
+        "backend": backend,
+        "profile": profile,
+        "load_seconds": round(load_seconds, 2),
+        "rss_model_mb": round((rss_loaded - rss_before) / 2**20, 1) if psutil else None,
+        "rss_peak_mb": round(rss_after / 2**20, 1) if psutil else None,
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)), 1),
+        "mean_latency_ms": round(float(np.mean(latencies)), 1),
+    }
+
+
+def _disk_mb(model_name: str, backend: str) -> Optional[float]:
+    if backend == "torch":
+        return None
+    directory = os.path.join(export_dir(model_name), backend.split("-", 1)[1])
+    return round(sum(os.path.getsize(path) for path in glob.glob(os.path.join(directory, "*.onnx*"))) / 2**20, 1)
+
+
+def compare_backends(model_name: str, texts: List[str], profile: str = "fast") -> List[Dict]:
+    manifest = read_manifest(export_dir(model_name)) or {"variants": {}, "drift": {}}
+    backends = ["torch"] + [f"onnx-{variant}" for variant in VARIANTS if variant in manifest["variants"]]
+    rows = []
+    for backend in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            row = pool.submit(_measure_backend, model_name, backend, texts, profile).result()
+        row["disk_mb"] = _disk_mb(model_name, backend)
+        row["drift"] = manifest["drift"].get(backend.split("-", 1)[-1]) if backend != "torch" else None
+        logger.info(row)
+        rows.append(row)
+    return rows
+
+
+MODELS = {
+    "t5": "Sakuzas/t5-wolaytta-english",
+    "mbart": "facebook/mbart-large-50-many-to-many-mmt",
+}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export the seq2seq models to ONNX/int8, check drift and compare backends.")
+    parser.add_argument("command", choices=["export", "verify", "report"])
+    parser.add_argument("--model", choices=list(MODELS), default="t5")
+    parser.add_argument("--corpus", default="data/wolayta.csv")
+    parser.add_argument("--samples", type=int, default=40)
+    parser.add_argument("--profile", default="fast")
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+
+    model_name = MODELS[args.model]
+    texts = sample_inputs(model_name, args.corpus, args.samples)
+    if args.command == "export":
+        export_model(model_name, quantize=not args.no_quantize)
+        print(json.dumps(verify_export(model_name, texts), indent=2))
+    elif args.command == "verify":
+        print(json.dumps(verify_export(model_name, texts), indent=2))
+    else:
+        rows = compare_backends(model_name, texts, args.profile)
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        path = os.path.join(REPORTS_DIR, f"seq2seq_backends_{args.model}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        for row in rows:
+            print(row)
+        logger.info(f"Saved backend comparison to {path}")
+
+
+if __name__ == "__main__":
+    main()
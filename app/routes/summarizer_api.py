@@ -1,43 +1,49 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from app.core.decoding import resolve_profile
+from app.core.model_registry import registry
+from app.core.inference_executor import ClientDisconnected, executor
+from app.core.result_cache import cache_key, result_cache
+from app.Symmerize.summarizer import MODEL_NAME, SMALL_MODEL_DIR, SRC_LANG, TGT_LANG, map_reduce, summarize_document, summary_router
 router = APIRouter()
-MODEL_NAME = "facebook/mbart-large-50-many-to-many-mmt"
-SRC_LANG = "en_XX"
-TGT_LANG = "en_XX"
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-try:
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=False)
-    tokenizer.src_lang = SRC_LANG
-    model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME).to(device)
-    model.eval()
-except Exception as e:
-    raise RuntimeError(f"Failed to load summarization model: {e}")
 class SummarizationRequest(BaseModel):
     text: str
     src_lang: str = SRC_LANG
     tgt_lang: str = TGT_LANG
-@router.post("/summarize/")
-async def summarize_text(payload: SummarizationRequest):
+    profile: str = None
+async def _summarize(payload: SummarizationRequest, request: Request):
+    """
+    Inputs longer than one model window are summarized map-reduce style instead of truncated.
+    Identical concurrent requests share one summarization; repeats are answered from the result cache.
+    """
     try:
-        tokenizer.src_lang = payload.src_lang
-        inputs = tokenizer(
-            payload.text, return_tensors="pt", max_length=512, truncation=True
-        ).to(device)
-
-        summary_ids = model.generate(
-            **inputs,
-            decoder_start_token_id=tokenizer.lang_code_to_id[payload.tgt_lang],
-            forced_bos_token_id=tokenizer.lang_code_to_id[payload.tgt_lang],
-            num_beams=4,
-            min_length=30,
-            max_length=120,
-            length_penalty=2.0,
-            early_stopping=True,
+        try:
+            profile = resolve_profile(payload.profile)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        models = [MODEL_NAME, SMALL_MODEL_DIR if summary_router.small_available else None]
+        key = cache_key("summarize", payload.text, models=models, src_lang=payload.src_lang, tgt_lang=payload.tgt_lang, profile=profile)
+        return await result_cache.aget_or_compute(
+            key,
+            lambda: executor.run(
+                "summarization", summarize_document, payload.text, payload.src_lang, payload.tgt_lang, payload.profile, request=request
+            ),
+            retry_on=(ClientDisconnected,),
         )
-        summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        return {"summary": summary}
 
+    except (HTTPException, ClientDisconnected):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
+@router.post("/summarize/")
+async def summarize_text(payload: SummarizationRequest, request: Request):
+    result = await _summarize(payload, request)
+    return {"summary": result["summary"]}
+@router.post("/summarize/document")
+async def summarize_long_document(payload: SummarizationRequest, request: Request):
+    """Final summary plus the per-chunk summaries and reduce rounds."""
+    result = await _summarize(payload, request)
+    return {key: value for key, value in result.items() if key != "chunk_texts"}
+@router.get("/models")
+def model_stats():
+    return {**registry.stats(), "chunk_cache": map_reduce.cache.stats(), "routing": summary_router.stats(), "executor": executor.stats(), "results": result_cache.stats()}
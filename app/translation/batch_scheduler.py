@@ -0,0 +1,157 @@
+import math
+import time
+import logging
+import threading
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, List, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 10.0
+# Number of recent queue waits kept for the percentile stats.
+WAIT_SAMPLES = 2048
+
+logger = logging.getLogger("Translation-Batcher")
+
+
+class _Request:
+    __slots__ = ("text", "tokens", "future", "enqueued")
+
+    def __init__(self, text: str, tokens: int):
+        self.text = text
+        self.tokens = tokens
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+def length_bucket(tokens: int) -> int:
+    """Requests within a factor of two in token length share a bucket."""
+    return int(math.log2(max(tokens, 1)))
+
+
+class DynamicBatcher:
+    """
+    Groups pending generation requests by `key` (the language direction) and
+    token-length bucket, and runs each group as one padded `run_batch` call.
+
+    A group is dispatched once it holds `max_batch_size` requests or its
+    oldest request has waited `max_wait_ms`, whichever comes first; among
+    ready groups the one with the oldest request goes first. Similar lengths
+    keep padding, and so wasted decoder work, low. With `workers` > 1,
+    that many batches are generated concurrently.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Hashable, List[str]], List[str]],
+        count_tokens: Callable[[str], int],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        workers: int = 1,
+    ):
+        self.run_batch = run_batch
+        self.count_tokens = count_tokens
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.workers = workers
+        self._groups: "OrderedDict[Tuple[Hashable, int], List[_Request]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._threads = None
+        self._batch_sizes = Counter()
+        self._waits_ms = deque(maxlen=WAIT_SAMPLES)
+        self._padding = deque(maxlen=WAIT_SAMPLES)
+
+    def _ensure_started(self):
+        if self._threads is None:
+            with self._cond:
+                if self._threads is None:
+                    self._threads = [
+                        threading.Thread(target=self._run, name=f"translation-batcher-{i}", daemon=True)
+                        for i in range(self.workers)
+                    ]
+                    for thread in self._threads:
+                        thread.start()
+
+    def submit(self, text: str, key: Hashable) -> Future:
+        self._ensure_started()
+        request = _Request(text, self.count_tokens(text))
+        with self._cond:
+            self._groups.setdefault((key, length_bucket(request.tokens)), []).append(request)
+            self._cond.notify()
+        return request.future
+
+    def run(self, texts: List[str], key: Hashable, timeout: float = None) -> List[str]:
+        """Submit several texts at once (they may join other callers' batches) and wait for all."""
+        futures = [self.submit(text, key) for text in texts]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _next_batch(self) -> Tuple[Hashable, List[_Request]]:
+        with self._cond:
+            while True:
+                now = time.perf_counter()
+                ready, next_deadline = None, None
+                for group, requests in self._groups.items():
+                    deadline = requests[0].enqueued + self.max_wait
+                    if len(requests) >= self.max_batch_size or deadline <= now:
+                        if ready is None or requests[0].enqueued < self._groups[ready][0].enqueued:
+                            ready = group
+                    elif next_deadline is None or deadline < next_deadline:
+                        next_deadline = deadline
+                if ready is not None:
+                    requests = self._groups[ready]
+                    batch, rest = requests[:self.max_batch_size], requests[self.max_batch_size:]
+                    if rest:
+                        self._groups[ready] = rest
+                    else:
+                        del self._groups[ready]
+                    return ready[0], batch
+                self._cond.wait(timeout=None if next_deadline is None else next_deadline - now)
+
+    def _run(self):
+        while True:
+            key, batch = self._next_batch()
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            longest = max(request.tokens for request in batch)
+            with self._cond:
+                self._batch_sizes[len(batch)] += 1
+                self._waits_ms.extend((started - request.enqueued) * 1000 for request in batch)
+                self._padding.append(1 - sum(request.tokens for request in batch) / (longest * len(batch)))
+            try:
+                outputs = self.run_batch(key, [request.text for request in batch])
+            except Exception as e:
+                logger.error(f"Batched generation failed: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            for request, output in zip(batch, outputs):
+                request.future.set_result(output)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            sizes = dict(sorted(self._batch_sizes.items()))
+            waits = np.array(self._waits_ms) if self._waits_ms else np.zeros(1)
+            padding = float(np.mean(self._padding)) if self._padding else 0.0
+            pending = sum(len(requests) for requests in self._groups.values())
+        batches = sum(sizes.values())
+        requests = sum(size * count for size, count in sizes.items())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "workers": self.workers,
+            "batches": batches,
+            "requests": requests,
+            "mean_batch_size": round(requests / batches, 3) if batches else 0.0,
+            "batch_size_histogram": sizes,
+            "mean_padding_ratio": round(padding, 3),
+            "queue_wait_ms": {
+                "mean": round(float(waits.mean()), 3),
+                "p50": round(float(np.percentile(waits, 50)), 3),
+                "p99": round(float(np.percentile(waits, 99)), 3),
+            },
+            "pending": pending,
+        }
@@ -0,0 +1,105 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import logging
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.core.decoding import DECODING_PROFILES
+from app.QA.eval_metrics import compute_bleu, compute_chrf
+from app.translation.translation_memory import clean_corpus_pair
+
+REPORTS_DIR = "app/translation/reports/"
+
+logger = logging.getLogger("Translation-ProfileBench")
+
+
+def held_out_pairs(csv_path: str, size: int, seed: int) -> List[Tuple[str, str]]:
+    """A seeded sample of cleaned (English, Wolaytta) sentence pairs."""
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        pairs = {clean_corpus_pair(row["English"], row["Wolaytta"]) for row in csv.DictReader(f)}
+    pairs = sorted((en, wal) for en, wal in pairs if en and wal)
+    random.Random(seed).shuffle(pairs)
+    return pairs[:size]
+
+
+def _latency_stats(latencies: List[float]) -> Dict:
+    ms = np.array(latencies) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 1), "p95_ms": round(float(np.percentile(ms, 95)), 1)}
+
+
+def benchmark_translation(pairs: List[Tuple[str, str]]) -> List[Dict]:
+    # Straight to the model: the translation memory is seeded with this corpus.
+    from app.translation.translation import generate_translations
+
+    report = []
+    for source, target in (("en", "wolaytta"), ("wolaytta", "en")):
+        for profile in DECODING_PROFILES["translation"]:
+            latencies, scored = [], []
+            for english, wolaytta in pairs:
+                text, reference = (english, wolaytta) if source == "en" else (wolaytta, english)
+                start = time.perf_counter()
+                output = generate_translations((source, target, profile), [f"translate {source} to {target}: {text}"])[0]
+                latencies.append(time.perf_counter() - start)
+                scored.append((reference, output))
+            row = {"task": "translation", "direction": f"{source}->{target}", "profile": profile, "samples": len(pairs)}
+            row.update(_latency_stats(latencies))
+            row.update({"bleu": round(compute_bleu(scored), 4), "chrf": round(compute_chrf(scored), 2)})
+            logger.info(row)
+            report.append(row)
+    return report
+
+
+def benchmark_summarization(pairs: List[Tuple[str, str]], passages: int) -> List[Dict]:
+    """Latency and summary length per profile on English passages built from the corpus (no references)."""
+    from app.Symmerize.summarizer import summarize
+
+    sentences = [english for english, _ in pairs]
+    texts = [" ".join(sentences[i::passages]) for i in range(passages)]
+    report = []
+    for profile in DECODING_PROFILES["summarization"]:
+        latencies, lengths = [], []
+        for text in texts:
+            start = time.perf_counter()
+            summary = summarize(text, profile=profile)
+            latencies.append(time.perf_counter() - start)
+            lengths.append(len(summary.split()))
+        row = {"task": "summarization", "profile": profile, "samples": len(texts), "mean_summary_words": round(float(np.mean(lengths)), 1)}
+        row.update(_latency_stats(latencies))
+        logger.info(row)
+        report.append(row)
+    return report
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Latency and BLEU/ChrF of each decoding profile on held-out wolayta.csv pairs.")
+    parser.add_argument("--corpus", default="data/wolayta.csv")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--summarization", action="store_true", help="Also time the summarization profiles")
+    parser.add_argument("--passages", type=int, default=10)
+    args = parser.parse_args()
+
+    pairs = held_out_pairs(args.corpus, args.samples, args.seed)
+    report = benchmark_translation(pairs)
+    if args.summarization:
+        report += benchmark_summarization(pairs, args.passages)
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = os.path.join(REPORTS_DIR, "decoding_profiles.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for row in report:
+        print(row)
+    logger.info(f"Saved decoding profile report to {path}")
+
+
+if __name__ == "__main__":
+    main()
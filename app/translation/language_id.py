@@ -0,0 +1,180 @@
+import os
+import csv
+import time
+import random
+import logging
+import argparse
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.translation.translation_memory import clean_corpus_pair
+
+# Language labels as the translation pipeline spells them.
+LANGUAGES = ("en", "wolaytta")
+NGRAM_RANGE = (1, 4)
+SMOOTHING = 0.5
+# Mean per-n-gram log-likelihood ratio is scaled by this before the softmax.
+TEMPERATURE = 4.0
+DEFAULT_MIN_CONFIDENCE = 0.8
+CACHE_SIZE = 8192
+
+logger = logging.getLogger("Translation-LanguageID")
+
+
+def char_ngrams(text: str) -> List[str]:
+    """Character 1-4 grams of each lower-cased word, padded with spaces to mark word edges."""
+    grams = []
+    low, high = NGRAM_RANGE
+    for word in text.lower().replace("’", "'").split():
+        word = "".join(ch for ch in word if ch.isalpha() or ch == "'")
+        if not word:
+            continue
+        padded = f" {word} "
+        for n in range(low, high + 1):
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+class LanguageIdentifier:
+    """
+    Multinomial naive Bayes over character n-grams.
+
+    The vocabulary maps each n-gram to a column of a (languages x vocab)
+    float32 log-probability array; unseen n-grams get each language's
+    smoothed floor. Results are memoised per input text.
+    """
+
+    def __init__(self, vocab: Dict[str, int], weights: np.ndarray, unseen: np.ndarray, languages=LANGUAGES,
+                 min_confidence: float = DEFAULT_MIN_CONFIDENCE, signature: str = ""):
+        self.vocab = vocab
+        self.weights = weights
+        self.unseen = unseen
+        self.languages = tuple(languages)
+        self.min_confidence = min_confidence
+        self.signature = signature
+        self.identify = lru_cache(maxsize=CACHE_SIZE)(self._identify)
+
+    @classmethod
+    def train(cls, samples: Dict[str, List[str]], **kwargs) -> "LanguageIdentifier":
+        counts = {lang: Counter(gram for text in texts for gram in char_ngrams(text)) for lang, texts in samples.items()}
+        grams = sorted(set().union(*counts.values()))
+        vocab = {gram: i for i, gram in enumerate(grams)}
+        languages = tuple(samples)
+        weights = np.empty((len(languages), len(grams)), dtype=np.float32)
+        unseen = np.empty(len(languages), dtype=np.float32)
+        for row, lang in enumerate(languages):
+            total = sum(counts[lang].values()) + SMOOTHING * (len(grams) + 1)
+            weights[row] = np.log((np.array([counts[lang][gram] for gram in grams], dtype=np.float64) + SMOOTHING) / total)
+            unseen[row] = np.log(SMOOTHING / total)
+        return cls(vocab, weights, unseen, languages, **kwargs)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        grams = sorted(self.vocab, key=self.vocab.get)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, grams=np.array(grams), weights=self.weights, unseen=self.unseen,
+                     languages=np.array(self.languages), signature=np.array(self.signature))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "LanguageIdentifier":
+        with np.load(path) as data:
+            vocab = {gram: i for i, gram in enumerate(data["grams"].tolist())}
+            return cls(vocab, data["weights"], data["unseen"], tuple(data["languages"].tolist()),
+                       signature=str(data["signature"]), **kwargs)
+
+    def _identify(self, text: str) -> Tuple[Optional[str], float]:
+        """(language, confidence); language is None when the text is too ambiguous to call."""
+        ids, missing = [], 0
+        for gram in char_ngrams(text):
+            index = self.vocab.get(gram)
+            if index is None:
+                missing += 1
+            else:
+                ids.append(index)
+        total = len(ids) + missing
+        if not total:
+            return None, 0.0
+        scores = self.weights[:, ids].sum(axis=1) + self.unseen * missing
+        scores = TEMPERATURE * (scores - scores.max()) / total
+        probs = np.exp(scores)
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        confidence = float(probs[best])
+        return (self.languages[best] if confidence >= self.min_confidence else None), confidence
+
+
+def corpus_signature(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def corpus_samples(csv_path: str) -> Dict[str, List[str]]:
+    """English and Wolaytta sentences of wolayta.csv, keyed by language label."""
+    samples = {lang: [] for lang in LANGUAGES}
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            english, wolaytta = clean_corpus_pair(row.get("English") or "", row.get("Wolaytta") or "")
+            if english and wolaytta:
+                samples["en"].append(english)
+                samples["wolaytta"].append(wolaytta)
+    return samples
+
+
+def load_or_train(model_path: str, csv_path: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> LanguageIdentifier:
+    """Load the saved identifier, retraining when wolayta.csv has changed since it was built."""
+    signature = corpus_signature(csv_path)
+    if os.path.exists(model_path):
+        identifier = LanguageIdentifier.load(model_path, min_confidence=min_confidence)
+        if identifier.signature == signature:
+            return identifier
+    start = time.perf_counter()
+    identifier = LanguageIdentifier.train(corpus_samples(csv_path), min_confidence=min_confidence, signature=signature)
+    identifier.save(model_path)
+    logger.info(f"🔤 Trained language identifier on {csv_path} ({len(identifier.vocab)} n-grams) in {time.perf_counter() - start:.2f}s")
+    return identifier
+
+
+def evaluate(csv_path: str, held_out: float, seed: int) -> Dict:
+    """Accuracy, abstention rate and per-call latency on a held-out split of the corpus pairs."""
+    samples = corpus_samples(csv_path)
+    pairs = list(zip(samples["en"], samples["wolaytta"]))
+    random.Random(seed).shuffle(pairs)
+    cut = int(len(pairs) * (1 - held_out))
+    identifier = LanguageIdentifier.train({"en": [e for e, _ in pairs[:cut]], "wolaytta": [w for _, w in pairs[:cut]]})
+    tests = [(e, "en") for e, _ in pairs[cut:]] + [(w, "wolaytta") for _, w in pairs[cut:]]
+
+    start = time.perf_counter()
+    results = [identifier.identify(text) for text, _ in tests]
+    cold_us = (time.perf_counter() - start) / len(tests) * 1e6
+    start = time.perf_counter()
+    for text, _ in tests:
+        identifier.identify(text)
+    warm_us = (time.perf_counter() - start) / len(tests) * 1e6
+
+    answered = [(label, expected) for (label, _), (_, expected) in zip(results, tests) if label is not None]
+    return {
+        "test_texts": len(tests),
+        "accuracy": round(sum(label == expected for label, expected in answered) / max(len(answered), 1), 4),
+        "abstained": round(1 - len(answered) / len(tests), 4),
+        "uncached_us_per_call": round(cold_us, 1),
+        "cached_us_per_call": round(warm_us, 2),
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Train and evaluate the English/Wolaytta language identifier.")
+    parser.add_argument("--corpus", default="data/wolayta.csv")
+    parser.add_argument("--model", default="data/language_id.npz")
+    parser.add_argument("--held-out", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    print(evaluate(args.corpus, args.held_out, args.seed))
+    identifier = load_or_train(args.model, args.corpus)
+    for text in ("How are you today?", "Neeni waanidee?", "Taani haggaazan oosuwaa oottays.", "ok"):
+        print(f"{text!r} -> {identifier.identify(text)}")
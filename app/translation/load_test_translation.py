@@ -0,0 +1,53 @@
+import time
+import asyncio
+import argparse
+import statistics
+from typing import Dict, List
+
+import httpx
+
+DEFAULT_TEXTS = [
+    "How are you today?",
+    "The market in Sodo is open on Saturday.",
+    "Wolaytta is spoken in southern Ethiopia by several million people.",
+]
+
+
+def _percentiles(values: List[float]) -> Dict:
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"p50_ms": round(pick(0.50) * 1000, 1), "p99_ms": round(pick(0.99) * 1000, 1), "mean_ms": round(statistics.mean(values) * 1000, 1)}
+
+
+async def run(url: str, requests: int, concurrency: int) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=300) as client:
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(url, json={"text": DEFAULT_TEXTS[i % len(DEFAULT_TEXTS)], "source_lang": "en"})
+                return response.status_code, time.perf_counter() - start
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+        stats = (await client.get(url + "/stats")).json()
+    ok = [latency for status, latency in results if status == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": requests - len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "latency": _percentiles(ok) if ok else {},
+        "mean_batch_size": stats["batching"]["mean_batch_size"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure /translate throughput as concurrency grows.")
+    parser.add_argument("--url", default="http://127.0.0.1:8001/translate")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    for concurrency in args.concurrency:
+        print(asyncio.run(run(args.url, args.requests, concurrency)))
@@ -0,0 +1,60 @@
+import re
+from typing import List, Tuple
+
+# Longest segment sent to the model; longer sentences are cut into word windows.
+MAX_SEGMENT_WORDS = 120
+LINE_BREAKS = re.compile(r"(\n[ \t]*(?:\n[ \t]*)*)")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?።])(\s+)")
+HARD_LINE_END = re.compile(r"[.!?።:;]\s*$")
+
+
+def _windows(sentence: str, max_words: int) -> List[Tuple[str, str]]:
+    words = sentence.split()
+    if len(words) <= max_words:
+        return [(sentence, "")]
+    windows = [(" ".join(words[i:i + max_words]), " ") for i in range(0, len(words), max_words)]
+    windows[-1] = (windows[-1][0], "")
+    return windows
+
+
+def segment_document(text: str, max_words: int = MAX_SEGMENT_WORDS) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Split a document into translatable segments.
+
+    Returns (prefix, [(segment, separator), ...]) such that
+    prefix + "".join(segment + separator) rebuilds the layout. Blank lines
+    and other line breaks keep their line breaks and indentation, so list
+    items and headings stay separate. A line break is only a soft wrap
+    (as in PDF text), and becomes a space so the sentence is not cut in
+    half, when its line ends mid-sentence and the next line starts in
+    lowercase.
+    """
+    prefix = text[:len(text) - len(text.lstrip())]
+    pieces = LINE_BREAKS.split(text.strip())
+    blocks, current = [], []
+    for i in range(0, len(pieces), 2):
+        line = pieces[i].strip()
+        if line:
+            current.append(line)
+        separator = pieces[i + 1] if i + 1 < len(pieces) else ""
+        next_line = pieces[i + 2].lstrip() if i + 2 < len(pieces) else ""
+        soft_wrap = separator.count("\n") == 1 and not HARD_LINE_END.search(line) and next_line[:1].islower()
+        if not soft_wrap:
+            if current:
+                blocks.append((" ".join(current), separator))
+            current = []
+    if current:
+        blocks.append((" ".join(current), ""))
+
+    segments = []
+    for block, block_separator in blocks:
+        parts = SENTENCE_BREAK.split(block)
+        for j in range(0, len(parts), 2):
+            separator = parts[j + 1] if j + 1 < len(parts) else block_separator
+            windows = _windows(parts[j], max_words)
+            windows[-1] = (windows[-1][0], separator)
+            segments.extend(windows)
+    if segments:
+        segments[-1] = (segments[-1][0], text[len(text.rstrip()):])
+    return prefix, segments
+
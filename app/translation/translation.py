@@ -1,67 +1,187 @@
 import os
-import csv
+import sys
 from datetime import datetime
-from typing import Optional
+from concurrent.futures import Future
+from typing import Iterator, List, Optional
 
 import torch
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
-from langdetect import detect, DetectorFactory
+from transformers import AutoTokenizer
 
-DetectorFactory.seed = 0
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.translation.batch_scheduler import DynamicBatcher
+from app.translation.translation_memory import TranslationMemory, model_origin
+from app.translation.segmenter import segment_document
+from app.translation.language_id import load_or_train
+from app.core.decoding import generation_kwargs, resolve_profile
+from app.core.seq2seq_backend import load_seq2seq
+from app.core.model_registry import registry
+from app.core.event_log import EventLog
 
 LOG_FILE_PATH = os.getenv("TRANSLATION_LOG_PATH", "data/translation_logs.csv")
+MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", "data/translation_memory.sqlite3")
+PARALLEL_CORPUS_PATH = os.getenv("TRANSLATION_CORPUS_PATH", "data/wolayta.csv")
+MEMORY_FUZZY_THRESHOLD = float(os.getenv("TRANSLATION_MEMORY_FUZZY_THRESHOLD", "0.92"))
+LANGUAGE_ID_PATH = os.getenv("LANGUAGE_ID_PATH", "data/language_id.npz")
+LANGUAGE_ID_MIN_CONFIDENCE = float(os.getenv("LANGUAGE_ID_MIN_CONFIDENCE", "0.8"))
+# Source language assumed when the identifier cannot tell English from Wolaytta.
+LANGUAGE_ID_FALLBACK = os.getenv("LANGUAGE_ID_FALLBACK", "en")
 MODEL_NAME = "Sakuzas/t5-wolaytta-english"
+MAX_LENGTH = 512
+# Concurrent requests in the same direction and of similar length share one generate call.
+BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "16"))
+BATCH_WAIT_MS = float(os.getenv("TRANSLATION_BATCH_WAIT_MS", "10"))
+# Batches generated at once; above 1, give each worker a share of torch's threads.
+BATCH_WORKERS = int(os.getenv("TRANSLATION_WORKERS", "1"))
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
-model.eval()
-translator = pipeline("text2text-generation", model=model, tokenizer=tokenizer, device=0 if torch.cuda.is_available() else -1)
+# Loaded on the first translation; ONNX Runtime (int8) on CPU when a
+# drift-checked export exists, PyTorch otherwise.
+registry.register(MODEL_NAME, lambda: load_seq2seq(MODEL_NAME, DEVICE))
+
+def generate_translations(key, prompts: List[str]) -> List[str]:
+    """
+    One padded `generate` over prompts sharing a (source, target, profile)
+    key; the output length limit follows the longest input.
+    """
+    inputs = tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=MAX_LENGTH).to(DEVICE)
+    with registry.use(MODEL_NAME) as model:
+        outputs = model.generate(**inputs, **generation_kwargs("translation", key[2], inputs["input_ids"].shape[1]))
+    return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+# Seeding is skipped when the corpus and log files have not changed since the last run.
+translation_memory = TranslationMemory(MEMORY_PATH, fuzzy_threshold=MEMORY_FUZZY_THRESHOLD)
+translation_memory.seed_from_corpus(PARALLEL_CORPUS_PATH)
+translation_memory.seed_from_log(LOG_FILE_PATH)
+
+translation_batcher = DynamicBatcher(
+    run_batch=generate_translations,
+    count_tokens=lambda text: len(tokenizer(text, truncation=True, max_length=MAX_LENGTH).input_ids),
+    max_batch_size=BATCH_SIZE,
+    max_wait_ms=BATCH_WAIT_MS,
+    workers=BATCH_WORKERS,
+)
+
+# Retrained only when wolayta.csv changes.
+language_identifier = load_or_train(LANGUAGE_ID_PATH, PARALLEL_CORPUS_PATH, min_confidence=LANGUAGE_ID_MIN_CONFIDENCE)
 
 def detect_language(text: str) -> str:
-    try:
-        lang = detect(text)
-        return lang
-    except Exception:
-        return "unknown"
+    """"en" or "wolaytta"; LANGUAGE_ID_FALLBACK when the text is ambiguous (names, numbers, one short word)."""
+    lang, _ = language_identifier.identify(text.strip())
+    return lang or LANGUAGE_ID_FALLBACK
+
+def resolve_languages(text: str, source_lang: Optional[str], target_lang: Optional[str]):
+    if source_lang is None or source_lang == "auto":
+        source_lang = detect_language(text)
+    if target_lang is None:
+        target_lang = "wolaytta" if source_lang == "en" else "en"
+    return source_lang, target_lang
 
-def translate_text(text: str, source_lang: Optional[str] = None, target_lang: Optional[str] = None) -> str:
+def translate_text(text: str, source_lang: Optional[str] = None, target_lang: Optional[str] = None, profile: Optional[str] = None) -> str:
     """
     Detects language if not provided, then translates.
     Supports auto language detection.
     Logs metadata for every translation.
+    `profile` picks the decoding speed/quality trade-off (fast, balanced, best).
     """
     if not text.strip():
         return ""
-    if source_lang is None or source_lang == "auto":
-        source_lang = detect_language(text)
-    if target_lang is None:
-        target_lang = "wolaytta" if source_lang == "en" else "en"
-    input_text = f"translate {source_lang} to {target_lang}: {text}"
+    return translate_batch([text], source_lang, target_lang, profile)[0]
 
-    try:
-        result = translator(input_text, max_length=512, num_beams=5, early_stopping=True)
-        translated_text = result[0]['generated_text']
-
-        log_translation(text, translated_text, source_lang, target_lang, success=True)
+def submit_translation(text: str, source_lang: str, target_lang: str, profile: Optional[str] = None) -> Future:
+    """Answer from the translation memory (if it holds output at least as good as `profile`), or queue the text for a batched beam search."""
+    remembered = translation_memory.get(text, source_lang, target_lang, profile=profile)
+    if remembered is not None:
+        future = Future()
+        future.set_result(remembered)
+        # Not model output: finish_translation must not store or log it as such.
+        future.from_memory = True
+        return future
+    return translation_batcher.submit(f"translate {source_lang} to {target_lang}: {text}", key=(source_lang, target_lang, resolve_profile(profile)))
 
+def finish_translation(text: str, source_lang: str, target_lang: str, future: Future, profile: Optional[str] = None) -> str:
+    try:
+        translated_text = future.result()
+        if getattr(future, "from_memory", False):
+            # A fuzzy hit stored under this text would pass off a neighbour's translation as an exact one.
+            return translated_text
+        translation_memory.put(text, source_lang, target_lang, translated_text, origin=model_origin(profile))
+        log_translation(text, translated_text, source_lang, target_lang, success=True, profile=resolve_profile(profile))
         return translated_text
     except Exception as e:
-        log_translation(text, str(e), source_lang, target_lang, success=False)
+        log_translation(text, str(e), source_lang, target_lang, success=False, profile=resolve_profile(profile))
         return f"[Translation failed: {str(e)}]"
 
+def translate_batch(texts: List[str], source_lang: Optional[str] = None, target_lang: Optional[str] = None, profile: Optional[str] = None) -> List[str]:
+    """
+    Translates several texts; they are queued on the shared batcher, so they
+    are generated together and alongside other requests' texts. With "auto",
+    each text's language is detected on its own.
+    """
+    pending = []
+    for text in texts:
+        if not text.strip():
+            pending.append(None)
+            continue
+        src, tgt = resolve_languages(text, source_lang, target_lang)
+        pending.append((text, src, tgt, submit_translation(text, src, tgt, profile)))
+    return [finish_translation(*entry, profile) if entry else "" for entry in pending]
+
+def translate_document_stream(
+    text: str, source_lang: Optional[str] = None, target_lang: Optional[str] = None, profile: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Translates a document of any length: it is split into sentences and
+    paragraphs, all segments are queued at once so the batch workers decode
+    them together, and the translated pieces (with the original spacing and
+    line breaks) are yielded in document order as soon as each is ready.
+    """
+    if not text.strip():
+        return
+    source_lang, target_lang, prefix, pending = submit_document(text, source_lang, target_lang, profile)
+    try:
+        yield prefix
+        for segment, separator, future in pending:
+            yield finish_translation(segment, source_lang, target_lang, future, profile) + separator
+    finally:
+        # A closed stream leaves nothing queued; the batcher skips cancelled futures.
+        for _, _, future in pending:
+            future.cancel()
+
+def submit_document(text: str, source_lang: Optional[str] = None, target_lang: Optional[str] = None, profile: Optional[str] = None):
+    """
+    Resolve the languages, segment the document and queue every segment.
+    Returns (source_lang, target_lang, prefix, [(segment, separator, future)]).
+    """
+    source_lang, target_lang = resolve_languages(text, source_lang, target_lang)
+    prefix, segments = segment_document(text)
+    pending = [(segment, separator, submit_translation(segment, source_lang, target_lang, profile)) for segment, separator in segments]
+    return source_lang, target_lang, prefix, pending
+
+def translate_document(text: str, source_lang: Optional[str] = None, target_lang: Optional[str] = None, profile: Optional[str] = None) -> str:
+    return "".join(translate_document_stream(text, source_lang, target_lang, profile))
+
+# Version 2 added the decoding profile, which log seeding needs to rank entries.
+translation_log = EventLog(
+    LOG_FILE_PATH,
+    ["timestamp", "source_text", "translated_text", "source_lang", "target_lang", "success", "profile"],
+    schema_version=2,
+)
+
 def log_translation(
     source_text: str,
     translated_text: str,
     source_lang: str,
     target_lang: str,
-    success: bool
+    success: bool,
+    profile: str = "",
 ):
-    os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
-    header = ["timestamp", "source_text", "translated_text", "source_lang", "target_lang", "success"]
-    file_exists = os.path.exists(LOG_FILE_PATH)
-
-    with open(LOG_FILE_PATH, "a", encoding="utf-8", newline='') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(header)
-        writer.writerow([datetime.utcnow().isoformat(), source_text, translated_text, source_lang, target_lang, success])
+    translation_log.log(
+        timestamp=datetime.utcnow().isoformat(),
+        source_text=source_text,
+        translated_text=translated_text,
+        source_lang=source_lang,
+        target_lang=target_lang,
+        success=success,
+        profile=profile,
+    )
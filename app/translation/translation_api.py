@@ -1,25 +1,163 @@
-from fastapi import FastAPI, HTTPException
+from typing import List
+
+import fitz
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from translation import translate_text
+from translation import (
+    MODEL_NAME,
+    finish_translation,
+    submit_document,
+    translate_batch,
+    translate_document,
+    translate_text,
+    translation_batcher,
+    translation_log,
+    translation_memory,
+)
+from app.core.decoding import resolve_profile
+from app.core.model_registry import registry
+from app.core.inference_executor import ClientDisconnected, executor, install_disconnect_handler
+from app.core.result_cache import cache_key, result_cache
 
 app = FastAPI(title="Wolaytta-English Translation API")
+install_disconnect_handler(app)
 
 class TranslationRequest(BaseModel):
     text: str
     source_lang: str = "auto" 
     target_lang: str = None    
+    profile: str = None
 
 class TranslationResponse(BaseModel):
     translated_text: str
 
+class BatchTranslationRequest(BaseModel):
+    texts: List[str]
+    source_lang: str = "auto"
+    target_lang: str = None
+    profile: str = None
+
+class BatchTranslationResponse(BaseModel):
+    translated_texts: List[str]
+
+class DocumentTranslationRequest(BaseModel):
+    text: str
+    source_lang: str = "auto"
+    target_lang: str = None
+    profile: str = None
+    stream: bool = False
+
+def _check_profile(profile: str):
+    try:
+        resolve_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _succeeded(translated: str) -> bool:
+    return "[Translation failed" not in translated
+
+async def _cached_translation(namespace: str, fn, text: str, source_lang: str, target_lang: str, profile: str, http_request: Request) -> str:
+    """Identical concurrent requests share one translation; repeats are answered from the result cache."""
+    key = cache_key(namespace, text, model=MODEL_NAME, source_lang=source_lang, target_lang=target_lang, profile=resolve_profile(profile))
+    return await result_cache.aget_or_compute(
+        key,
+        lambda: executor.run("translation", fn, text, source_lang, target_lang, profile, request=http_request),
+        store_if=_succeeded,
+        retry_on=(ClientDisconnected,),
+    )
+
 @app.post("/translate", response_model=TranslationResponse)
-async def translate_endpoint(request: TranslationRequest):
+async def translate_endpoint(request: TranslationRequest, http_request: Request):
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="Input text cannot be empty")
+    _check_profile(request.profile)
 
-    translated = translate_text(request.text, request.source_lang, request.target_lang)
+    # Off the event loop, so concurrent requests can meet in the same generate batch.
+    translated = await _cached_translation(
+        "translate", translate_text, request.text, request.source_lang, request.target_lang, request.profile, http_request
+    )
     return TranslationResponse(translated_text=translated)
 
+@app.post("/translate/batch", response_model=BatchTranslationResponse)
+async def translate_batch_endpoint(request: BatchTranslationRequest, http_request: Request):
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="Provide at least one text")
+    _check_profile(request.profile)
+
+    translated = await executor.run(
+        "translation", translate_batch, request.texts, request.source_lang, request.target_lang, request.profile, request=http_request
+    )
+    return BatchTranslationResponse(translated_texts=translated)
+
+async def _stream_document(text: str, source_lang: str, target_lang: str, profile: str, http_request: Request):
+    """
+    Segments are queued together and waited on one at a time in the
+    translation pool; when the client goes away, the rest are cancelled.
+    """
+    pending = []
+    try:
+        source_lang, target_lang, prefix, pending = await executor.run(
+            "translation", submit_document, text, source_lang, target_lang, profile, request=http_request
+        )
+        yield prefix
+        for segment, separator, future in pending:
+            translated = await executor.run(
+                "translation", finish_translation, segment, source_lang, target_lang, future, profile, request=http_request
+            )
+            yield translated + separator
+    except ClientDisconnected:
+        return
+    finally:
+        for _, _, future in pending:
+            future.cancel()
+
+async def _document_response(text: str, source_lang: str, target_lang: str, profile: str, stream: bool, http_request: Request):
+    _check_profile(profile)
+    if stream:
+        # Plain text chunks in document order.
+        return StreamingResponse(
+            _stream_document(text, source_lang, target_lang, profile, http_request),
+            media_type="text/plain; charset=utf-8",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    translated = await _cached_translation("translate_document", translate_document, text, source_lang, target_lang, profile, http_request)
+    return TranslationResponse(translated_text=translated)
+
+@app.post("/translate/document")
+async def translate_document_endpoint(request: DocumentTranslationRequest, http_request: Request):
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Input text cannot be empty")
+
+    return await _document_response(request.text, request.source_lang, request.target_lang, request.profile, request.stream, http_request)
+
+def _pdf_text(data: bytes) -> str:
+    with fitz.open(stream=data, filetype="pdf") as pdf:
+        return "\n\n".join(page.get_text() for page in pdf)
+
+@app.post("/translate/document/file")
+async def translate_document_file(
+    http_request: Request,
+    file: UploadFile = File(...),
+    source_lang: str = Form("auto"),
+    target_lang: str = Form(None),
+    profile: str = Form(None),
+    stream: bool = Form(False),
+):
+    data = await file.read()
+    if (file.filename or "").lower().endswith(".pdf"):
+        text = await executor.run("ingest", _pdf_text, data, request=http_request)
+    else:
+        text = data.decode("utf-8", errors="replace")
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="No text could be extracted from the document")
+
+    return await _document_response(text, source_lang, target_lang, profile, stream, http_request)
+
+@app.get("/translate/stats")
+async def translate_stats():
+    return {"models": registry.stats(), "batching": translation_batcher.stats(), "memory": translation_memory.stats(), "log": translation_log.stats(), "executor": executor.stats(), "results": result_cache.stats()}
+
 
 @app.get("/")
 async def root():
@@ -0,0 +1,340 @@
+import os
+import re
+import csv
+import time
+import heapq
+import sqlite3
+import logging
+import argparse
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+from app.core.decoding import DECODING_PROFILES, resolve_profile
+
+logger = logging.getLogger("Translation-Memory")
+
+DEFAULT_FUZZY_THRESHOLD = 0.92
+DEFAULT_HOT_ENTRIES = 10000
+FUZZY_CANDIDATES = 20
+NGRAM = 3
+# A fuzzy match may not change a number or a negation. Wolaytta negates
+# with verb suffixes rather than separate words, so sources in Wolaytta
+# may differ only in punctuation.
+NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+PUNCTUATION = re.compile(r"[^\w\s]")
+ENGLISH_NEGATIONS = {"not", "no", "never", "none", "nothing", "nobody", "nowhere", "nor", "neither", "cannot", "without"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    direction TEXT NOT NULL,
+    source_norm TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (direction, source_norm)
+);
+CREATE TABLE IF NOT EXISTS seeds (source TEXT PRIMARY KEY, signature TEXT NOT NULL, entries INTEGER NOT NULL);
+"""
+SCHEMA_VERSION = 1
+# Model output is stored as "model:<profile>" and only answers requests for
+# that profile or a cheaper one; corpus pairs answer every profile. Entries
+# of unknown quality ("model" from before profiles were recorded) answer none.
+PROFILE_QUALITY = {profile: rank for rank, profile in enumerate(DECODING_PROFILES["translation"], start=1)}
+CORPUS_QUALITY = len(PROFILE_QUALITY) + 1
+
+
+def language_code(lang: str) -> str:
+    """English stays "en"; every other code the pipeline sees is the Wolaytta side ("wal")."""
+    return "en" if lang.lower() in ("en", "eng", "english") else "wal"
+
+
+def direction_key(source_lang: str, target_lang: str) -> str:
+    return f"{language_code(source_lang)}-{language_code(target_lang)}"
+
+
+def normalize_text(text: str) -> str:
+    text = " ".join(unicodedata.normalize("NFC", text).lower().replace("’", "'").split())
+    return text.rstrip(".!?።")
+
+
+def ngrams(text: str, n: int = NGRAM) -> set:
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+def model_origin(profile: Optional[str]) -> str:
+    return f"model:{resolve_profile(profile)}"
+
+
+def origin_quality(origin: str) -> int:
+    if origin == "corpus":
+        return CORPUS_QUALITY
+    if origin.startswith("model:"):
+        return PROFILE_QUALITY.get(origin[len("model:"):], 0)
+    return 0
+
+
+def meaning_preserved(direction: str, query: str, candidate: str) -> bool:
+    """Whether `candidate`'s translation can stand in for `query`'s (both normalised)."""
+    if NUMBER.findall(query) != NUMBER.findall(candidate):
+        return False
+    query_words = PUNCTUATION.sub(" ", query.replace("n't", " not")).split()
+    candidate_words = PUNCTUATION.sub(" ", candidate.replace("n't", " not")).split()
+    if not direction.startswith("en-"):
+        return query_words == candidate_words
+    return ENGLISH_NEGATIONS.intersection(query_words) == ENGLISH_NEGATIONS.intersection(candidate_words) and (
+        query_words.count("not") == candidate_words.count("not")
+    )
+
+
+def clean_corpus_pair(english: str, wolaytta: str) -> Tuple[str, str]:
+    """
+    wolayta.csv mixes sentence pairs with dictionary records such as
+    "aatuwa%1. noun%► leak%● Kaaray aatuwa doommiis."; keep the example sentence.
+    """
+    if "●" in wolaytta:
+        wolaytta = wolaytta.rsplit("●", 1)[1]
+    return english.split("%", 1)[0].strip(), wolaytta.split("%", 1)[0].strip()
+
+
+class TranslationMemory:
+    """
+    Disk-backed translation memory (SQLite) keyed by direction and
+    normalised source text.
+
+    Exact lookups are served from an LRU of hot entries, then the database.
+    Fuzzy lookups go through an in-memory character-trigram index of entry
+    ids: entries sharing the most trigrams are re-scored by edit similarity
+    and the best one at or above `fuzzy_threshold` whose numbers and
+    negations match the query's is returned.
+
+    Every entry records its origin: corpus pairs ("corpus") serve all
+    decoding profiles, model output ("model:<profile>") only that profile
+    and cheaper ones, so a greedy "fast" translation never answers a
+    "best" request. A corpus pair overwrites what is stored for the same
+    source, so re-seeding a corrected corpus updates the memory; model
+    output replaces an existing entry only if it comes from a better
+    profile.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD,
+        hot_entries: int = DEFAULT_HOT_ENTRIES,
+        busy_timeout_ms: int = 5000,
+    ):
+        self.path = path
+        self.fuzzy_threshold = fuzzy_threshold
+        self.hot_entries = hot_entries
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hot: "OrderedDict[Tuple[str, str], Tuple[str, int]]" = OrderedDict()
+        self._postings: Dict[str, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(list))
+        self._sizes: Dict[int, int] = {}
+        self.hits = Counter()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                # Origins used to be file names and model output carried no
+                # profile: mark non-corpus rows as unknown model output and
+                # re-seed, so corpus pairs are recognised again.
+                conn.execute("UPDATE memory SET origin = 'model' WHERE origin != 'corpus'")
+                conn.execute("DELETE FROM seeds")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        for entry_id, direction, source_norm in self._connection().execute("SELECT id, direction, source_norm FROM memory"):
+            self._index(entry_id, direction, source_norm)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000)
+            conn.create_function("origin_quality", 1, origin_quality, deterministic=True)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _index(self, entry_id: int, direction: str, source_norm: str):
+        grams = ngrams(source_norm)
+        with self._lock:
+            postings = self._postings[direction]
+            for gram in grams:
+                postings[gram].append(entry_id)
+            self._sizes[entry_id] = len(grams)
+
+    def _remember(self, key: Tuple[str, str], target: str, quality: int):
+        with self._lock:
+            self._hot[key] = (target, quality)
+            self._hot.move_to_end(key)
+            while len(self._hot) > self.hot_entries:
+                self._hot.popitem(last=False)
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+    def get(self, text: str, source_lang: str, target_lang: str, fuzzy: bool = True, profile: Optional[str] = None) -> Optional[str]:
+        """A stored translation good enough for `profile` (default "best"), or None."""
+        key = (direction_key(source_lang, target_lang), normalize_text(text))
+        min_quality = PROFILE_QUALITY[resolve_profile(profile)]
+        with self._lock:
+            entry = self._hot.get(key)
+            if entry is not None and entry[1] >= min_quality:
+                self._hot.move_to_end(key)
+                self.hits["hot"] += 1
+                return entry[0]
+        row = self._connection().execute(
+            "SELECT target, origin FROM memory WHERE direction = ? AND source_norm = ?", key
+        ).fetchone()
+        if row is not None and origin_quality(row[1]) >= min_quality:
+            self._remember(key, row[0], origin_quality(row[1]))
+            with self._lock:
+                self.hits["exact"] += 1
+            return row[0]
+        found = self._fuzzy(*key, min_quality) if fuzzy else None
+        if found is not None:
+            self._remember(key, *found)
+        with self._lock:
+            self.hits["fuzzy" if found is not None else "miss"] += 1
+        return found[0] if found is not None else None
+
+    def _fuzzy(self, direction: str, source_norm: str, min_quality: int) -> Optional[Tuple[str, int]]:
+        grams = ngrams(source_norm)
+        shared = Counter()
+        with self._lock:
+            postings = self._postings.get(direction, {})
+            for gram in grams:
+                shared.update(postings.get(gram, ()))
+            # Dice coefficient on trigram sets bounds how similar a candidate can be.
+            candidates = heapq.nlargest(
+                FUZZY_CANDIDATES,
+                ((2 * count / (len(grams) + self._sizes[entry_id]), entry_id) for entry_id, count in shared.items()),
+            )
+        ids = [entry_id for dice, entry_id in candidates if dice >= self.fuzzy_threshold * 0.8]
+        if not ids:
+            return None
+        rows = self._connection().execute(
+            f"SELECT source_norm, target, origin FROM memory WHERE id IN ({','.join('?' * len(ids))})", ids
+        ).fetchall()
+        best_score, best = 0.0, None
+        for candidate, target, origin in rows:
+            if origin_quality(origin) < min_quality or not meaning_preserved(direction, source_norm, candidate):
+                continue
+            score = SequenceMatcher(None, source_norm, candidate).ratio()
+            if score > best_score:
+                best_score, best = score, (target, origin_quality(origin))
+        return best if best_score >= self.fuzzy_threshold else None
+
+    def put(self, text: str, source_lang: str, target_lang: str, translation: str, origin: str = "model:best") -> bool:
+        """Store a translation; an existing entry is only replaced by a corpus pair or output of a better profile."""
+        return self.put_many([(text, translation)], source_lang, target_lang, origin) > 0
+
+    def put_many(self, pairs: List[Tuple[str, str]], source_lang: str, target_lang: str, origin: str) -> int:
+        direction = direction_key(source_lang, target_lang)
+        now = time.time()
+        added, updated = [], []
+        with self._connection() as conn:
+            for text, translation in pairs:
+                source_norm = normalize_text(text)
+                if not source_norm or not translation.strip():
+                    continue
+                existing = conn.execute(
+                    "SELECT id FROM memory WHERE direction = ? AND source_norm = ?", (direction, source_norm)
+                ).fetchone()
+                cursor = conn.execute(
+                    "INSERT INTO memory (direction, source_norm, source, target, origin, created) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (direction, source_norm) DO UPDATE SET "
+                    "source = excluded.source, target = excluded.target, origin = excluded.origin, created = excluded.created "
+                    "WHERE origin_quality(excluded.origin) > origin_quality(memory.origin) "
+                    "OR (excluded.origin = 'corpus' AND memory.target != excluded.target)",
+                    (direction, source_norm, text, translation, origin, now),
+                )
+                if not cursor.rowcount:
+                    continue
+                if existing is None:
+                    added.append((cursor.lastrowid, source_norm))
+                else:
+                    updated.append((direction, source_norm))
+        for entry_id, source_norm in added:
+            self._index(entry_id, direction, source_norm)
+        with self._lock:
+            for key in updated:
+                self._hot.pop(key, None)
+        return len(added) + len(updated)
+
+    def _seed_once(self, path: str, load_pairs) -> int:
+        """Import `path` unless this exact file version was imported before."""
+        if not os.path.exists(path):
+            return 0
+        source = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        row = self._connection().execute("SELECT signature FROM seeds WHERE source = ?", (source,)).fetchone()
+        if row is not None and row[0] == signature:
+            return 0
+        added = sum(self.put_many(pairs, src, tgt, origin) for (src, tgt, origin), pairs in load_pairs(path).items())
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO seeds (source, signature, entries) VALUES (?, ?, ?)", (source, signature, added))
+        logger.info(f"📦 Seeded {added} translation memory entries from {path}")
+        return added
+
+    def seed_from_corpus(self, csv_path: str) -> int:
+        """English/Wolaytta pairs from wolayta.csv, in both directions."""
+        def load_pairs(path):
+            pairs = []
+            with open(path, "r", encoding="utf-8-sig", newline="") as f:
+                for row in csv.DictReader(f):
+                    english, wolaytta = clean_corpus_pair(row.get("English") or "", row.get("Wolaytta") or "")
+                    if english and wolaytta:
+                        pairs.append((english, wolaytta))
+            return {("en", "wal", "corpus"): pairs, ("wal", "en", "corpus"): [(w, e) for e, w in pairs]}
+
+        return self._seed_once(csv_path, load_pairs)
+
+    def seed_from_log(self, log_path: str) -> int:
+        """Successful rows of the translation log written by `log_translation`; rows without a profile are skipped."""
+        def load_pairs(path):
+            pairs = defaultdict(list)
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    if row.get("success") != "True" or (row.get("translated_text") or "").startswith("[Translation failed"):
+                        continue
+                    if row.get("profile") not in PROFILE_QUALITY:
+                        continue
+                    direction = (language_code(row["source_lang"]), language_code(row["target_lang"]), model_origin(row["profile"]))
+                    if direction[0] != direction[1]:
+                        pairs[direction].append((row["source_text"], row["translated_text"]))
+            return pairs
+
+        return self._seed_once(log_path, load_pairs)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = dict(self.hits)
+            hot = len(self._hot)
+        return {"entries": len(self), "hot_entries": hot, "fuzzy_threshold": self.fuzzy_threshold, "lookups": hits}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Seed the translation memory and time lookups.")
+    parser.add_argument("--db", default="data/translation_memory.sqlite3")
+    parser.add_argument("--corpus", default="data/wolayta.csv")
+    parser.add_argument("--log", default="data/translation_logs.csv")
+    args = parser.parse_args()
+
+    memory = TranslationMemory(args.db)
+    memory.seed_from_corpus(args.corpus)
+    memory.seed_from_log(args.log)
+    for text in ("I am thirsty.", "i am thirsty", "I am thirsty!!", "The workers built a fence"):
+        start = time.perf_counter()
+        result = memory.get(text, "en", "wolaytta")
+        print(f"{text!r} -> {result!r} in {(time.perf_counter() - start) * 1e6:.0f} µs")
+    print(memory.stats())
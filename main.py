@@ -7,6 +7,7 @@ from app.voice.mic_record import record_audio
 from app.QA.qa import router as qa
 from app.translation.translation_api import translate_endpoint
 from app.routes.summarizer_api import router as summarizer_router
+from app.core.inference_executor import install_disconnect_handler
 import os
 source_text = "How are you today?"
 translated = translate(source_text, source_lang="en", target_lang="wolaytta")
@@ -14,6 +15,7 @@ translated = translate(source_text, source_lang="en", target_lang="wolaytta")
 print(f"Original: {source_text}")
 print(f"Translated: {translated}")
 app = FastAPI(title="Multimodal Wolaytta ↔ English Intelligent Assistant")
+install_disconnect_handler(app)
 
 # CORS middleware
 app.add_middleware(
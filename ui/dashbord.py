@@ -31,7 +31,7 @@ else:
 # Feedback Summary
 st.header("🗣️ User Feedback Summary")
 if os.path.exists(FEEDBACK_LOG_PATH):
-    feedback_df = pd.read_csv(FEEDBACK_LOG_PATH, names=["timestamp", "question", "answer", "feedback", "comment"])
+    feedback_df = pd.read_csv(FEEDBACK_LOG_PATH)
     feedback_counts = feedback_df["feedback"].value_counts().reset_index()
     feedback_counts.columns = ["Feedback", "Count"]
 